@@ -1,3 +1,5 @@
+import logging
+import threading
 from flask import Flask
 from flask_pymongo import PyMongo
 from flask_jwt_extended import JWTManager
@@ -8,13 +10,17 @@ from .extensions import cache
 mongo = PyMongo()
 jwt = JWTManager()
 
+logger = logging.getLogger(__name__)
+
 def create_app():
     """
     Create and configure the Flask application.
 
     This function initializes the Flask app with configuration settings,
     sets up MongoDB via PyMongo, JWT authentication, rate limiting, and caching.
-    It also registers blueprints for authentication and website routes.
+    It also registers blueprints for authentication and website routes, the
+    management commands, and has the MongoDB indexes created in the background
+    (``_ensure_indexes_in_background``).
 
     Returns:
         Flask: The configured Flask application instance.
@@ -29,22 +35,98 @@ def create_app():
 
     mongo.init_app(app)
     jwt.init_app(app)
+
+    # After mongo.init_app, which installs its own bson.json_util provider.
+    from app.utils.json_provider import BSONJSONProvider
+    app.json = BSONJSONProvider(app)
+
+    from app.utils.async_mongo import async_mongo
+    async_mongo.init_app(app)
     
     # Initialize extensions
     limiter.init_app(app)
-    
-    app.config['CACHE_TYPE'] = 'SimpleCache'
-    app.config['CACHE_DEFAULT_TIMEOUT'] = 300
 
+    # The backend is chosen by CACHE_TYPE; by default the tiered cache.
     cache.init_app(app)
 
+    from app.utils.metrics import metrics
+    metrics.init_app(app)
+
+    from app.utils.static_assets import static_assets
+    static_assets.init_app(app)
+
+    from app.utils.scheduler import upstream_scheduler
+    upstream_scheduler.init_app(app)
+
+    from app.utils.image_store import image_store
+    image_store.init_app(app)
+
+    from app.utils.page_cache import page_cache
+    page_cache.init_app(app)
+
+    from app.utils.site_publisher import site_publisher
+    site_publisher.init_app(app)
+
+    from app.utils.password_hasher import password_hasher
+    password_hasher.init_app(app)
+
+    from app.utils.content_cache import content_cache
+    content_cache.init_app(app)
+
+    from app.utils.jobs import job_queue
+    job_queue.init_app(app)
+
+    from app.utils.batch import batch_generator
+    batch_generator.init_app(app)
 
     from app.routes.auth_routes import auth_bp
     from app.routes.website_routes import website_bp  # ✅ Add this
+    from app.routes.metrics_routes import metrics_bp
 
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(website_bp, url_prefix="/website")  # ✅ Register website API
-    
+    app.register_blueprint(metrics_bp)
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    if app.config.get("MONGO_ENSURE_INDEXES", True):
+        _ensure_indexes_in_background(app)
+
     return app
 
 
+def _ensure_indexes_in_background(app):
+    """
+    Create the declared MongoDB indexes from a thread started by the first request.
+
+    Startup never waits on MongoDB, which may be slow or down, and CLI commands
+    do not touch it; ``flask ensure-indexes`` creates the indexes synchronously.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    from app.models.indexes import IndexBuildError, ensure_indexes
+
+    lock = threading.Lock()
+    started = []
+
+    def create_indexes():
+        try:
+            ensure_indexes(mongo.db)
+        except IndexBuildError as e:
+            for collection, error in e.failures.items():
+                logger.error("Could not create the %s indexes: %s; run `flask ensure-indexes`", collection, error)
+        except Exception:
+            logger.exception("Could not create MongoDB indexes; run `flask ensure-indexes`")
+
+    @app.before_request
+    def start_index_creation():
+        if started:
+            return
+        with lock:
+            if not started:
+                started.append(True)
+                threading.Thread(target=create_indexes, name="ensure-indexes", daemon=True).start()
+
+
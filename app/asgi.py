@@ -0,0 +1,299 @@
+import asyncio
+import contextvars
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+
+def build_environ(scope, body):
+    """
+    Build the WSGI environ of an ASGI HTTP request.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        body (bytes): The complete request body.
+
+    Returns:
+        dict: The WSGI environ.
+    """
+    script_name = scope.get("root_path", "").encode("utf8").decode("latin1")
+    path_info = scope["path"].encode("utf8").decode("latin1")
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        # A text stream: Flask's default log handler writes str to it.
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    """Read the complete body of an ASGI HTTP request."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return b"".join(chunks)
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+class WsgiAdapter:
+    """
+    Serve a WSGI application to an ASGI server from a pool of threads.
+
+    Each request runs in its own thread of the pool, so sync views run
+    concurrently, as under a threaded WSGI server; asgiref's ``WsgiToAsgi`` runs
+    them all on a single thread. The response is sent chunk by chunk as the view
+    yields it, so streaming responses (SSE, NDJSON) stay streamed, and when the
+    client disconnects the view's iterator is closed instead of run to its end.
+
+    Args:
+        wsgi_app (callable): The WSGI application.
+        threads (int): Requests served concurrently; more wait for a thread.
+    """
+
+    def __init__(self, wsgi_app, threads):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send, body=None):
+        if body is None:
+            body = await read_body(receive)
+        loop = asyncio.get_running_loop()
+        disconnected = threading.Event()
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await loop.run_in_executor(self.executor, self.run, build_environ(scope, body), send_from_thread, disconnected)
+        finally:
+            watcher.cancel()
+
+    def run(self, environ, send, disconnected):
+        """Run the WSGI application for one request, in a pool thread."""
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            start["message"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+            }
+            return lambda data: send_body(data)
+
+        def send_body(data):
+            if not start.get("sent"):
+                start["sent"] = True
+                send(start["message"])
+            if data:
+                send({"type": "http.response.body", "body": data, "more_body": True})
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for data in iterable:
+                if disconnected.is_set():
+                    return
+                if data:
+                    send_body(data)
+            send_body(b"")
+            send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    def shutdown(self):
+        """Stop the pool's threads once their requests are done."""
+        self.executor.shutdown(wait=False)
+
+
+class FlaskRequest:
+    """
+    A Flask request context that an async route keeps across its awaits.
+
+    The blocking steps of the route (``run``) execute in worker threads inside
+    the request context, which lives in its own ``contextvars.Context`` rather
+    than in any one thread: the route authenticates with ``flask_jwt_extended``,
+    checks and charges rate limits through ``limiter``, and builds responses
+    with ``jsonify`` and the app's error handlers, as a sync view does.
+
+    Args:
+        flask_app (Flask): The Flask application.
+        environ (dict): The WSGI environ of the request.
+    """
+
+    def __init__(self, flask_app, environ):
+        self.app = flask_app
+        self.context = contextvars.Context()
+        self.request_context = flask_app.request_context(environ)
+        self.open = False
+
+    async def run(self, fn, *args):
+        """Call ``fn(*args)`` in a worker thread, inside the request context."""
+        return await asyncio.to_thread(self.context.run, self._call, fn, *args)
+
+    def _call(self, fn, *args):
+        if not self.open:
+            self.request_context.push()
+            self.open = True
+        return fn(*args)
+
+    def dispatch(self, fn, *args):
+        """
+        Run ``app.preprocess_request`` and then ``fn(*args)`` like a view.
+
+        Exceptions go through the app's error handlers.
+
+        Returns:
+            The view's return value, or the error response.
+        """
+        try:
+            rv = self.app.preprocess_request()
+            if rv is None:
+                rv = fn(*args)
+            return rv
+        except Exception as e:
+            return self.app.handle_user_exception(e)
+
+    def finish(self, rv):
+        """Turn a view's return value into the final response, running the ``after_request`` hooks."""
+        try:
+            return self.app.finalize_request(rv)
+        except Exception as e:
+            return self.app.finalize_request(self.app.handle_exception(e), from_error_handler=True)
+
+    def close(self):
+        """Pop the request context, running the teardown hooks."""
+        if self.open:
+            self.open = False
+            self.context.run(self.request_context.pop)
+
+
+class AsgiApp:
+    """
+    ASGI application serving the async routes natively and the Flask app for the rest.
+
+    Requests matching a route in ``routes`` run as coroutines on the event loop,
+    so a generation waiting on OpenAI and MongoDB holds no thread. Every other
+    request goes to the Flask app through ``WsgiAdapter``, which runs the sync
+    views in a pool of ``ASGI_WSGI_THREADS`` threads. An async route may return
+    None to hand its request to the Flask app after all.
+
+    Args:
+        flask_app (Flask): The Flask application.
+        routes (dict): Coroutine functions by ``(method, path)``. Each takes a
+            ``FlaskRequest`` and returns a Flask response or None.
+        on_shutdown (list, optional): Coroutine functions awaited when the server stops.
+    """
+
+    def __init__(self, flask_app, routes, on_shutdown=None):
+        self.flask_app = flask_app
+        self.routes = routes
+        self.on_shutdown = on_shutdown or []
+        self.wsgi = WsgiAdapter(flask_app, flask_app.config.get("ASGI_WSGI_THREADS", 64))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+
+        route = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if route is None:
+            return await self.wsgi(scope, receive, send)
+
+        body = await read_body(receive)
+        request = FlaskRequest(self.flask_app, build_environ(scope, body))
+        try:
+            response = await route(request)
+        finally:
+            await asyncio.to_thread(request.close)
+        if response is None:
+            return await self.wsgi(scope, receive, send, body=body)
+
+        payload = response.get_data()
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [
+                (name.lower().encode("latin1"), value.encode("latin1"))
+                for name, value in response.headers.items()
+                if name.lower() != "content-length"
+            ]
+            + [(b"content-length", str(len(payload)).encode())],
+        })
+        # The request duration is recorded by the metrics after_request hook, which ``finish`` runs.
+        await send({"type": "http.response.body", "body": payload})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for callback in self.on_shutdown:
+                    try:
+                        await callback()
+                    except Exception:
+                        logger.exception("ASGI shutdown callback failed")
+                self.wsgi.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app):
+    """
+    Wrap the Flask application for an ASGI server.
+
+    Args:
+        flask_app (Flask): The application from ``create_app``.
+
+    Returns:
+        AsgiApp: The ASGI application.
+    """
+    from app.routes.async_website_routes import async_website_routes
+    from app.utils import openai_helper
+    from app.utils.async_mongo import async_mongo
+
+    async def close_openai():
+        await openai_helper.async_client.close()
+
+    return AsgiApp(flask_app, async_website_routes(flask_app), on_shutdown=[async_mongo.close, close_openai])
@@ -0,0 +1,67 @@
+import click
+
+from app import mongo
+from app.models.indexes import IndexBuildError, ensure_indexes, explain_query_shapes, missing_indexes
+from app.utils.site_publisher import site_publisher
+from app.utils.static_assets import static_assets
+
+
+def register_commands(app):
+    """
+    Register the application's management commands with the Flask CLI.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+
+    @app.cli.command("ensure-indexes")
+    def ensure_indexes_command():
+        """Create every index declared in app.models.indexes."""
+        try:
+            ensure_indexes(mongo.db)
+        except IndexBuildError as e:
+            for collection, error in e.failures.items():
+                click.echo(f"FAILED   {collection}: {error}", err=True)
+            if "users" in e.failures:
+                click.echo(
+                    "Without users.email_unique, concurrent registrations can create duplicate accounts; "
+                    "remove the duplicate emails and run this command again.",
+                    err=True,
+                )
+            raise click.ClickException("Some indexes could not be created.")
+        click.echo("Indexes are up to date.")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """Check that every declared index exists and explain every query shape; fail on any COLLSCAN."""
+        missing = missing_indexes(mongo.db)
+        for name in missing:
+            click.echo(f"MISSING  {name}")
+        failed = bool(missing)
+        for description, stages, collscan in explain_query_shapes(mongo.db):
+            status = "COLLSCAN" if collscan else "ok"
+            click.echo(f"{status:8} {description}: {' > '.join(stages)}")
+            failed = failed or collscan
+
+        if failed:
+            raise click.ClickException("Some queries are not covered by an index.")
+
+    @app.cli.command("build-static")
+    @click.option("--clean", is_flag=True, help="Delete previous builds instead of keeping old fingerprinted files.")
+    def build_static_command(clean):
+        """Fingerprint and precompress the static files into STATIC_DIST_PATH."""
+        stats = static_assets.build(clean=clean)
+        click.echo(f"Built {stats['files']} files into {static_assets.dist_path}.")
+        if stats["bytes"]:
+            click.echo(f"Compressible files: {stats['bytes']} bytes, gzip {stats['gzip_bytes']}, brotli {stats['br_bytes']}.")
+        if not stats["br_bytes"]:
+            click.echo("No brotli variants: install the brotli package to build them.")
+
+    @app.cli.command("publish-sites")
+    @click.option("--workers", type=int, default=None, help="Number of processes; defaults to PUBLISH_WORKERS.")
+    def publish_sites_command(workers):
+        """Rebuild the static bundle of every published website into PUBLISH_PATH."""
+        published, failed = site_publisher.export_all(workers)
+        click.echo(f"Published {published} websites into {site_publisher.root}.")
+        if failed:
+            raise click.ClickException(f"{failed} websites could not be published.")
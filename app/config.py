@@ -10,16 +10,208 @@ class Config:
 
     Attributes:
         MONGO_URI (str): MongoDB connection string.
+        MONGO_ENSURE_INDEXES (bool): Create the declared MongoDB indexes in the
+            background once the app serves its first request.
         JWT_SECRET_KEY (str): Secret key used to encode JWT tokens.
         JWT_TOKEN_LOCATION (list): Where to look for JWTs in incoming requests.
         JWT_HEADER_NAME (str): The header name used to pass JWT.
         JWT_HEADER_TYPE (str): Prefix used before the JWT in headers.
         OPENAI_API_KEY (str): API key for accessing OpenAI services.
+        IMAGE_GENERATION_CONCURRENCY (int): Maximum number of images generated in parallel per site.
+        IMAGE_GENERATION_TIMEOUT (float): Per-image timeout, in seconds, for the image API call.
+        IMAGE_PLACEHOLDER_URL (str): Image used for a section whose image could not be generated.
+        JOB_QUEUE_BACKEND (str): "local" for an in-process worker pool, "mongo" to share
+            pending generation jobs between app nodes through the websites collection.
+        JOB_WORKERS (int): Number of background generation workers per process.
+        JOB_POLL_INTERVAL (float): Seconds between Mongo queue polls when idle.
+        JOB_LEASE_SECONDS (int): How long a claimed job stays owned by a worker before
+            another node may pick it up again.
+        JOB_WORKERS_AUTOSTART (bool): Start the job workers with the first request a
+            process serves: the Mongo pollers, or the recovery of the jobs a stopped
+            process left behind for the local backend.
+        OPENAI_CHAT_MODEL (str): Chat model that writes the site content. Models that
+            support it are asked for JSON output (``response_format``).
+        OPENAI_CONNECT_TIMEOUT (float): Seconds allowed to connect to OpenAI.
+        OPENAI_CHAT_TIMEOUT (float): Read timeout of a chat completion; for streamed
+            completions, the longest gap between chunks.
+        OPENAI_MAX_RETRIES (int): Retries of a call that failed with a timeout, a
+            connection error or a 5xx answer.
+        OPENAI_RETRY_BASE_DELAY (float): Backoff of the first retry; later retries back
+            off exponentially, with full jitter.
+        OPENAI_BREAKER_FAILURES (int): Consecutive failures after which calls of that
+            kind fail fast with 503.
+        OPENAI_BREAKER_RESET_TIMEOUT (float): Seconds calls fail fast before a trial call.
+        OPENAI_IMAGE_HEDGING (bool): Duplicate image requests slower than the recent p95.
+        OPENAI_IMAGE_HEDGING_MIN_SAMPLES (int): Image latencies observed before hedging starts.
+        OPENAI_MAX_CONNECTIONS (int): Size of the shared HTTP connection pool to OpenAI.
+        OPENAI_MAX_KEEPALIVE_CONNECTIONS (int): Idle connections kept open for reuse.
+        OPENAI_KEEPALIVE_EXPIRY (float): Seconds an idle connection is kept.
+        UPSTREAM_CHAT_RPM (int): Chat completion requests per minute allowed upstream; 0 for no limit.
+        UPSTREAM_CHAT_TPM (int): Chat completion tokens per minute allowed upstream; 0 for no limit.
+        UPSTREAM_IMAGE_RPM (int): Image generation requests per minute allowed upstream; 0 for no limit.
+        UPSTREAM_IMAGE_TPM (int): Image generation tokens per minute; 0 (the default) for no limit.
+        UPSTREAM_MAX_WAIT_INTERACTIVE (float): Longest an interactive request queues for
+            upstream capacity before it is answered with 429.
+        UPSTREAM_MAX_WAIT_BATCH (float): Longest a batch or background generation queues
+            for upstream capacity before it fails.
+        UPSTREAM_SCHEDULER_BACKEND (str): "local" keeps the rate buckets in each process;
+            "mongo" shares them between processes and app nodes.
+        METRICS_ENABLED (bool): Collect request and generation-stage metrics for ``/metrics``.
+        METRICS_DIR (str): Directory where each worker process writes its metrics so
+            ``/metrics`` reports all workers; unset to report only the answering process.
+        METRICS_FLUSH_INTERVAL (float): Seconds between metrics snapshots written to ``METRICS_DIR``.
+        METRICS_TOKEN (str): Bearer token required to read ``/metrics``; unset leaves
+            the endpoint open to anyone who can reach the app.
+        BATCH_GENERATION_CONCURRENCY (int): Sites generated in parallel per process across
+            all batch requests.
+        BATCH_GENERATION_MAX_ITEMS (int): Largest number of items accepted in one batch.
+        CONTENT_CACHE_ENABLED (bool): Reuse generated content for equivalent requests.
+        CONTENT_CACHE_TTL (int): Seconds a cached generation is served.
+        CONTENT_CACHE_REMOTE_IMAGE_TTL (int): Shorter lifetime for cached content that still
+            points at DALL·E image URLs, which expire after an hour.
+        CONTENT_CACHE_LRU_SIZE (int): Entries kept in the in-process LRU in front of Mongo.
+        SINGLE_FLIGHT_BACKEND (str): "local" coalesces identical generations within a
+            process; "mongo" also coalesces across processes through lease documents.
+        SINGLE_FLIGHT_WAIT_TIMEOUT (float): Seconds a coalesced request waits for the
+            in-flight generation before giving up.
+        SINGLE_FLIGHT_LEASE_SECONDS (int): How long a Mongo lease outlives its
+            process; a running leader renews it every third of this.
+        IMAGE_STORE_ENABLED (bool): Download generated images into the local image store.
+        IMAGE_STORE_BACKEND (str): "disk" or "gridfs".
+        IMAGE_STORE_PATH (str): Directory of the disk backend; defaults to instance/images.
+        IMAGE_STORE_FETCH_TIMEOUT (float): Seconds allowed to download one generated image.
+        IMAGE_AVIF_SPEED (int): libavif encoder speed of the AVIF variants, from 0
+            (smallest files) to 10 (fastest).
+        WEBSITE_LIST_DEFAULT_LIMIT (int): Page size of website listings when no limit is given.
+        WEBSITE_LIST_MAX_LIMIT (int): Largest page size a client may request.
+        RESPONSE_CACHE_TIMEOUT (int): Lifetime of cached API responses. Entries are
+            invalidated by tag on every write, so this can be long. The tag versions
+            live twice as long.
+        CACHE_TYPE (str): Flask-Caching backend; by default the tiered cache
+            (``app.utils.tiered_cache.TieredCache``).
+        CACHE_DEFAULT_TIMEOUT (int): Lifetime of cache entries set without a timeout.
+        CACHE_L2_BACKEND (str): Shared tier of the tiered cache: "file" for the workers
+            of one host, "mongo" for every app node, or "none" for per-process only.
+        CACHE_DIR (str): Directory of the "file" tier; defaults to instance/cache.
+        CACHE_L1_MAX_BYTES (int): Size, in bytes, of each process's in-memory LRU.
+        CACHE_L1_TTL (float): Longest time a process serves an entry from memory
+            without looking at the shared tier.
+        CACHE_LOCK_TIMEOUT (float): How long one request may hold the lock to compute
+            a missing entry while others wait for it.
+        CACHE_EARLY_REFRESH_BETA (float): How eagerly entries are recomputed before
+            they expire; 0 disables early refresh.
+        STATIC_DIST_PATH (str): Output directory of ``flask build-static``; defaults to
+            app/static_dist. When it holds a build, static URLs are fingerprinted.
+        APP_VERSION (str): Release identifier, e.g. the deployed commit. Part of the
+            ETag of rendered pages, with the template and static manifest.
+        PAGE_CACHE_SIZE (int): Rendered preview pages kept in memory per process.
+        PAGE_CACHE_VALIDATE_TTL (float): Seconds a process trusts its last known ETag for a
+            website before re-reading its ``version`` from Mongo.
+        RATELIMIT_STORAGE_URI (str): Where rate limit counters are kept, shared by every
+            worker and node: a MongoDB URI (counters go to its "limits" database) or
+            "memory://" for per-process counters in development.
+        RATELIMIT_STRATEGY (str): "fixed-window" or the more precise and costlier "moving-window".
+        RATELIMIT_IN_MEMORY_FALLBACK_ENABLED (bool): Count in memory while the storage is unreachable.
+        RATELIMIT_DEFAULT (str): Limit of routes without their own, per user or IP.
+        API_RATE_LIMIT (str): Limit of the authenticated read and write API routes, per user.
+        GENERATION_RATE_LIMIT (str): Budget of the generation routes, per user, in upstream
+            calls: a whole site costs 7, one regenerated section 2 to 4. Only successful
+            requests are charged.
+        PASSWORD_HASH_METHOD (str): werkzeug hash method for new passwords, e.g.
+            "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Stored hashes made with
+            other parameters are rehashed at the user's next login.
+        PASSWORD_SALT_LENGTH (int): Salt length of new password hashes.
+        PASSWORD_HASH_WORKERS (int): Processes hashing passwords, per server worker;
+            defaults to the number of CPUs. 0 hashes on the request thread.
+        PASSWORD_HASH_QUEUE_DEPTH (int): Hashes that may wait per hashing process before
+            register and login answer 503.
+        PASSWORD_HASH_TIMEOUT (float): Longest a request waits for its hash before 503.
+        PUBLISH_PATH (str): Directory of the static bundles of published websites;
+            defaults to instance/published.
+        PUBLISH_WORKERS (int): Processes used by ``flask publish-sites``; defaults to
+            the number of CPUs.
+        ASGI_WSGI_THREADS (int): Threads serving the sync routes under an ASGI server
+            (``asgi:app``); each open SSE or NDJSON stream holds one.
     """
     
     MONGO_URI = "mongodb://localhost:27017/AI_DB"
+    MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")  # Use a secret key stored in env variable
     JWT_TOKEN_LOCATION = ["headers"]  # <-- Important!
     JWT_HEADER_NAME = "Authorization"
     JWT_HEADER_TYPE = "Bearer"  # default, optional
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    IMAGE_GENERATION_CONCURRENCY = int(os.getenv("IMAGE_GENERATION_CONCURRENCY", 6))
+    IMAGE_GENERATION_TIMEOUT = float(os.getenv("IMAGE_GENERATION_TIMEOUT", 60))
+    IMAGE_PLACEHOLDER_URL = os.getenv("IMAGE_PLACEHOLDER_URL", "/staticfiles/images/slider-bg.jpg")
+    JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "local")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 300))
+    JOB_WORKERS_AUTOSTART = os.getenv("JOB_WORKERS_AUTOSTART", "true").lower() == "true"
+    OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4")
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+    OPENAI_CHAT_TIMEOUT = float(os.getenv("OPENAI_CHAT_TIMEOUT", 60))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+    OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", 0.5))
+    OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", 5))
+    OPENAI_BREAKER_RESET_TIMEOUT = float(os.getenv("OPENAI_BREAKER_RESET_TIMEOUT", 30))
+    OPENAI_IMAGE_HEDGING = os.getenv("OPENAI_IMAGE_HEDGING", "false").lower() == "true"
+    OPENAI_IMAGE_HEDGING_MIN_SAMPLES = int(os.getenv("OPENAI_IMAGE_HEDGING_MIN_SAMPLES", 20))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 50))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30))
+    UPSTREAM_CHAT_RPM = int(os.getenv("UPSTREAM_CHAT_RPM", 500))
+    UPSTREAM_CHAT_TPM = int(os.getenv("UPSTREAM_CHAT_TPM", 30000))
+    UPSTREAM_IMAGE_RPM = int(os.getenv("UPSTREAM_IMAGE_RPM", 50))
+    UPSTREAM_IMAGE_TPM = int(os.getenv("UPSTREAM_IMAGE_TPM", 0))
+    UPSTREAM_MAX_WAIT_INTERACTIVE = float(os.getenv("UPSTREAM_MAX_WAIT_INTERACTIVE", 15))
+    UPSTREAM_MAX_WAIT_BATCH = float(os.getenv("UPSTREAM_MAX_WAIT_BATCH", 300))
+    UPSTREAM_SCHEDULER_BACKEND = os.getenv("UPSTREAM_SCHEDULER_BACKEND", "local")
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", 4))
+    BATCH_GENERATION_MAX_ITEMS = int(os.getenv("BATCH_GENERATION_MAX_ITEMS", 50))
+    CONTENT_CACHE_ENABLED = os.getenv("CONTENT_CACHE_ENABLED", "true").lower() == "true"
+    CONTENT_CACHE_TTL = int(os.getenv("CONTENT_CACHE_TTL", 7 * 24 * 3600))
+    CONTENT_CACHE_REMOTE_IMAGE_TTL = int(os.getenv("CONTENT_CACHE_REMOTE_IMAGE_TTL", 3000))
+    CONTENT_CACHE_LRU_SIZE = int(os.getenv("CONTENT_CACHE_LRU_SIZE", 256))
+    SINGLE_FLIGHT_BACKEND = os.getenv("SINGLE_FLIGHT_BACKEND", "local")
+    SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", 120))
+    SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", 120))
+    IMAGE_STORE_ENABLED = os.getenv("IMAGE_STORE_ENABLED", "true").lower() == "true"
+    IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "disk")
+    IMAGE_STORE_PATH = os.getenv("IMAGE_STORE_PATH")
+    IMAGE_STORE_FETCH_TIMEOUT = float(os.getenv("IMAGE_STORE_FETCH_TIMEOUT", 30))
+    IMAGE_AVIF_SPEED = int(os.getenv("IMAGE_AVIF_SPEED", 8))
+    STATIC_DIST_PATH = os.getenv("STATIC_DIST_PATH")
+    APP_VERSION = os.getenv("APP_VERSION", "")
+    PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", 512))
+    PAGE_CACHE_VALIDATE_TTL = float(os.getenv("PAGE_CACHE_VALIDATE_TTL", 5))
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "mongodb://localhost:27017")
+    RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "fixed-window")
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = os.getenv("RATELIMIT_IN_MEMORY_FALLBACK_ENABLED", "true").lower() == "true"
+    RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "100 per minute")
+    API_RATE_LIMIT = os.getenv("API_RATE_LIMIT", "100 per minute")
+    GENERATION_RATE_LIMIT = os.getenv("GENERATION_RATE_LIMIT", "420 per hour")
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", 32))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    PUBLISH_PATH = os.getenv("PUBLISH_PATH")
+    PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 0)) or None
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 64))
+    WEBSITE_LIST_DEFAULT_LIMIT = int(os.getenv("WEBSITE_LIST_DEFAULT_LIMIT", 20))
+    WEBSITE_LIST_MAX_LIMIT = int(os.getenv("WEBSITE_LIST_MAX_LIMIT", 100))
+    RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 6 * 3600))
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "app.utils.tiered_cache.TieredCache")
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", 300))
+    CACHE_L2_BACKEND = os.getenv("CACHE_L2_BACKEND", "file")
+    CACHE_DIR = os.getenv("CACHE_DIR")
+    CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", 32 * 1024 * 1024))
+    CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", 2))
+    CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", 30))
+    CACHE_EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", 1.0))
@@ -1,13 +1,97 @@
+import logging
+
+from flask import current_app
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from limits import parse_many
+
+logger = logging.getLogger(__name__)
 
 
 # Initialize Flask-Caching extension
 cache = Cache()
 
-# Initialize Flask-Limiter extension to apply rate limiting
-limiter = Limiter(
-    key_func=get_remote_address,   # Function to identify clients by their IP address
-    default_limits=["100 per minute"]  # Default rate limit: 100 requests per minute per IP
-)
+# Limiter scope of the shared generation budget.
+GENERATION_SCOPE = "generation"
+
+# Units of the generation budget: one chat completion, plus one image per
+# section and one per service.
+SITE_GENERATION_COST = 7
+
+
+def rate_limit_key():
+    """
+    Identify the client a rate limit applies to.
+
+    Authenticated requests are limited per user (the JWT identity), so users
+    behind one NAT do not share a budget and one user cannot multiply theirs by
+    changing IP. Anonymous requests, or requests with an invalid token, are
+    limited per IP address.
+
+    Returns:
+        str: ``user:<identity>`` or ``ip:<address>``.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity is not None:
+        return f"user:{identity}"
+    return f"ip:{get_remote_address()}"
+
+
+def config_limit(name):
+    """Return a limit provider reading the limit string ``name`` from the app config on each request."""
+    return lambda: current_app.config[name]
+
+
+# Initialize Flask-Limiter extension to apply rate limiting. Storage, strategy
+# and the default limit come from the RATELIMIT_* settings in Config.
+limiter = Limiter(key_func=rate_limit_key)
+
+
+def generation_limit(cost, deferred=False):
+    """
+    Draw ``cost`` units from the caller's generation budget, shared by every generation route.
+
+    The budget (``GENERATION_RATE_LIMIT``) is counted in upstream OpenAI calls,
+    so a whole site weighs as much as its chat completion and images together.
+    Only successful requests are charged.
+
+    Args:
+        cost (int or callable): Units the request costs, or a function computing them.
+        deferred (bool): Only check that ``cost`` units are left; the route
+            charges what it actually used with ``charge_generation``. For
+            streamed responses, whose outcome is unknown when the status is sent.
+    """
+    return limiter.shared_limit(
+        config_limit("GENERATION_RATE_LIMIT"),
+        scope=GENERATION_SCOPE,
+        cost=cost,
+        deduct_when=(lambda response: False) if deferred else (lambda response: response.status_code < 400),
+    )
+
+
+def charge_generation(cost):
+    """
+    Draw ``cost`` units from the current caller's generation budget.
+
+    For routes limited with ``generation_limit(..., deferred=True)``; must run
+    in their request context. Storage errors are logged, not raised: the work
+    has been done by then.
+
+    Args:
+        cost (int): Units to charge.
+    """
+    if not limiter.enabled or cost <= 0:
+        return
+    key = rate_limit_key()
+    try:
+        for limit in parse_many(current_app.config["GENERATION_RATE_LIMIT"]):
+            limiter.limiter.hit(limit, key, GENERATION_SCOPE, cost=cost)
+    except Exception:
+        logger.exception("Failed to charge the generation budget of %s", key)
+
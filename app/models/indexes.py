@@ -0,0 +1,159 @@
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Every index the application relies on, by collection. ``ensure_indexes`` creates
+# them, in the background after startup or with ``flask ensure-indexes``; creating
+# an index that already exists is a no-op.
+INDEXES = {
+    "users": [
+        # find_by_email on login; unique so concurrent registrations cannot
+        # create duplicate accounts.
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "websites": [
+        # Keyset pagination of a user's websites on (updated_at, _id), newest
+        # first. Filters on {_id, user_id} are served by the _id index.
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_updated_id",
+        ),
+        # Job queue: claiming the oldest pending job and re-claiming expired leases.
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+        # flask publish-sites: only published websites are indexed.
+        IndexModel(
+            [("is_published", ASCENDING)],
+            partialFilterExpression={"is_published": True},
+            name="published",
+        ),
+    ],
+    "content_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "generation_leases": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    # Shared tier of the tiered cache (CACHE_L2_BACKEND = "mongo").
+    "cache_entries": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+}
+
+
+def query_shapes():
+    """
+    Return every query shape the application issues, for plan verification.
+
+    Returns:
+        list: ``(description, collection, filter, sort)`` tuples. Values are
+        placeholders; only the shape matters to the query planner.
+    """
+    website_id = ObjectId()
+    now = datetime.utcnow()
+    return [
+        ("users by email", "users", {"email": "user@example.com"}, None),
+        ("website by id", "websites", {"_id": website_id}, None),
+        ("website by id and owner", "websites", {"_id": website_id, "user_id": "user@example.com"}, None),
+        ("websites by owner", "websites", {"user_id": "user@example.com"},
+         [("updated_at", DESCENDING), ("_id", DESCENDING)]),
+        ("websites by owner after cursor", "websites", {"user_id": "user@example.com", "$or": [
+            {"updated_at": {"$lt": now}},
+            {"updated_at": now, "_id": {"$lt": website_id}},
+        ]}, [("updated_at", DESCENDING), ("_id", DESCENDING)]),
+        ("job claim by id", "websites", {"_id": website_id, "status": "pending"}, None),
+        ("job claim next", "websites", {"$or": [
+            {"status": "pending"},
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+        ]}, [("created_at", ASCENDING)]),
+        ("published websites", "websites", {"is_published": True}, None),
+        ("content cache entry", "content_cache", {"_id": "v1:coffee shop|food"}, None),
+        ("cache entries by key", "cache_entries", {"_id": {"$in": ["tag:user:user@example.com"]}}, None),
+        ("generation lease takeover", "generation_leases", {"_id": "content:key", "expires_at": {"$lt": now}}, None),
+    ]
+
+
+class IndexBuildError(Exception):
+    """Raised by ``ensure_indexes`` when the indexes of some collections could not be created."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__("; ".join(f"{collection}: {error}" for collection, error in failures.items()))
+
+
+def ensure_indexes(db):
+    """
+    Create all declared indexes.
+
+    Each collection's indexes are created independently, so one that cannot be
+    built, e.g. ``email_unique`` over users registered twice before the index
+    existed, does not keep the other collections' indexes from being created.
+
+    Args:
+        db: The database connection object.
+
+    Raises:
+        IndexBuildError: If some collections' indexes could not be created,
+            once every collection has been tried.
+    """
+    failures = {}
+    for collection, indexes in INDEXES.items():
+        try:
+            db[collection].create_indexes(indexes)
+        except PyMongoError as e:
+            failures[collection] = e
+    if failures:
+        raise IndexBuildError(failures)
+
+
+def missing_indexes(db):
+    """
+    List the declared indexes that do not exist in the database.
+
+    Args:
+        db: The database connection object.
+
+    Returns:
+        list: ``"collection.index_name"`` strings.
+    """
+    missing = []
+    for collection, indexes in INDEXES.items():
+        existing = db[collection].index_information()
+        missing.extend(
+            f"{collection}.{index.document['name']}" for index in indexes if index.document["name"] not in existing
+        )
+    return missing
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_query_shapes(db):
+    """
+    Explain every query shape and report the stages of its winning plan.
+
+    Args:
+        db: The database connection object.
+
+    Returns:
+        list: ``(description, stages, collscan)`` tuples, one per query shape.
+    """
+    results = []
+    for description, collection, query, sort in query_shapes():
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        results.append((description, stages, "COLLSCAN" in stages))
+    return results
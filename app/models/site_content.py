@@ -0,0 +1,285 @@
+import json
+import re
+from typing import Annotated, Any, List, Literal, Union
+
+from pydantic import BaseModel, ConfigDict, Discriminator, Tag, TypeAdapter, ValidationError
+
+KNOWN_SECTION_TYPES = ("hero", "about", "services", "contact")
+
+_CODE_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+class _Section(BaseModel):
+    # Image fields and anything else the model adds are kept as they are.
+    model_config = ConfigDict(extra="allow")
+
+    title: str = ""
+
+
+class HeroBody(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    headline: str
+    subheadline: str = ""
+
+
+class HeroSection(_Section):
+    type: Literal["hero"]
+    body: HeroBody
+
+
+class AboutSection(_Section):
+    type: Literal["about"]
+    body: str
+
+
+class ServicesSection(_Section):
+    type: Literal["services"]
+    body: List[str]
+
+
+class ContactSection(_Section):
+    type: Literal["contact"]
+    body: str
+
+
+class OtherSection(_Section):
+    """A section type the prompt did not ask for; stored but not rendered specially."""
+
+    type: str
+    body: Any
+
+
+def _section_tag(value):
+    section_type = value.get("type") if isinstance(value, dict) else getattr(value, "type", None)
+    return section_type if section_type in KNOWN_SECTION_TYPES else "other"
+
+
+Section = Annotated[
+    Union[
+        Annotated[HeroSection, Tag("hero")],
+        Annotated[AboutSection, Tag("about")],
+        Annotated[ServicesSection, Tag("services")],
+        Annotated[ContactSection, Tag("contact")],
+        Annotated[OtherSection, Tag("other")],
+    ],
+    Discriminator(_section_tag),
+]
+
+_section_adapter = TypeAdapter(Section)
+
+
+class SiteContent(BaseModel):
+    """
+    The site content the chat completion must return.
+
+    Validation is compiled once, when the module is imported, and
+    ``model_validate_json`` parses and validates raw text in a single pass.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    title: str
+    sections: List[Section]
+
+
+def repair_json(text):
+    """
+    Fix the usual defects of model-written JSON without another model call.
+
+    Handles markdown code fences and prose around the object, trailing commas,
+    and output cut off by ``max_tokens``: an unterminated string value is closed,
+    anything after the last complete value is cut, and the open arrays and
+    objects are closed.
+
+    Args:
+        text (str): The raw completion.
+
+    Returns:
+        str: JSON text, which still has to be validated.
+    """
+    text = _CODE_FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start == -1:
+        return text
+
+    out = []
+    stack = []  # open containers, "{" or "["
+    in_string = escape = in_literal = False
+    string_is_value = False
+    after_colon = False
+    # End of the last complete value in ``out`` and the containers open there.
+    safe = (0, [])
+
+    def mark_safe():
+        nonlocal safe
+        safe = (len(out), list(stack))
+
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                if string_is_value:
+                    mark_safe()
+            continue
+
+        if in_literal and (char.isspace() or char in ",]}"):
+            # A number, true, false or null ended.
+            in_literal = False
+            mark_safe()
+
+        if char.isspace():
+            out.append(char)
+        elif char == '"':
+            in_string = True
+            string_is_value = stack[-1:] == ["["] or after_colon
+            after_colon = False
+            out.append(char)
+        elif char in "{[":
+            stack.append(char)
+            after_colon = False
+            out.append(char)
+            mark_safe()
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            after_colon = False
+            out.append(char)
+            mark_safe()
+            if not stack:
+                return "".join(out)
+        elif char == ":":
+            after_colon = True
+            out.append(char)
+        elif char == ",":
+            out.append(char)
+        else:
+            in_literal = True
+            after_colon = False
+            out.append(char)
+
+    # Truncated.
+    if in_string and string_is_value:
+        if escape:
+            out.pop()
+        length, open_containers = len(out) + 1, stack
+        out.append('"')
+    else:
+        length, open_containers = safe
+    repaired = "".join(out[:length]).rstrip().rstrip(",")
+    return repaired + "".join("}" if container == "{" else "]" for container in reversed(open_containers))
+
+
+def _drop_broken_sections(data, error):
+    """Drop sections that failed validation, keeping the document when enough survives."""
+    broken = {
+        item["loc"][1]
+        for item in error.errors()
+        if len(item["loc"]) > 1 and item["loc"][0] == "sections" and isinstance(item["loc"][1], int)
+    }
+    if not broken or not isinstance(data, dict) or not isinstance(data.get("sections"), list):
+        return None
+    data["sections"] = [section for index, section in enumerate(data["sections"]) if index not in broken]
+    return data
+
+
+def parse_site_content(text):
+    """
+    Parse and validate the site content returned by the chat completion.
+
+    Well-formed output is parsed and validated in one pass. Otherwise the text
+    is repaired (``repair_json``) and validated again; sections that are still
+    invalid, typically the one cut off by truncation, are dropped.
+
+    Args:
+        text (str): The raw completion.
+
+    Returns:
+        tuple: ``(content, repaired)`` with the content as a dict and whether a
+        repair was needed.
+
+    Raises:
+        ValueError: If no valid site content could be recovered.
+    """
+    try:
+        return SiteContent.model_validate_json(text).model_dump(), False
+    except ValidationError:
+        pass
+
+    repaired = repair_json(text)
+    try:
+        return SiteContent.model_validate_json(repaired).model_dump(), True
+    except ValidationError as e:
+        error = e
+
+    try:
+        data = json.loads(repaired)
+    except ValueError:
+        raise ValueError("No valid JSON found in the response.") from error
+    data = _drop_broken_sections(data, error)
+    if data is None:
+        raise ValueError(f"The response does not match the site content schema: {error}") from error
+    try:
+        return SiteContent.model_validate(data).model_dump(), True
+    except ValidationError as e:
+        raise ValueError(f"The response does not match the site content schema: {e}") from e
+
+
+def validate_site_section(data):
+    """
+    Validate one already parsed section, e.g. from ``SectionStreamParser``.
+
+    Args:
+        data: The section as decoded from JSON.
+
+    Returns:
+        dict: The validated section.
+
+    Raises:
+        ValueError: If ``data`` is not a valid section.
+    """
+    try:
+        return _section_adapter.validate_python(data).model_dump()
+    except ValidationError as e:
+        raise ValueError(f"The section does not match the section schema: {e}") from e
+
+
+def parse_site_section(text, section_type):
+    """
+    Parse and validate a single section returned by the chat completion.
+
+    Like ``parse_site_content``, well-formed output is validated in one pass and
+    anything else is repaired first.
+
+    Args:
+        text (str): The raw completion.
+        section_type (str): The section type that was asked for.
+
+    Returns:
+        tuple: ``(section, repaired)`` with the section as a dict and whether a
+        repair was needed.
+
+    Raises:
+        ValueError: If no valid section of ``section_type`` could be recovered.
+    """
+    repaired = False
+    try:
+        section = _section_adapter.validate_json(text)
+    except ValidationError:
+        repaired = True
+        try:
+            section = _section_adapter.validate_json(repair_json(text))
+        except ValidationError as e:
+            raise ValueError(f"The response does not match the section schema: {e}") from e
+    if section.type != section_type:
+        raise ValueError(f"Expected a {section_type!r} section, got {section.type!r}")
+    return section.model_dump(), repaired
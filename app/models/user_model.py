@@ -1,6 +1,7 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+from app.utils.password_hasher import password_hasher
+
 class UserModel:
     @staticmethod
     def find_by_email(db, email):
@@ -21,6 +22,8 @@ class UserModel:
         """
         Create a new user in the database with hashed password.
 
+        The password is hashed in the password hashing pool (see ``PasswordHasher``).
+
         Args:
             db: The database connection object.
             name (str): The name of the user.
@@ -29,8 +32,12 @@ class UserModel:
 
         Returns:
             None
+
+        Raises:
+            DuplicateKeyError: If a user with this email already exists.
+            PasswordHasherBusy: If the password hashing pool is saturated.
         """
-        hashed_password = generate_password_hash(password)
+        hashed_password = password_hasher.hash(password)
         user = {
             "name": name,
             "email": email,
@@ -50,7 +57,39 @@ class UserModel:
 
         Returns:
             bool: True if the password matches, False otherwise.
+
+        Raises:
+            PasswordHasherBusy: If the password hashing pool is saturated.
+        """
+        return password_hasher.verify(user_doc["password_hash"], password)
+
+    @staticmethod
+    def rehash_password_if_needed(db, user_doc, password):
+        """
+        Migrate a user's password hash to the configured hashing parameters.
+
+        Call after a successful login, while the plaintext password is known.
+        The update only applies if the stored hash is still the one that was
+        checked, so a concurrent password change is never overwritten.
+
+        Args:
+            db: The database connection object.
+            user_doc (dict): The user document whose password was just verified.
+            password (str): The plaintext password.
+
+        Returns:
+            bool: True if the hash was replaced.
+
+        Raises:
+            PasswordHasherBusy: If the password hashing pool is saturated.
         """
-        return check_password_hash(user_doc["password_hash"], password)
+        old_hash = user_doc["password_hash"]
+        if not password_hasher.needs_rehash(old_hash):
+            return False
+        result = db.users.update_one(
+            {"_id": user_doc["_id"], "password_hash": old_hash},
+            {"$set": {"password_hash": password_hasher.hash(password)}},
+        )
+        return result.modified_count == 1
 
 
@@ -1,6 +1,19 @@
+import base64
+import json
+import re
 from datetime import datetime
 
-def get_website_document(user_id, business_type, industry, content):
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Generation status of a website document. Documents created before jobs
+# existed have no status and are treated as ready.
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+def get_website_document(user_id, business_type, industry, content, status=STATUS_READY):
     """
     Generate a website document dictionary with metadata for storage.
 
@@ -9,6 +22,8 @@ def get_website_document(user_id, business_type, industry, content):
         business_type (str): The type of business the website represents.
         industry (str): The industry the business operates in.
         content (dict): The website content, including AI-generated sections.
+        status (str): Generation status; ``STATUS_PENDING`` for documents whose
+            content is still being generated by a background job.
 
     Returns:
         dict: A dictionary representing the website document, including timestamps and publication status.
@@ -21,4 +36,215 @@ def get_website_document(user_id, business_type, industry, content):
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
         "is_published": False,
+        "status": status,
+        "version": 1,  # incremented by every write; used for If-Match checks
     }
+
+
+FIELD_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def version_filter(version):
+    """
+    Build the query condition matching a website at a given version.
+
+    Documents written before versioning have no ``version`` field; they match 0.
+
+    Args:
+        version (int): The expected version.
+
+    Returns:
+        dict: A query fragment.
+    """
+    if version == 0:
+        return {"version": {"$in": [0, None]}}
+    return {"version": version}
+
+
+def build_section_update(data):
+    """
+    Turn a content PATCH body into a targeted ``$set`` with arrayFilters.
+
+    Each field of each requested section becomes its own
+    ``content.sections.$[sN].<field>`` path, with an array filter matching the
+    stored section by ``type``, so only the changed fields are written.
+
+    Args:
+        data (dict): The request body with optional ``sections``, ``layout`` and ``title``.
+
+    Returns:
+        tuple: ``(set_fields, array_filters, sections)``. ``sections`` are the
+        requested sections, merged by type, for appending those that do not exist yet.
+
+    Raises:
+        ValueError: If a section or field name is invalid.
+    """
+    set_fields = {"updated_at": datetime.utcnow()}
+    array_filters = []
+
+    merged = {}
+    for section in data.get("sections") or []:
+        if not isinstance(section, dict):
+            raise ValueError("Each section must be an object")
+        section_type = section.get("type")
+        if not section_type:
+            continue
+        merged.setdefault(section_type, {}).update(section)
+
+    for index, (section_type, section) in enumerate(merged.items()):
+        identifier = f"s{index}"
+        fields = {key: value for key, value in section.items() if key != "type"}
+        for key, value in fields.items():
+            if not FIELD_NAME.fullmatch(key):
+                raise ValueError(f"Invalid section field: {key}")
+            set_fields[f"content.sections.$[{identifier}].{key}"] = value
+        if fields:
+            array_filters.append({f"{identifier}.type": section_type})
+
+    if "layout" in data:
+        set_fields["content.layout"] = data["layout"]
+    if "title" in data:
+        set_fields["content.title"] = data["title"]
+
+    return set_fields, array_filters, list(merged.values())
+
+
+def encode_cursor(website):
+    """
+    Build the opaque pagination cursor pointing just after a website.
+
+    Args:
+        website (dict): The last website document of a page; needs ``_id`` and
+            ``updated_at``.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    position = {"u": website["updated_at"].isoformat(), "i": str(website["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        tuple: ``(updated_at, _id)`` of the last website already returned.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(position["u"]), ObjectId(position["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_fields(fields):
+    """
+    Parse a comma-separated ``fields`` parameter into a projection.
+
+    Args:
+        fields (str): e.g. ``"business_type,content.title"``.
+
+    Returns:
+        dict or None: A Mongo projection, or None for whole documents.
+
+    Raises:
+        ValueError: If a field name is not a plain (dotted) field path.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*", name):
+            raise ValueError(f"Invalid field: {name}")
+    projection = {name: 1 for name in names}
+    # The keyset cursor needs these.
+    projection["updated_at"] = 1
+    return projection
+
+
+def find_user_websites(db, user_id, limit, cursor=None, projection=None, summary=False):
+    """
+    Open a Mongo cursor over one page of a user's websites, newest first.
+
+    Pages use keyset pagination on ``(updated_at, _id)``, served by the
+    ``user_updated_id`` index, so the cost of a page does not depend on how many
+    websites the user has or how deep the page is.
+
+    The cursor yields up to ``limit + 1`` documents; the extra one only tells
+    whether another page exists. Use ``list_user_websites`` for a list, or
+    iterate the cursor to stream the page.
+
+    Args:
+        db: The database connection object.
+        user_id (str): The owner's identity.
+        limit (int): Maximum number of websites to return.
+        cursor (str, optional): Cursor from the previous page.
+        projection (dict, optional): Fields to return (see ``parse_fields``).
+        summary (bool): Return only ``title``, ``headline`` and ``thumbnail_url``
+            per website instead of documents.
+
+    Returns:
+        Cursor or CommandCursor: The documents.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = {"user_id": user_id}
+    if cursor:
+        updated_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"updated_at": {"$lt": updated_at}},
+            {"updated_at": updated_at, "_id": {"$lt": last_id}},
+        ]
+    sort = [("updated_at", -1), ("_id", -1)]
+
+    if summary:
+        hero = {"$arrayElemAt": [
+            {"$filter": {
+                "input": {"$ifNull": ["$content.sections", []]},
+                "as": "section",
+                "cond": {"$eq": ["$$section.type", "hero"]},
+            }},
+            0,
+        ]}
+        return db.websites.aggregate([
+            {"$match": query},
+            {"$sort": dict(sort)},
+            {"$limit": limit + 1},
+            {"$addFields": {"_hero": hero}},
+            {"$project": {
+                "updated_at": 1,
+                "title": "$content.title",
+                "headline": "$_hero.body.headline",
+                "thumbnail_url": {"$ifNull": ["$content.thumbnail_url", "$_hero.image_url"]},
+            }},
+        ])
+    return db.websites.find(query, projection).sort(sort).limit(limit + 1)
+
+
+def list_user_websites(db, user_id, limit, cursor=None, projection=None, summary=False):
+    """
+    Fetch one page of a user's websites, newest first.
+
+    Takes the same arguments as ``find_user_websites``.
+
+    Returns:
+        tuple: ``(websites, next_cursor)``; ``next_cursor`` is None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    websites = list(find_user_websites(db, user_id, limit, cursor, projection, summary))
+    next_cursor = None
+    if len(websites) > limit:
+        websites = websites[:limit]
+        next_cursor = encode_cursor(websites[-1])
+    return websites, next_cursor
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from app.extensions import SITE_GENERATION_COST, charge_generation, limiter
+from app.models.website_model import get_website_document
+from app.routes.website_routes import _invalidate_website, _upstream_busy, _use_content_cache
+from app.utils.async_mongo import async_mongo
+from app.utils.content_cache import content_cache, normalize_key
+from app.utils.image_store import image_store
+from app.utils.metrics import metrics
+from app.utils.openai_helper import generate_site_content_async
+from app.utils.scheduler import PRIORITY_INTERACTIVE, UpstreamBusy, upstream_context
+from app.utils.singleflight import SingleFlightTimeout
+
+logger = logging.getLogger(__name__)
+
+
+async def generate_cached_content(business_type, industry, use_cache=True, on_generate=None):
+    """
+    ``content_cache.get_or_generate`` with ``generate_site_content_async``.
+
+    Cache reads and writes and the image store's downloads and resizing run in
+    worker threads; the OpenAI calls run on the event loop. Misses are coalesced
+    by ``content_cache.async_flight``, across processes when
+    ``SINGLE_FLIGHT_BACKEND`` is "mongo".
+
+    Args:
+        on_generate (callable): Called without arguments when this call
+            generates the content itself, rather than reading it from the cache
+            or sharing an identical generation already in flight.
+
+    Returns:
+        dict: Content owned by the caller, with images in the image store.
+    """
+    if content_cache.enabled and use_cache:
+        content = await asyncio.to_thread(content_cache.get, business_type, industry)
+        if content is not None:
+            return content
+
+    async def generate_and_store():
+        if on_generate is not None:
+            on_generate()
+        content = await generate_site_content_async(business_type, industry)
+        with metrics.span("store_images"):
+            content = await asyncio.to_thread(image_store.localize_content, content)
+        if content_cache.enabled:
+            try:
+                await asyncio.to_thread(content_cache.set, business_type, industry, content)
+            except Exception:
+                logger.exception("Failed to store generated content in the cache")
+        return content
+
+    return await content_cache.async_flight.do(normalize_key(business_type, industry), generate_and_store)
+
+
+def _admit_generation():
+    """
+    Authenticate and rate-limit a ``POST /website/generate`` request, as the sync view's decorators do.
+
+    Runs inside the request context. The generation budget is checked by
+    ``limiter.check``, which evaluates the sync view's ``generation_limit``; as
+    in the sync view, it is charged with ``charge_generation`` only when the
+    request generated the site.
+
+    Returns:
+        A response to send as is, ``"sync"`` to hand the request to the sync view
+        (async mode), or None to generate here.
+    """
+    verify_jwt_in_request()
+    limiter.check()
+
+    data = request.get_json()
+    if not isinstance(data, dict) or not data.get("business_type") or not data.get("industry"):
+        return jsonify({"error": "Missing fields"}), 400
+    if data.get("async") or request.args.get("async") in ("1", "true"):
+        return "sync"
+    return None
+
+
+def _store_website(website_doc, inserted_id):
+    _invalidate_website(website_doc["user_id"])
+    return (
+        jsonify(
+            {
+                "message": "Website generated successfully",
+                "website_id": str(inserted_id),
+                "content": website_doc["content"],
+            }
+        ),
+        201,
+    )
+
+
+def async_website_routes(flask_app):
+    """
+    Build the async routes served natively by ``app.asgi.AsgiApp``.
+
+    Only ``POST /website/generate`` runs as a coroutine: it is the route that
+    holds a request for a whole generation. The streaming, batch and section
+    routes stay sync views, served from the ASGI server's thread pool.
+
+    Args:
+        flask_app (Flask): The Flask application.
+
+    Returns:
+        dict: Coroutine functions by ``(method, path)``.
+    """
+
+    async def generate_website(flask_request):
+        """
+        ``POST /website/generate`` as a coroutine.
+
+        Same request, responses and status codes as the sync route, which it
+        shares its authentication, generation budget, error handlers and JSON
+        provider with. Requests for async mode (``"async": true``) return None
+        and are handled by the sync route, which queues a background job.
+        """
+        rv = await flask_request.run(flask_request.dispatch, _admit_generation)
+        if rv == "sync":
+            return None
+        if rv is not None:
+            return await flask_request.run(flask_request.finish, rv)
+
+        user_id, data, use_cache = await flask_request.run(
+            lambda: (get_jwt_identity(), request.get_json(), _use_content_cache(request.get_json()))
+        )
+        business_type = data["business_type"]
+        industry = data["industry"]
+
+        generated = []
+        try:
+            with upstream_context(user_id, PRIORITY_INTERACTIVE):
+                content = await generate_cached_content(
+                    business_type, industry, use_cache, on_generate=lambda: generated.append(True)
+                )
+            if generated:
+                await flask_request.run(charge_generation, SITE_GENERATION_COST)
+
+            website_doc = get_website_document(user_id, business_type, industry, content)
+            with metrics.span("insert_website"):
+                result = await async_mongo.db.websites.insert_one(website_doc)
+            rv = await flask_request.run(_store_website, website_doc, result.inserted_id)
+
+        except UpstreamBusy as e:
+            rv = await flask_request.run(_upstream_busy, e)
+
+        except SingleFlightTimeout as e:
+            rv = await flask_request.run(lambda: (jsonify({"error": str(e)}), 504))
+
+        except Exception as e:
+            logger.exception("Async website generation failed")
+            rv = await flask_request.run(lambda: (jsonify({"error": str(e)}), 500))
+
+        # Runs the after_request hooks.
+        return await flask_request.run(flask_request.finish, rv)
+
+    return {("POST", "/website/generate"): generate_website}
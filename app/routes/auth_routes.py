@@ -1,18 +1,34 @@
 from flask import Blueprint, request, jsonify,redirect
 from app import mongo
 from app.models.user_model import UserModel
+from app.utils.password_hasher import PasswordHasherBusy
 from flask_jwt_extended import create_access_token
+from pymongo.errors import DuplicateKeyError
 from datetime import timedelta
+import logging
 
 auth_bp = Blueprint("auth", __name__)
 
+logger = logging.getLogger(__name__)
+
+
+def _hasher_busy(error):
+    """Answer 503 with ``Retry-After`` when the password hashing pool is saturated."""
+    return (
+        jsonify({"message": str(error), "retry_after": error.retry_after}),
+        error.status_code,
+        {"Retry-After": str(error.retry_after)},
+    )
+
 @auth_bp.route("/register", methods=["POST"])
 def register():
     """
     Register a new user.
 
     This endpoint allows a user to register by providing their name, email, and password.
-    It checks if all required fields are provided and if the email is already registered.
+    It checks if all required fields are provided and if the email is already
+    registered, before paying for a password hash. The unique index on
+    ``users.email`` also rejects concurrent registrations of the same email.
 
     Request JSON:
     {
@@ -26,6 +42,7 @@ def register():
         400 Bad Request - If required fields are missing.
         409 Conflict - If the user with the given email already exists.
         500 Internal Server Error - If an unexpected error occurs.
+        503 Service Unavailable - Too many passwords are being hashed; retry after ``Retry-After`` seconds.
 
     Example Response:
     {
@@ -45,10 +62,16 @@ def register():
         if UserModel.find_by_email(mongo.db, email):
             return jsonify({"message": "User already exists"}), 409
 
-        UserModel.create_user(mongo.db, name, email, password)
+        try:
+            UserModel.create_user(mongo.db, name, email, password)
+        except DuplicateKeyError:
+            # Registered by a concurrent request since the check above.
+            return jsonify({"message": "User already exists"}), 409
 
         return jsonify({"message": "Registration successful. You can now log in."}), 201
 
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -60,6 +83,8 @@ def login():
 
     This endpoint allows users to log in using their email and password.
     Upon successful authentication, a JWT access token valid for 1 day is returned.
+    A password hash made with older ``PASSWORD_HASH_METHOD`` parameters is
+    replaced with a new one on the way.
 
     Request JSON:
     {
@@ -73,6 +98,7 @@ def login():
         404 Not Found - If the user does not exist.
         401 Unauthorized - If the password is incorrect.
         500 Internal Server Error - If an unexpected error occurs.
+        503 Service Unavailable - Too many passwords are being hashed; retry after ``Retry-After`` seconds.
 
     Example Response:
     {
@@ -95,6 +121,14 @@ def login():
         if not UserModel.verify_password(user, password):
             return jsonify({"message": "Invalid password"}), 401
 
+        try:
+            UserModel.rehash_password_if_needed(mongo.db, user, password)
+        except PasswordHasherBusy:
+            # The old hash still works; migrate it at a later login.
+            pass
+        except Exception:
+            logger.exception("Failed to rehash the password of %s", email)
+
         access_token = create_access_token(
             identity=email,
             expires_delta=timedelta(days=1)
@@ -106,6 +140,9 @@ def login():
             "user_name": user.get("name") 
         }), 200
 
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
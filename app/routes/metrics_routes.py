@@ -0,0 +1,34 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.extensions import limiter
+from app.utils.metrics import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+@limiter.exempt
+def prometheus_metrics():
+    """
+    Expose application metrics in the Prometheus text format.
+
+    Reports per-stage generation latency (chat completion, JSON extraction,
+    each image, image storage, Mongo inserts) and per-route request latency as
+    histograms with estimated p50/p95/p99, plus counters for upstream calls,
+    upstream errors, tokens used and content cache lookups. With ``METRICS_DIR``
+    set the values of every worker process are summed.
+
+    The route is exempt from rate limits so scrapes are never refused. With
+    ``METRICS_TOKEN`` set, it requires ``Authorization: Bearer <METRICS_TOKEN>``;
+    without it, anyone who can reach the app can read the metrics.
+
+    Returns:
+        200 OK - ``text/plain; version=0.0.4`` exposition.
+        401 Unauthorized - ``METRICS_TOKEN`` is set and was not sent.
+    """
+    token = current_app.config.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return jsonify({"error": "Unauthorized"}), 401, {"WWW-Authenticate": "Bearer"}
+
+    return Response(metrics.render(), mimetype="text/plain", content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,19 +1,216 @@
-from flask import Blueprint, request, jsonify, render_template
+import re
+from flask import Blueprint, Response, current_app, request, jsonify, render_template, url_for, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.utils.openai_helper import generate_site_content
-from app.models.website_model import get_website_document
+from app.utils.openai_helper import (
+    generate_section_content,
+    replay_site_content,
+    stream_site_content,
+)
+from app.utils.content_cache import content_cache
+from app.utils.image_store import image_store, generate_stored_site_content
+from app.utils.scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    UpstreamBusy,
+    upstream_context,
+    upstream_scheduler,
+)
+from app.utils.singleflight import SingleFlightTimeout
+from app.utils.jobs import job_queue
+from app.utils.batch import batch_generator, dedupe_items
+from app.utils.metrics import metrics
+from app.utils.page_cache import page_cache
+from app.utils.response_cache import cached_response, invalidate_tags
+from app.utils.site_publisher import site_publisher
+from app.models.website_model import (
+    build_section_update,
+    encode_cursor,
+    find_user_websites,
+    get_website_document,
+    list_user_websites,
+    parse_fields,
+    version_filter,
+    STATUS_PENDING,
+    STATUS_READY,
+    STATUS_RUNNING,
+)
 from app import mongo
 from datetime import datetime
 from bson import ObjectId
-from app.extensions import limiter
-from app.extensions import cache
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from app.extensions import SITE_GENERATION_COST, charge_generation, config_limit, generation_limit, limiter
 
 website_bp = Blueprint("website", __name__)
 
 
+def _list_params(user_id):
+    """
+    Read the listing parameters of the request.
+
+    Query Parameters:
+        limit (int): Page size, capped at ``WEBSITE_LIST_MAX_LIMIT``.
+        cursor (str): ``next_cursor`` of the previous page.
+        fields (str): Comma-separated fields to return, e.g. ``content.title,industry``.
+        summary (bool): ``1``/``true`` to return only title, hero headline and thumbnail.
+
+    Returns:
+        dict: Keyword arguments of ``list_user_websites`` and ``find_user_websites``.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    config = current_app.config
+    limit = request.args.get("limit", config["WEBSITE_LIST_DEFAULT_LIMIT"], type=int)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+
+    return {
+        "user_id": user_id,
+        "limit": min(limit, config["WEBSITE_LIST_MAX_LIMIT"]),
+        "cursor": request.args.get("cursor"),
+        "projection": parse_fields(request.args.get("fields")),
+        "summary": request.args.get("summary", "").lower() in ("1", "true"),
+    }
+
+
+def _list_websites(user_id):
+    """
+    Read the listing parameters of the request and fetch one page of websites.
+
+    Returns:
+        tuple: ``(websites, next_cursor)``.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    return list_user_websites(mongo.db, **_list_params(user_id))
+
+
+def _stream_website_page(websites, limit):
+    """
+    Stream ``{"websites": [...], "next_cursor": ...}`` straight from a Mongo cursor.
+
+    Documents are encoded in chunks as the cursor yields them; no list of the
+    page is built.
+
+    Args:
+        websites: Cursor from ``find_user_websites``.
+        limit (int): The page size the cursor was opened with.
+
+    Yields:
+        bytes: The response body.
+    """
+    provider = current_app.json
+    page = {"next_cursor": None}
+
+    def items():
+        last = None
+        try:
+            for count, website in enumerate(websites):
+                if count == limit:
+                    page["next_cursor"] = encode_cursor(last)
+                    break
+                last = website
+                yield website
+        finally:
+            websites.close()
+
+    yield b'{"websites":'
+    yield from provider.iter_array(items())
+    yield b',"next_cursor":' + provider.dumps_bytes(page["next_cursor"]) + b"}\n"
+
+
+def _invalidate_website(user_id, website_id=None):
+    """Drop cached responses and pages after a user's websites changed, and republish the website."""
+    tags = [f"user:{user_id}"]
+    if website_id is not None:
+        tags.append(f"site:{website_id}")
+        page_cache.invalidate(website_id)
+        site_publisher.republish(website_id)
+    invalidate_tags(*tags)
+
+
+def _if_match_version():
+    """
+    Read the expected document version from the ``If-Match`` header.
+
+    Returns:
+        int or None: The version, or None when the header is absent or ``*``.
+
+    Raises:
+        ValueError: If the header does not carry a version number.
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    tags = list(request.if_match.as_set())
+    try:
+        return int(tags[0])
+    except (IndexError, ValueError):
+        raise ValueError("If-Match must carry the website version, e.g. If-Match: \"3\"")
+
+
+def _write_conflict(object_id, user_id, sections_required=False):
+    """
+    Explain why a conditional write matched nothing.
+
+    Returns 404 if the website is gone, 409 if it is still being generated, 400
+    if the write needed ``content.sections`` (``sections_required``) and the
+    website has no sections array, and otherwise 409 for a version conflict.
+    """
+    current = mongo.db.websites.find_one(
+        {"_id": object_id, "user_id": user_id},
+        {"version": 1, "status": 1, "content.sections.type": 1},
+    )
+    if current is None:
+        return jsonify({"error": "Website not found or unauthorized"}), 404
+    if current.get("status") in (STATUS_PENDING, STATUS_RUNNING):
+        return jsonify({"error": "Website is still being generated"}), 409
+    if sections_required and not isinstance((current.get("content") or {}).get("sections"), list):
+        return jsonify({"error": "Website content has no sections to update"}), 400
+    return (
+        jsonify({
+            "error": "Website was modified by another request; reload and retry",
+            "version": current.get("version", 0),
+        }),
+        409,
+    )
+
+
+def _upstream_busy(error):
+    """
+    Answer with ``Retry-After`` when upstream capacity is exhausted (429) or
+    OpenAI is failing and its circuit breaker is open (503).
+    """
+    return (
+        jsonify({"error": str(error), "retry_after": error.retry_after}),
+        error.status_code,
+        {"Retry-After": str(error.retry_after)},
+    )
+
+
+def _batch_generation_cost():
+    """Generation budget a batch request needs: a whole site per unique, valid item."""
+    items = (request.get_json(silent=True) or {}).get("items")
+    unique = dedupe_items(items)[0] if isinstance(items, list) else {}
+    return SITE_GENERATION_COST * max(1, len(unique))
+
+
+def _section_generation_cost():
+    """Generation budget units of a section regeneration: its chat completion and images."""
+    return 4 if request.view_args.get("section_type") == "services" else 2
+
+
+def _use_content_cache(data):
+    """A request opts out of the content cache with ``"cache": false`` or ``Cache-Control: no-cache``."""
+    if data.get("cache", True) is False:
+        return False
+    return "no-cache" not in request.headers.get("Cache-Control", "")
+
+
 @website_bp.route("/generate", methods=["POST"])
 @jwt_required()
-@limiter.limit("100 per minute")
+@generation_limit(SITE_GENERATION_COST, deferred=True)
 def generate_website():
     """
     Generate and store a new website for the authenticated user using AI-generated content.
@@ -21,21 +218,47 @@ def generate_website():
     Request JSON Body:
         {
             "business_type": "string",
-            "industry": "string"
+            "industry": "string",
+            "async": false,
+            "cache": true
         }
 
     This endpoint accepts business type and industry details from the user,
     invokes an AI content generation utility to produce structured website content,
     and stores it in the MongoDB collection under the authenticated user's account.
 
+    With ``"async": true`` (or ``?async=1``) a pending website document is stored
+    and handed to the background job queue, and the endpoint returns immediately.
+    Poll ``GET /website/jobs/<job_id>`` for status and partial results.
+
+    Equivalent requests (same business type and industry, ignoring case and
+    spacing) are served from the content cache. Send ``"cache": false`` or a
+    ``Cache-Control: no-cache`` header to force a fresh generation.
+
+    Upstream calls go through the upstream scheduler at interactive priority
+    (background jobs run at batch priority). When the OpenAI quota cannot take
+    the request in time, 429 is returned with a ``Retry-After`` header before
+    any work is done.
+
+    A request needs 7 units, one per upstream call, of the user's generation
+    budget (``GENERATION_RATE_LIMIT``), which the streaming, batch and section
+    routes share, and is charged them only if it generated the site: content
+    served from the cache, or by an identical request already in flight, is
+    free. An async-mode request is charged when its job is queued.
+
     Returns:
         JSON response containing a success message, the inserted website's ID,
-        and the generated content.
+        and the generated content (or the job id in async mode).
 
     Status Codes:
         201 Created - Website successfully generated and stored.
+        202 Accepted - Generation job queued (async mode).
         400 Bad Request - Missing required fields in request body.
+        429 Too Many Requests - Generation budget spent (``GENERATION_RATE_LIMIT``), or upstream
+            quota exhausted; retry after ``Retry-After`` seconds.
         500 Internal Server Error - An unexpected error occurred during generation or insertion.
+        503 Service Unavailable - OpenAI is failing; retry after ``Retry-After`` seconds.
+        504 Gateway Timeout - An identical generation was in flight and did not finish in time.
     """
 
     data = request.get_json()
@@ -45,13 +268,54 @@ def generate_website():
     if not business_type or not industry:
         return jsonify({"error": "Missing fields"}), 400
 
+    run_async = data.get("async") or request.args.get("async") in ("1", "true")
+    use_cache = _use_content_cache(data)
+
     try:
         user_id = get_jwt_identity()
-        content = generate_site_content(business_type, industry)
+
+        if run_async:
+            upstream_scheduler.check("chat", PRIORITY_BATCH)
+            website_doc = get_website_document(user_id, business_type, industry, {}, status=STATUS_PENDING)
+            if not use_cache:
+                website_doc["use_cache"] = False
+            result = mongo.db.websites.insert_one(website_doc)
+            _invalidate_website(user_id)
+            job_queue.submit(result.inserted_id)
+            charge_generation(SITE_GENERATION_COST)
+
+            job_id = str(result.inserted_id)
+            status_url = url_for("website.get_job", job_id=job_id)
+            return (
+                jsonify(
+                    {
+                        "message": "Website generation started",
+                        "job_id": job_id,
+                        "website_id": job_id,
+                        "status": STATUS_PENDING,
+                        "status_url": status_url,
+                    }
+                ),
+                202,
+                {"Location": status_url},
+            )
+
+        generated = []
+
+        def generate(business_type, industry):
+            generated.append(True)
+            return generate_stored_site_content(business_type, industry)
+
+        with upstream_context(user_id, PRIORITY_INTERACTIVE):
+            content = content_cache.get_or_generate(business_type, industry, generate, use_cache)
+        if generated:
+            charge_generation(SITE_GENERATION_COST)
 
         website_doc = get_website_document(user_id, business_type, industry, content)
 
-        result = mongo.db.websites.insert_one(website_doc)
+        with metrics.span("insert_website"):
+            result = mongo.db.websites.insert_one(website_doc)
+        _invalidate_website(user_id)
 
         return (
             jsonify(
@@ -64,8 +328,334 @@ def generate_website():
             201,
         )
 
+    except UpstreamBusy as e:
+        return _upstream_busy(e)
+
+    except SingleFlightTimeout as e:
+        return jsonify({"error": str(e)}), 504
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+def _ndjson(data):
+    """Format one newline-delimited JSON record."""
+    return current_app.json.dumps(data) + "\n"
+
+
+@website_bp.route("/generate/batch", methods=["POST"])
+@jwt_required()
+@generation_limit(_batch_generation_cost, deferred=True)
+def generate_website_batch():
+    """
+    Generate and store many websites in one request, streaming per-item status.
+
+    Request JSON Body:
+        {
+            "items": [
+                {"business_type": "string", "industry": "string"},
+                ...
+            ],
+            "cache": true
+        }
+
+    Identical items (same business type and industry, ignoring case and spacing)
+    are generated and stored once; their duplicates point at the first occurrence.
+    Items run on the process-wide batch worker pool (``BATCH_GENERATION_CONCURRENCY``),
+    shared by all batch requests, through the content cache.
+
+    The response is ``application/x-ndjson``, one record per line. An ``item``
+    record is sent as each item finishes or is rejected; each generated website
+    is stored as soon as it is ready, so a client that disconnects keeps the
+    websites generated so far:
+
+        {"event": "item", "index": 0, "status": "generated", "website_id": "..."}
+        {"event": "item", "index": 3, "status": "duplicate", "duplicate_of": 0}
+        {"event": "item", "index": 2, "status": "invalid", "error": "Missing fields"}
+        {"event": "item", "index": 1, "status": "failed", "error": "..."}
+
+    Once every item has finished, a final record lists the stored websites:
+
+        {"event": "done", "websites": [{"index": 0, "website_id": "..."}, ...],
+         "generated": 1, "failed": 1, "invalid": 1, "duplicates": 1}
+
+    Items are generated at batch priority, behind interactive requests. An item
+    that cannot get upstream capacity in time fails with a ``retry_after``.
+
+    The request needs 7 units of generation budget per unique item to start, but
+    is charged, when the stream ends, 7 per item actually generated.
+
+    Status Codes:
+        200 OK - Stream started; per-item failures are reported in the stream.
+        400 Bad Request - ``items`` is missing, empty or too long.
+        429 Too Many Requests - Generation budget spent (``GENERATION_RATE_LIMIT``), or upstream
+            quota exhausted; retry after ``Retry-After`` seconds.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    max_items = current_app.config.get("BATCH_GENERATION_MAX_ITEMS", 50)
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > max_items:
+        return jsonify({"error": f"A batch may contain at most {max_items} items"}), 400
+
+    try:
+        upstream_scheduler.check("chat", PRIORITY_BATCH)
+    except UpstreamBusy as e:
+        return _upstream_busy(e)
+
+    user_id = get_jwt_identity()
+    use_cache = _use_content_cache(data)
+    unique, duplicates, invalid = dedupe_items(items)
+
+    def records():
+        generated = 0
+        websites = []
+        failed = 0
+        try:
+            for index in invalid:
+                yield _ndjson({"event": "item", "index": index, "status": "invalid", "error": "Missing fields"})
+            for index, first in duplicates.items():
+                yield _ndjson({"event": "item", "index": index, "status": "duplicate", "duplicate_of": first})
+
+            pending = {index: items[index] for index in unique.values()}
+            for index, content, error in batch_generator.run(pending, use_cache, user_id):
+                if error is None:
+                    generated += 1
+                    item = items[index]
+                    website_doc = get_website_document(user_id, item["business_type"], item["industry"], content)
+                    try:
+                        with metrics.span("insert_website"):
+                            result = mongo.db.websites.insert_one(website_doc)
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    failed += 1
+                    record = {"event": "item", "index": index, "status": "failed", "error": str(error)}
+                    if isinstance(error, UpstreamBusy):
+                        record["retry_after"] = error.retry_after
+                    yield _ndjson(record)
+                    continue
+                website_id = str(result.inserted_id)
+                websites.append({"index": index, "website_id": website_id})
+                yield _ndjson({"event": "item", "index": index, "status": "generated", "website_id": website_id})
+
+            websites.sort(key=lambda website: website["index"])
+            yield _ndjson({
+                "event": "done",
+                "websites": websites,
+                "generated": len(websites),
+                "failed": failed,
+                "invalid": len(invalid),
+                "duplicates": len(duplicates),
+            })
+        finally:
+            # Also when the client disconnected mid-stream.
+            if websites:
+                _invalidate_website(user_id)
+            charge_generation(SITE_GENERATION_COST * generated)
+
+    return Response(
+        stream_with_context(records()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
+@website_bp.route("/generate/stream", methods=["POST"])
+@jwt_required()
+@generation_limit(SITE_GENERATION_COST)
+def generate_website_stream():
+    """
+    Generate and store a new website, streaming progress as Server-Sent Events.
+
+    Request JSON Body:
+        {
+            "business_type": "string",
+            "industry": "string"
+        }
+
+    The response is a ``text/event-stream``. Events are sent as soon as each part
+    of the site is ready:
+
+        event: title    data: "Site title"
+        event: section  data: {"title": ..., "type": "hero", "body": ...}
+        event: image    data: {"section": "services", "index": 1, "url": "..."}
+        event: done     data: {"website_id": "...", "preview_url": "..."}
+        event: error    data: {"error": "..."}
+
+    ``index`` is ``null`` for sections with a single image. Image events carry the
+    upstream URL as soon as it resolves; the stored website points at the local
+    image store. The website is stored once all images have resolved, just before
+    the ``done`` event.
+
+    Status Codes:
+        200 OK - Stream started; failures after this point arrive as ``error`` events.
+        400 Bad Request - Missing required fields in request body.
+        429 Too Many Requests - Generation budget spent (``GENERATION_RATE_LIMIT``), or upstream
+            quota exhausted; retry after ``Retry-After`` seconds.
+    """
+    data = request.get_json()
+    business_type = data.get("business_type")
+    industry = data.get("industry")
+
+    if not business_type or not industry:
+        return jsonify({"error": "Missing fields"}), 400
+
+    user_id = get_jwt_identity()
+    use_cache = _use_content_cache(data)
+
+    cached = content_cache.get(business_type, industry) if content_cache.enabled and use_cache else None
+    if not cached:
+        try:
+            upstream_scheduler.check("chat")
+            upstream_scheduler.check("image")
+        except UpstreamBusy as e:
+            return _upstream_busy(e)
+
+    def events():
+        with upstream_context(user_id, PRIORITY_INTERACTIVE):
+            try:
+                if cached:
+                    stream = replay_site_content(cached)
+                else:
+                    stream = stream_site_content(business_type, industry)
+
+                for event, payload in stream:
+                    if event != "content":
+                        yield _sse(event, payload)
+                        continue
+
+                    if not cached:
+                        image_store.localize_content(payload)
+
+                    website_doc = get_website_document(user_id, business_type, industry, payload)
+                    with metrics.span("insert_website"):
+                        result = mongo.db.websites.insert_one(website_doc)
+                    _invalidate_website(user_id)
+
+                    if not cached and content_cache.enabled:
+                        try:
+                            content_cache.set(business_type, industry, payload)
+                        except Exception:
+                            current_app.logger.exception("Failed to store generated content in the cache")
+                    website_id = str(result.inserted_id)
+                    yield _sse("done", {
+                        "website_id": website_id,
+                        "preview_url": url_for("website.preview_website", website_id=website_id),
+                    })
+            except UpstreamBusy as e:
+                yield _sse("error", {"error": str(e), "retry_after": e.retry_after})
+            except Exception as e:
+                yield _sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@website_bp.route("/images/<digest>/<variant>", methods=["GET"])
+def serve_image(digest, variant):
+    """
+    Serve a generated image from the local image store.
+
+    Args:
+        digest (str): SHA-256 digest of the original image.
+        variant (str): ``thumb``, ``1x``, ``2x`` or ``orig``.
+
+    The best format the client accepts (AVIF, WebP, then the original) is served
+    with a strong ETag and ``Cache-Control: public, max-age=31536000, immutable``.
+
+    Returns:
+        200 OK - The image.
+        304 Not Modified - The client's cached copy is current.
+        404 Not Found - Unknown image or variant.
+    """
+    if not re.fullmatch(r"[0-9a-f]{64}", digest) or variant not in ("thumb", "1x", "2x", "orig"):
+        return jsonify({"error": "Image not found"}), 404
+
+    response = image_store.send(digest, variant)
+    if response is None:
+        return jsonify({"error": "Image not found"}), 404
+    return response
+
+
+@website_bp.route("/published/<website_id>/", defaults={"filename": "index.html"}, methods=["GET"])
+@website_bp.route("/published/<website_id>/<path:filename>", methods=["GET"])
+def serve_published_file(website_id, filename):
+    """
+    Serve a file of a published website's static bundle.
+
+    Args:
+        website_id (str): The website's id.
+        filename (str): ``index.html`` (the default) or ``images/<name>``.
+
+    Returns:
+        200 OK - The file.
+        304 Not Modified - The client's cached copy is current.
+        404 Not Found - The website is not published or the file does not exist.
+    """
+    response = site_publisher.send(website_id, filename)
+    if response is None:
+        return jsonify({"error": "Website not published"}), 404
+    return response
+
+
+@website_bp.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+@limiter.limit(config_limit("API_RATE_LIMIT"))
+def get_job(job_id):
+    """
+    Report the status of a background generation job.
+
+    Args:
+        job_id (str): The job id returned by ``POST /website/generate`` in async mode,
+            which is also the id of the website document being generated.
+
+    Returns:
+        JSON response with the job status (``pending``, ``running``, ``ready`` or
+        ``failed``), the content generated so far and, for failed jobs, the error.
+
+    Status Codes:
+        200 OK - Job found.
+        400 Bad Request - Invalid job ID.
+        404 Not Found - Job does not exist or belongs to another user.
+    """
+    try:
+        object_id = ObjectId(job_id)
+    except InvalidId:
+        return jsonify({"error": "Invalid job ID"}), 400
+
+    job = mongo.db.websites.find_one(
+        {"_id": object_id, "user_id": get_jwt_identity()},
+        {"status": 1, "content": 1, "error": 1, "updated_at": 1},
+    )
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    status = job.get("status", STATUS_READY)
+    response = {
+        "job_id": job_id,
+        "website_id": job_id,
+        "status": status,
+        "content": job.get("content") or {},
+        "updated_at": job.get("updated_at"),
+    }
+    if job.get("error"):
+        response["error"] = job["error"]
+    if status == STATUS_READY:
+        response["preview_url"] = url_for("website.preview_website", website_id=job_id)
+
+    return jsonify(response), 200
+
     
 @website_bp.route('/preview/<website_id>')
 def preview_website(website_id):
@@ -77,6 +667,12 @@ def preview_website(website_id):
     the `preview.html` template with the website content. If not found,
     it returns a 404 error.
 
+    Rendered pages are cached per process and carry a strong ETag, so a request
+    with a matching `If-None-Match` is answered with 304 Not Modified.
+
+    Published websites are served from their static bundle, without MongoDB or
+    template rendering.
+
     Args:
         website_id (str): The ID of the website document to be previewed.
 
@@ -84,12 +680,10 @@ def preview_website(website_id):
         str: Rendered HTML of the website preview if found.
         tuple: A 404 error message and status code if the website is not found.
     """
-    website = mongo.db.websites.find_one({"_id": ObjectId(website_id)})
-    if not website:
-        return "Website not found", 404
-
-    content = website.get("content", {})
-    return render_template("preview.html", content=content)
+    response = site_publisher.send(website_id)
+    if response is not None:
+        return response
+    return page_cache.render_website(website_id)
 
 @website_bp.route("/profile", methods=["GET"])
 def profile_page():
@@ -99,19 +693,34 @@ def profile_page():
 @website_bp.route("/api/profile", methods=["GET"])
 @jwt_required()
 def profile_api():
+    """
+    Return one page of the authenticated user's websites for the profile page.
+
+    Supports the ``limit``, ``cursor``, ``fields`` and ``summary`` query parameters
+    (see ``_list_params``). Follow ``next_cursor`` until it is null to read
+    every website. The body is streamed from the Mongo cursor as it is read.
+
+    Returns:
+        200 OK: ``{"websites": [...], "next_cursor": "..." | null}``.
+        400 Bad Request: Invalid cursor, limit or fields.
+    """
     user_id = get_jwt_identity()
-    websites = list(mongo.db.websites.find({"user_id": user_id}))
-    
-    for site in websites:
-        site["_id"] = str(site["_id"])
+    try:
+        params = _list_params(user_id)
+        websites = find_user_websites(mongo.db, **params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({"websites": websites})
+    return Response(
+        stream_with_context(_stream_website_page(websites, params["limit"])),
+        mimetype="application/json",
+    )
 
 
 @website_bp.route("/<website_id>", methods=["GET"])
 @jwt_required()
-@limiter.limit("100 per minute")
-@cache.cached(timeout=300)
+@limiter.limit(config_limit("API_RATE_LIMIT"))
+@cached_response("user:{user}", "site:{website_id}")
 def get_website_by_id(website_id):
     """
     Retrieve a specific website by its ID for the authenticated user.
@@ -121,6 +730,8 @@ def get_website_by_id(website_id):
 
     This endpoint fetches a website from the database if it exists and belongs to
     the currently authenticated user. The website ID must be a valid MongoDB ObjectId.
+    The document's `version` is returned as the `ETag` header, ready to be sent back
+    in `If-Match` on updates.
 
     Returns:
         JSON response containing the website data if found.
@@ -140,8 +751,7 @@ def get_website_by_id(website_id):
         if not website:
             return jsonify({"error": "Website not found"}), 404
 
-        website["_id"] = str(website["_id"])
-        return jsonify(website), 200
+        return jsonify(website), 200, {"ETag": f'"{website.get("version", 0)}"'}
 
     except Exception as e:
         return (
@@ -157,34 +767,45 @@ def get_website_by_id(website_id):
 
 @website_bp.route("/user", methods=["GET"])
 @jwt_required()
-@limiter.limit("100 per minute")
-@cache.cached(timeout=300)
+@limiter.limit(config_limit("API_RATE_LIMIT"))
+@cached_response("user:{user}")
 def get_user_websites():
     """
-    Get all websites created by the currently authenticated user.
+    Get the websites created by the currently authenticated user, newest first.
 
-    This endpoint retrieves all website documents from the database that are associated
+    This endpoint retrieves website documents from the database that are associated
     with the user identified by the JWT token. It ensures that users can only access
     their own websites.
 
+    Results are paginated with the ``limit``, ``cursor``, ``fields`` and ``summary``
+    query parameters (see ``_list_params``). When more websites exist, the cursor
+    of the next page is returned in the ``X-Next-Cursor`` header and as a
+    ``Link: <...>; rel="next"`` header.
+
     Returns:
-        JSON response containing a list of the user's websites, each with its `_id`
-        converted to a string.
+        JSON response containing a list of the user's websites. `_id` is encoded
+        as a string and datetimes as ISO 8601 by the app's JSON provider.
 
     Status Codes:
         200 OK - Successful retrieval of websites.
+        400 Bad Request - Invalid cursor, limit or fields.
         500 Internal Server Error - Unexpected error occurred.
     """
     try:
         user_id = get_jwt_identity()
-        websites = mongo.db.websites.find({"user_id": user_id})
+        try:
+            websites, next_cursor = _list_websites(user_id)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        result = []
-        for site in websites:
-            site["_id"] = str(site["_id"])
-            result.append(site)
+        headers = {}
+        if next_cursor:
+            args = request.args.to_dict()
+            args["cursor"] = next_cursor
+            headers["X-Next-Cursor"] = next_cursor
+            headers["Link"] = f'<{url_for("website.get_user_websites", **args)}>; rel="next"'
 
-        return jsonify(result), 200
+        return jsonify(websites), 200, headers
 
     except Exception as e:
         return (
@@ -200,7 +821,7 @@ def get_user_websites():
 
 @website_bp.route("/<website_id>", methods=["PUT"])
 @jwt_required()
-@limiter.limit("100 per minute")
+@limiter.limit(config_limit("API_RATE_LIMIT"))
 def update_website(website_id):
     """
     Update a website by its ID for the authenticated user.
@@ -233,15 +854,25 @@ def update_website(website_id):
             }
         }
 
+    An optional `If-Match: "<version>"` header makes the update conditional on the
+    website's current version.
+
     Returns:
         200 OK: If the website is successfully updated.
+        400 Bad Request: If the If-Match header is invalid.
         404 Not Found: If the website does not exist or does not belong to the user.
+        409 Conflict: If the website's version no longer matches If-Match.
         500 Internal Server Error: For unexpected errors.
     """
     try:
         data = request.get_json()
         user_id = get_jwt_identity()
 
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         update_fields = {
             "business_type": data.get("business_type"),
             "industry": data.get("industry"),
@@ -250,14 +881,26 @@ def update_website(website_id):
             "updated_at": datetime.utcnow(),
         }
 
-        result = mongo.db.websites.update_one(
-            {"_id": ObjectId(website_id), "user_id": user_id}, {"$set": update_fields}
+        query = {"_id": ObjectId(website_id), "user_id": user_id}
+        if expected_version is not None:
+            query.update(version_filter(expected_version))
+
+        website = mongo.db.websites.find_one_and_update(
+            query,
+            {"$set": update_fields, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
         )
 
-        if result.matched_count == 0:
-            return jsonify({"error": "Website not found or unauthorized"}), 404
+        if website is None:
+            if expected_version is None:
+                return jsonify({"error": "Website not found or unauthorized"}), 404
+            return _write_conflict(query["_id"], user_id)
 
-        return jsonify({"message": "Website updated"}), 200
+        _invalidate_website(user_id, website_id)
+        response = jsonify({"message": "Website updated", "version": website["version"]})
+        response.set_etag(str(website["version"]))
+        return response, 200
 
     except Exception as e:
         return (
@@ -271,24 +914,32 @@ def update_website(website_id):
         )
 
 
-from bson.errors import InvalidId
-
 @website_bp.route("/<website_id>/content", methods=["PATCH"])
 @jwt_required()
-@limiter.limit("100 per minute")
+@limiter.limit(config_limit("API_RATE_LIMIT"))
 def patch_website_content(website_id):
     """
     Update the content sections of a website document by its ID.
 
     This route requires user authentication and is rate-limited to 100 requests per minute.
 
-    The authenticated user must be the owner of the website. The content's sections will be updated
-    based on the `type` of each section. If a section of the same `type` already exists, it will be updated;
-    otherwise, the new section will be added. Layout and title updates are also supported.
+    The authenticated user must be the owner of the website. Each section in the request
+    is matched to the stored section of the same `type` and only the fields it contains
+    are written, with a targeted `$set` per field (arrayFilters). Sections not in the
+    request are left untouched; sections of a new `type` are appended. Layout and title
+    updates are also supported.
+
+    Every write increments the document's `version`. Send the version you edited in an
+    `If-Match` header to make the update conditional: if the website changed in the
+    meantime, nothing is written and 409 Conflict is returned instead of overwriting the
+    other edit. The new version is returned in the body and as the `ETag` header.
 
     Args:
         website_id (str): The string representation of the website's ObjectId.
 
+    Request Headers:
+        If-Match: "<version>" (optional)
+
     Request Body (JSON):
         {
             "sections": [  # list of section objects
@@ -304,9 +955,13 @@ def patch_website_content(website_id):
 
     Returns:
         Response:
-            - 200 OK with success message on successful update.
-            - 400 Bad Request if the website ID is invalid or no content is provided.
+            - 200 OK with success message and the new version on successful update.
+            - 400 Bad Request if the website ID, If-Match header or body is invalid.
+            - 400 Bad Request if sections are updated on a website without a sections array.
             - 404 Not Found if the website does not exist or user is unauthorized.
+            - 409 Conflict if the website is still being generated, its version no longer
+              matches If-Match, or another request changed it between the update and the
+              appending of new sections (the update was applied; retry to append them).
             - 500 Internal Server Error if an unexpected error occurs.
     """
     try:
@@ -321,58 +976,236 @@ def patch_website_content(website_id):
         if not data:
             return jsonify({"error": "No content provided"}), 400
 
+        try:
+            expected_version = _if_match_version()
+            update, array_filters, sections = build_section_update(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        query = {"_id": object_id, "user_id": user_id}
+        if expected_version is not None:
+            query.update(version_filter(expected_version))
+        if array_filters:
+            # arrayFilters need an existing array to apply to.
+            query["content.sections"] = {"$type": "array"}
+
+        website = mongo.db.websites.find_one_and_update(
+            query,
+            {"$set": update, "$inc": {"version": 1}},
+            array_filters=array_filters or None,
+            projection={"version": 1, "content.sections.type": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if website is None:
+            return _write_conflict(object_id, user_id, sections_required=bool(array_filters))
+
+        version = website["version"]
+        existing_types = {s.get("type") for s in website.get("content", {}).get("sections", [])}
+        missing = [section for section in sections if section["type"] not in existing_types]
+        if missing:
+            # Only new section types need a second write. It applies on top of
+            # the first one only, so no concurrent edit is overwritten.
+            missing_types = [s["type"] for s in missing]
+            appended = mongo.db.websites.find_one_and_update(
+                {"_id": object_id, **version_filter(version), "content.sections.type": {"$nin": missing_types}},
+                {"$push": {"content.sections": {"$each": missing}}, "$inc": {"version": 1}},
+                projection={"version": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if appended is None:
+                _invalidate_website(user_id, website_id)
+                return _write_conflict(object_id, user_id)
+            version = appended["version"]
+
+        _invalidate_website(user_id, website_id)
+
+        response = jsonify({"message": "Content updated successfully", "version": version})
+        response.set_etag(str(version))
+        return response, 200
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "error": "An error occurred while updating content.",
+            "details": str(e)
+        }), 500
+
+
+@website_bp.route("/<website_id>/sections/<section_type>/regenerate", methods=["POST"])
+@jwt_required()
+@generation_limit(_section_generation_cost)
+def regenerate_website_section(website_id, section_type):
+    """
+    Regenerate one section of a website, keeping the rest of the site.
+
+    This route requires user authentication. It draws 2 units (4 for `services`)
+    from the user's generation budget (`GENERATION_RATE_LIMIT`), against 7 for a whole site.
+
+    A prompt for just this section is built from the stored `business_type`,
+    `industry` and the other sections' text, and images are generated only for
+    this section's entries: one chat completion and one image (a few for
+    `services`) instead of a whole site. The new section replaces the stored one
+    with a targeted update (arrayFilters) that leaves the other sections alone.
+
+    As with the content PATCH, send the version you are looking at in `If-Match`
+    to get 409 Conflict instead of a write if the website changed meanwhile.
+    The new version is returned in the body and as the `ETag` header.
+
+    Args:
+        website_id (str): The string representation of the website's ObjectId.
+        section_type (str): The `type` of the section to regenerate, e.g. `services`.
+
+    Request Headers:
+        If-Match: "<version>" (optional)
+
+    Returns:
+        Response:
+            - 200 OK with the new section and version.
+            - 400 Bad Request if the website ID or If-Match header is invalid.
+            - 404 Not Found if the website or section does not exist or user is unauthorized.
+            - 409 Conflict if the website is still being generated or its version no longer matches If-Match.
+            - 429 Too Many Requests if the upstream quota is exhausted; retry after `Retry-After` seconds.
+            - 500 Internal Server Error if an unexpected error occurs.
+            - 503 Service Unavailable if OpenAI is failing; retry after `Retry-After` seconds.
+    """
+    try:
+        try:
+            object_id = ObjectId(website_id)
+        except InvalidId:
+            return jsonify({"error": "Invalid website ID"}), 400
+
+        try:
+            expected_version = _if_match_version()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        user_id = get_jwt_identity()
         website = mongo.db.websites.find_one(
-            {"_id": object_id, "user_id": user_id}
+            {"_id": object_id, "user_id": user_id},
+            {"business_type": 1, "industry": 1, "content.sections": 1, "status": 1, "version": 1},
         )
-        if not website:
+        if website is None:
             return jsonify({"error": "Website not found or unauthorized"}), 404
-
-        content = website.get("content", {})
-        new_sections = data.get("sections", [])
-        updated_sections = []
-
-        for new_section in new_sections:
-            section_type = new_section.get("type")
-            if not section_type:
-                continue
-
-            # Try to find the existing section with the same type
-            existing_section = next((s for s in content.get("sections", []) if s.get("type") == section_type), None)
-
-            if existing_section:
-                # Update existing section
-                existing_section.update(new_section)
-                updated_sections.append(existing_section)
-            else:
-                # Add new section
-                updated_sections.append(new_section)
-
-        content["sections"] = updated_sections
-        content["layout"] = data.get("layout", content.get("layout", "default"))
-        content["title"] = data.get("title", content.get("title", ""))
-
-        mongo.db.websites.update_one(
-            {"_id": object_id},
-            {"$set": {"content": content, "updated_at": datetime.utcnow()}}
+        if website.get("status") in (STATUS_PENDING, STATUS_RUNNING):
+            return jsonify({"error": "Website is still being generated"}), 409
+
+        version = website.get("version", 0)
+        if expected_version is not None and expected_version != version:
+            return _write_conflict(object_id, user_id)
+
+        sections = website.get("content", {}).get("sections", [])
+        if not any(section.get("type") == section_type for section in sections):
+            return jsonify({"error": f"Website has no {section_type!r} section"}), 404
+
+        with upstream_context(user_id, PRIORITY_INTERACTIVE):
+            section = generate_section_content(website["business_type"], website["industry"], section_type, sections)
+        with metrics.span("store_images"):
+            localized = image_store.localize_content({"sections": [section]})
+
+        update = {"content.sections.$[s]": section, "updated_at": datetime.utcnow()}
+        if "thumbnail_url" in localized:
+            update["content.thumbnail_url"] = localized["thumbnail_url"]
+
+        query = {"_id": object_id, "user_id": user_id, "content.sections": {"$type": "array"}}
+        if expected_version is not None:
+            query.update(version_filter(expected_version))
+
+        website = mongo.db.websites.find_one_and_update(
+            query,
+            {"$set": update, "$inc": {"version": 1}},
+            array_filters=[{"s.type": section_type}],
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
         )
+        if website is None:
+            return _write_conflict(object_id, user_id, sections_required=True)
+
+        _invalidate_website(user_id, website_id)
 
-        return jsonify({"message": "Content updated successfully"}), 200
+        response = jsonify({
+            "message": "Section regenerated successfully",
+            "section": section,
+            "version": website["version"],
+        })
+        response.set_etag(str(website["version"]))
+        return response, 200
+
+    except UpstreamBusy as e:
+        return _upstream_busy(e)
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        current_app.logger.exception("Failed to regenerate section %s of website %s", section_type, website_id)
         return jsonify({
-            "error": "An error occurred while updating content.",
+            "error": "An error occurred while regenerating the section.",
             "details": str(e)
         }), 500
 
 
+@website_bp.route("/<website_id>/publish", methods=["POST", "DELETE"])
+@jwt_required()
+@limiter.limit(config_limit("API_RATE_LIMIT"))
+def publish_website(website_id):
+    """
+    Publish (POST) or unpublish (DELETE) a website.
+
+    This route requires user authentication and is rate-limited to 100 requests per minute.
+
+    Publishing renders the website once into a static HTML bundle with its images
+    on local disk. From then on the public views (`/website/preview/<id>`,
+    `/website/websitecontent/<id>` and `/website/published/<id>/`) serve that
+    bundle without MongoDB or template rendering, and every update republishes it.
+    Unpublishing deletes the bundle.
+
+    Args:
+        website_id (str): The string representation of the website's ObjectId.
+
+    Returns:
+        Response:
+            - 200 OK with the published URL (POST) or a success message (DELETE), and the new version.
+            - 400 Bad Request if the website ID is invalid.
+            - 404 Not Found if the website does not exist or user is unauthorized.
+            - 409 Conflict if the website is still being generated.
+            - 500 Internal Server Error if the bundle could not be written.
+    """
+    try:
+        object_id = ObjectId(website_id)
+    except InvalidId:
+        return jsonify({"error": "Invalid website ID"}), 400
 
+    user_id = get_jwt_identity()
+    publish = request.method == "POST"
+    query = {"_id": object_id, "user_id": user_id}
+    if publish:
+        query["status"] = {"$in": [STATUS_READY, None]}
+
+    website = mongo.db.websites.find_one_and_update(
+        query,
+        {"$set": {"is_published": publish, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if website is None:
+        if publish and mongo.db.websites.find_one({"_id": object_id, "user_id": user_id}, {"_id": 1}):
+            return jsonify({"error": "Website is still being generated"}), 409
+        return jsonify({"error": "Website not found or unauthorized"}), 404
+
+    _invalidate_website(user_id, website_id)
+
+    if not publish:
+        return jsonify({"message": "Website unpublished", "version": website["version"]}), 200
+    if not site_publisher.has_bundle(website_id):
+        return jsonify({"error": "The website could not be published."}), 500
+    return jsonify({
+        "message": "Website published",
+        "url": url_for("website.serve_published_file", website_id=website_id),
+        "version": website["version"],
+    }), 200
 
 
 @website_bp.route("/<website_id>", methods=["DELETE"])
 @jwt_required()
-@limiter.limit("100 per minute")
+@limiter.limit(config_limit("API_RATE_LIMIT"))
 def delete_website(website_id):
     """
     Deletes a website by its ID for the authenticated user.
@@ -398,6 +1231,8 @@ def delete_website(website_id):
         if result.deleted_count == 0:
             return jsonify({"error": "Website not found or unauthorized"}), 404
 
+        _invalidate_website(user_id, website_id)
+
         return jsonify({"message": "Website deleted"}), 200
 
     except Exception as e:
@@ -418,7 +1253,8 @@ def view_website(website_id):
     Render a preview of the website content by website ID.
 
     This route is accessible with or without a valid JWT token.
-    It attempts to fetch the website document from the database using the provided ID,
+    Published websites are served from their static bundle. Otherwise it attempts
+    to fetch the website document from the database using the provided ID,
     and if found, renders the "preview.html" template with the website's content.
 
     Args:
@@ -427,20 +1263,13 @@ def view_website(website_id):
     Returns:
         Response: 
             - Renders "preview.html" with the website content if found.
+            - Returns 304 Not Modified if `If-None-Match` matches the page's ETag.
             - Returns a 400 error if the ID is invalid.
             - Returns a 404 error if the website is not found in the database.
     """
-    try:
-        object_id = ObjectId(website_id)
-    except InvalidId:
-        return "Invalid website ID", 400
-
-    website = mongo.db.websites.find_one({"_id": object_id})
-    if not website:
-        return "Website not found", 404
-
-    content = website.get("content", {})
-
-    return render_template("preview.html", content=content)
+    response = site_publisher.send(website_id)
+    if response is not None:
+        return response
+    return page_cache.render_website(website_id)
 
 
@@ -0,0 +1,45 @@
+from pymongo import AsyncMongoClient
+
+
+class AsyncMongo:
+    """
+    MongoDB access for coroutines, through pymongo's ``AsyncMongoClient``.
+
+    The ASGI routes use it instead of ``app.mongo`` so database round trips do
+    not block the event loop. The client is created on first use, inside the
+    running loop, from the same ``MONGO_URI``.
+    """
+
+    def __init__(self, app=None):
+        self.uri = None
+        self._client = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read the connection string from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.uri = app.config.get("MONGO_URI")
+
+    @property
+    def cx(self):
+        if self._client is None:
+            self._client = AsyncMongoClient(self.uri)
+        return self._client
+
+    @property
+    def db(self):
+        return self.cx.get_default_database()
+
+    async def close(self):
+        """Close the client, if one was created."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+async_mongo = AsyncMongo()
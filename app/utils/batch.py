@@ -0,0 +1,110 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.utils.content_cache import content_cache, normalize_key
+from app.utils.image_store import generate_stored_site_content
+from app.utils.openai_helper import PROMPT_VERSION
+from app.utils.scheduler import PRIORITY_BATCH, upstream_context
+
+logger = logging.getLogger(__name__)
+
+
+def dedupe_items(items):
+    """
+    Group batch items by their normalized ``(business_type, industry)`` key.
+
+    Args:
+        items (list): ``{"business_type", "industry"}`` dicts, in request order.
+
+    Returns:
+        tuple: ``(unique, duplicates, invalid)`` where ``unique`` maps each key to
+        the index of its first occurrence, ``duplicates`` maps the index of every
+        repeated item to that first index, and ``invalid`` lists the indexes of
+        items missing a field.
+    """
+    unique, duplicates, invalid = {}, {}, []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("business_type") or not item.get("industry"):
+            invalid.append(index)
+            continue
+        key = normalize_key(item["business_type"], item["industry"], PROMPT_VERSION)
+        if key in unique:
+            duplicates[index] = unique[key]
+        else:
+            unique[key] = index
+    return unique, duplicates, invalid
+
+
+class BatchGenerator:
+    """
+    Shared worker pool for bulk website generation.
+
+    Every batch request in the process runs its items on the same pool of
+    ``BATCH_GENERATION_CONCURRENCY`` workers, so several large batches together
+    never make more concurrent generations than the upstream quota allows; extra
+    items wait in the pool's queue. Items still go through the content cache and
+    single-flight, so a batch never pays twice for a site that is cached or
+    already being generated elsewhere. Upstream calls are queued at batch
+    priority, behind interactive requests.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the worker pool from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.app = app
+        self.max_items = app.config.get("BATCH_GENERATION_MAX_ITEMS", 50)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get("BATCH_GENERATION_CONCURRENCY", 4),
+            thread_name_prefix="site-batch",
+        )
+
+    def _generate(self, item, use_cache, user):
+        with self.app.app_context(), upstream_context(user, PRIORITY_BATCH):
+            return content_cache.get_or_generate(
+                item["business_type"], item["industry"], generate_stored_site_content, use_cache
+            )
+
+    def run(self, items, use_cache=True, user=None):
+        """
+        Generate content for each item, yielding results as they complete.
+
+        Args:
+            items (dict): Items to generate, keyed by an id of the caller's choice.
+            use_cache (bool): Whether to read and fill the content cache.
+            user (str, optional): The user the batch runs for.
+
+        Yields:
+            tuple: ``(item_id, content, error)``; exactly one of ``content`` and
+            ``error`` (the exception raised) is set.
+
+        Closing the generator early (the client disconnected) cancels the items
+        that have not started yet.
+        """
+        futures = {
+            self._executor.submit(self._generate, item, use_cache, user): item_id
+            for item_id, item in items.items()
+        }
+        try:
+            for future in as_completed(futures):
+                item_id = futures[future]
+                try:
+                    yield item_id, future.result(), None
+                except Exception as e:
+                    logger.exception("Batch generation item failed")
+                    yield item_id, None, e
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+batch_generator = BatchGenerator()
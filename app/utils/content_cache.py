@@ -0,0 +1,246 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app import mongo
+from app.config import Config
+from app.utils.metrics import metrics
+from app.utils.openai_helper import PROMPT_VERSION
+from app.utils.singleflight import AsyncSingleFlight, MongoLeaseStore, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_key(business_type, industry, prompt_version=PROMPT_VERSION):
+    """
+    Build the cache key for a generation request.
+
+    Casing and runs of whitespace are ignored, so "Coffee  Shop" and "coffee shop"
+    share an entry. The prompt version is part of the key so a prompt change never
+    serves content generated by an older prompt.
+
+    Args:
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+        prompt_version (int): Version of the generation prompt.
+
+    Returns:
+        str: The normalized cache key.
+    """
+    def normalize(value):
+        return " ".join(str(value).lower().split())
+
+    return f"v{prompt_version}:{normalize(business_type)}|{normalize(industry)}"
+
+
+def _image_urls(content):
+    for section in content.get("sections", []):
+        if "image_url" in section:
+            yield section["image_url"]
+        yield from section.get("image_urls") or []
+
+
+def is_cacheable(content):
+    """Return True if every image of the content was generated (no placeholders)."""
+    return all(url and url != Config.IMAGE_PLACEHOLDER_URL for url in _image_urls(content))
+
+
+def has_remote_images(content):
+    """Return True if the content still points at expiring upstream image URLs."""
+    return any(url.startswith(("http://", "https://")) for url in _image_urls(content))
+
+
+class ContentCache:
+    """
+    Two-level cache for generated site content.
+
+    Entries live in the ``content_cache`` Mongo collection, which has a TTL index
+    on ``expires_at`` so Mongo expires them, and are fronted by a bounded
+    in-process LRU. Every read returns a deep copy so callers can edit the content
+    freely without touching the cached entry.
+
+    Misses go through a ``SingleFlight`` (``async_flight`` for coroutines) so a
+    burst of identical requests makes a single upstream generation; with
+    ``SINGLE_FLIGHT_BACKEND = "mongo"`` the coalescing also spans processes.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.ttl = 7 * 24 * 3600
+        self.remote_image_ttl = 3000
+        self.lru_size = 256
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "lru_hits": 0, "misses": 0}
+        self.flight = SingleFlight("content")
+        self.async_flight = AsyncSingleFlight("content")
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the cache from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.enabled = app.config.get("CONTENT_CACHE_ENABLED", True)
+        self.ttl = app.config.get("CONTENT_CACHE_TTL", 7 * 24 * 3600)
+        self.remote_image_ttl = app.config.get("CONTENT_CACHE_REMOTE_IMAGE_TTL", 3000)
+        self.lru_size = app.config.get("CONTENT_CACHE_LRU_SIZE", 256)
+
+        lease_store = None
+        if app.config.get("SINGLE_FLIGHT_BACKEND", "local") == "mongo":
+            lease_store = MongoLeaseStore(
+                lambda: mongo.db.generation_leases,
+                lease_seconds=app.config.get("SINGLE_FLIGHT_LEASE_SECONDS", 120),
+            )
+        self.flight = SingleFlight(
+            "content",
+            lease_store=lease_store,
+            wait_timeout=app.config.get("SINGLE_FLIGHT_WAIT_TIMEOUT", 120),
+        )
+        # For the ASGI routes; shares the leases of ``flight``.
+        self.async_flight = AsyncSingleFlight(
+            "content",
+            lease_store=lease_store,
+            wait_timeout=app.config.get("SINGLE_FLIGHT_WAIT_TIMEOUT", 120),
+        )
+
+    @property
+    def collection(self):
+        return mongo.db.content_cache
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counters[name] += 1
+        for name in names:
+            metrics.inc("content_cache_requests_total", result=name)
+
+    def stats(self):
+        """Return a snapshot of the hit/miss counters."""
+        with self._lock:
+            return dict(self.counters)
+
+    def get(self, business_type, industry):
+        """
+        Look up cached content.
+
+        Returns:
+            dict or None: A deep copy of the cached content, or None on a miss.
+        """
+        key = normalize_key(business_type, industry)
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._lru.move_to_end(key)
+                content = entry[1]
+            else:
+                content = None
+                self._lru.pop(key, None)
+        if content is not None:
+            self._count("hits", "lru_hits")
+            return copy.deepcopy(content)
+
+        doc = self.collection.find_one({"_id": key})
+        if not doc:
+            self._count("misses")
+            return None
+
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        if remaining <= 0:
+            # The TTL monitor only runs once a minute.
+            self._count("misses")
+            return None
+
+        self._remember(key, doc["content"], remaining)
+        self._count("hits")
+        return copy.deepcopy(doc["content"])
+
+    def set(self, business_type, industry, content):
+        """
+        Store generated content unless it contains placeholder images.
+
+        Content that still references upstream image URLs is kept only for
+        ``CONTENT_CACHE_REMOTE_IMAGE_TTL`` seconds, before those URLs expire.
+
+        Args:
+            business_type (str): The type of business the website represents.
+            industry (str): The industry the business operates in.
+            content (dict): The generated content.
+        """
+        if not is_cacheable(content):
+            return
+
+        key = normalize_key(business_type, industry)
+        content = copy.deepcopy(content)
+        ttl = min(self.ttl, self.remote_image_ttl) if has_remote_images(content) else self.ttl
+        now = datetime.utcnow()
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "content": content,
+                "prompt_version": PROMPT_VERSION,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl),
+            },
+            upsert=True,
+        )
+        self._remember(key, content, ttl)
+
+    def get_or_generate(self, business_type, industry, generate, use_cache=True):
+        """
+        Return cached content, or generate and cache it on a miss.
+
+        Concurrent misses for the same key share one call to ``generate``.
+
+        Args:
+            business_type (str): The type of business the website represents.
+            industry (str): The industry the business operates in.
+            generate (callable): Called with ``(business_type, industry)`` on a miss.
+            use_cache (bool): False to bypass the cache for this request. Freshly
+                generated content still refreshes the cache.
+
+        Returns:
+            dict: Content owned by the caller.
+
+        Raises:
+            SingleFlightTimeout: If an identical generation was already in flight and
+                did not finish within ``SINGLE_FLIGHT_WAIT_TIMEOUT``.
+        """
+        if self.enabled and use_cache:
+            content = self.get(business_type, industry)
+            if content is not None:
+                return content
+
+        def generate_and_store():
+            content = generate(business_type, industry)
+            if self.enabled:
+                try:
+                    self.set(business_type, industry, content)
+                except Exception:
+                    logger.exception("Failed to store generated content in the cache")
+            return content
+
+        return self.flight.do(normalize_key(business_type, industry), generate_and_store)
+
+    def clear(self):
+        """Drop the in-process LRU."""
+        with self._lock:
+            self._lru.clear()
+
+    def _remember(self, key, content, ttl):
+        with self._lock:
+            self._lru[key] = (time.monotonic() + ttl, content)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+
+content_cache = ContentCache()
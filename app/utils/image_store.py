@@ -0,0 +1,339 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import httpx
+from flask import Response, request, send_file
+
+from app import mongo
+from app.utils.metrics import metrics
+from app.utils.openai_helper import generate_site_content
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it only the original is stored.
+    Image = None
+    features = None
+
+logger = logging.getLogger(__name__)
+
+# Longest edge, in pixels, of each stored variant.
+VARIANTS = {"thumb": 256, "1x": 512, "2x": 1024}
+
+# Stored images never change, so browsers may cache them for a year.
+CACHE_MAX_AGE = 31536000
+
+# Encoded formats for variants, best first.
+FORMATS = [("avif", "image/avif"), ("webp", "image/webp")]
+
+# AVIF encodes several times slower than WebP, so its variants are encoded by
+# this many background threads per process instead of on the request path.
+AVIF_ENCODERS = 2
+
+ORIGINAL_TYPES = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+class DiskBackend:
+    """Stores image files under ``<root>/<digest[:2]>/<digest>/``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest, name):
+        return os.path.join(self.root, digest[:2], digest, name)
+
+    def exists(self, digest, name):
+        return os.path.exists(self.path(digest, name))
+
+    def put(self, digest, name, data, mimetype):
+        path = self.path(digest, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per thread: identical images may be stored concurrently.
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class GridFSBackend:
+    """Stores image files in GridFS, named ``<digest>/<name>``."""
+
+    def __init__(self, collection="images"):
+        self.collection = collection
+
+    @property
+    def fs(self):
+        import gridfs
+        return gridfs.GridFS(mongo.db, collection=self.collection)
+
+    def exists(self, digest, name):
+        return self.fs.exists({"filename": f"{digest}/{name}"})
+
+    def put(self, digest, name, data, mimetype):
+        self.fs.put(data, filename=f"{digest}/{name}", contentType=mimetype)
+
+    def read(self, digest, name):
+        return self.fs.get_last_version(filename=f"{digest}/{name}").read()
+
+
+class ImageStore:
+    """
+    Content-addressed store for generated images.
+
+    DALL·E returns temporary URLs. ``localize_content`` downloads each image once,
+    stores it under the SHA-256 of its bytes together with resized variants
+    (``thumb``, ``1x``, ``2x``) in WebP, and rewrites the content to point at
+    ``/website/images/<digest>/<variant>``. AVIF variants are encoded afterwards
+    in the background, at ``IMAGE_AVIF_SPEED``. That route serves the best format
+    the browser accepts and that exists, with a strong ETag and an immutable
+    cache lifetime.
+
+    Files go to disk (``IMAGE_STORE_BACKEND = "disk"``, under ``IMAGE_STORE_PATH``)
+    or to GridFS (``"gridfs"``). Without Pillow only the original is stored and
+    every variant resolves to it.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.backend = None
+        self.url_prefix = "/website/images"
+        self.fetch_timeout = 30
+        self.concurrency = 6
+        self.avif_speed = 8
+        self._avif_encoder = ThreadPoolExecutor(max_workers=AVIF_ENCODERS, thread_name_prefix="image-avif")
+        self._avif_pending = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the store from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.enabled = app.config.get("IMAGE_STORE_ENABLED", True)
+        self.url_prefix = app.config.get("IMAGE_STORE_URL_PREFIX", "/website/images")
+        self.fetch_timeout = app.config.get("IMAGE_STORE_FETCH_TIMEOUT", 30)
+        self.concurrency = app.config.get("IMAGE_GENERATION_CONCURRENCY", 6)
+        self.avif_speed = app.config.get("IMAGE_AVIF_SPEED", 8)
+
+        if app.config.get("IMAGE_STORE_BACKEND", "disk") == "gridfs":
+            self.backend = GridFSBackend()
+        else:
+            root = app.config.get("IMAGE_STORE_PATH") or os.path.join(app.instance_path, "images")
+            self.backend = DiskBackend(root)
+
+    def url(self, digest, variant="1x"):
+        """Return the local URL of a stored image variant."""
+        return f"{self.url_prefix}/{digest}/{variant}"
+
+    def store_bytes(self, data, mimetype=None):
+        """
+        Store an image and its WebP variants, unless an identical image is already stored.
+
+        The AVIF variants are queued for a background thread.
+
+        Args:
+            data (bytes): The original image bytes.
+            mimetype (str, optional): Content type reported by the upstream server.
+
+        Returns:
+            str: The hex SHA-256 digest identifying the image.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        image = None
+
+        if Image is not None:
+            image = Image.open(io.BytesIO(data))
+            mimetype = Image.MIME.get(image.format, mimetype)
+
+        original = f"orig.{ORIGINAL_TYPES.get(mimetype, 'png')}"
+        if self.backend.exists(digest, original):
+            return digest
+
+        if image is not None and features.check("webp"):
+            self._store_variants(digest, image, "webp")
+
+        # Written after the WebP variants: its presence marks the image as stored.
+        self.backend.put(digest, original, data, mimetype or "image/png")
+
+        if image is not None and features.check("avif"):
+            # From the original bytes, so queued work holds no decoded images.
+            future = self._avif_encoder.submit(self._store_avif, digest, data)
+            self._avif_pending.add(future)
+            future.add_done_callback(self._avif_pending.discard)
+        return digest
+
+    def _store_variants(self, digest, image, fmt, **options):
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        fmt_mimetype = dict(FORMATS)[fmt]
+        for variant, size in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size))
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=80, **options)
+            self.backend.put(digest, f"{variant}.{fmt}", buffer.getvalue(), fmt_mimetype)
+
+    def _store_avif(self, digest, data):
+        try:
+            with metrics.span("encode_avif"):
+                self._store_variants(digest, Image.open(io.BytesIO(data)), "avif", speed=self.avif_speed)
+        except Exception:
+            logger.exception("Failed to encode AVIF variants of image %s", digest)
+
+    def wait_for_variants(self):
+        """Wait until the queued AVIF variants are stored; for tests."""
+        wait(list(self._avif_pending))
+
+    def store_url(self, url):
+        """
+        Download an image and store it.
+
+        Args:
+            url (str): The remote image URL.
+
+        Returns:
+            str: The digest of the stored image.
+        """
+        response = httpx.get(url, timeout=self.fetch_timeout, follow_redirects=True)
+        response.raise_for_status()
+        mimetype = response.headers.get("content-type", "").split(";")[0] or None
+        return self.store_bytes(response.content, mimetype)
+
+    def find(self, digest, variant, accept=""):
+        """
+        Pick the stored file to serve for a variant.
+
+        Args:
+            digest (str): The image digest.
+            variant (str): ``thumb``, ``1x``, ``2x`` or ``orig``.
+            accept (str): The request's ``Accept`` header.
+
+        Returns:
+            tuple or None: ``(name, mimetype)`` of the file to serve.
+        """
+        if variant in VARIANTS:
+            for fmt, mimetype in FORMATS:
+                if mimetype in accept:
+                    name = f"{variant}.{fmt}"
+                    if self.backend.exists(digest, name):
+                        return name, mimetype
+
+        for mimetype, ext in ORIGINAL_TYPES.items():
+            name = f"orig.{ext}"
+            if self.backend.exists(digest, name):
+                return name, mimetype
+        return None
+
+    def send(self, digest, variant):
+        """
+        Build the response serving a stored image variant for the current request.
+
+        Returns:
+            Response or None: The image response (304 when the client's ETag
+            matches), or None if the image does not exist.
+        """
+        found = self.find(digest, variant, request.headers.get("Accept", ""))
+        if found is None:
+            return None
+
+        name, mimetype = found
+        etag = f"{digest}-{name}"
+        if isinstance(self.backend, DiskBackend):
+            response = send_file(
+                self.backend.path(digest, name),
+                mimetype=mimetype,
+                etag=etag,
+                conditional=True,
+                max_age=CACHE_MAX_AGE,
+            )
+        else:
+            response = Response(self.backend.read(digest, name), mimetype=mimetype)
+            response.set_etag(etag)
+            response.make_conditional(request)
+
+        response.cache_control.public = True
+        response.cache_control.max_age = CACHE_MAX_AGE
+        response.cache_control.immutable = True
+        response.vary.add("Accept")
+        return response
+
+    def localize_content(self, content):
+        """
+        Replace remote image URLs in website content with stored local ones.
+
+        Sets ``image_url``/``image_urls`` to the ``1x`` variant, adds matching
+        ``image_srcset``/``image_srcsets`` entries, and sets ``thumbnail_url`` on the
+        content from the hero image. Images that cannot be fetched keep their
+        remote URL.
+
+        Args:
+            content (dict): Website content; modified in place.
+
+        Returns:
+            dict: The same content.
+        """
+        if not self.enabled:
+            return content
+
+        targets = []
+        for section in content.get("sections", []):
+            if _is_remote(section.get("image_url")):
+                targets.append((section, None, section["image_url"]))
+            for index, url in enumerate(section.get("image_urls") or []):
+                if _is_remote(url):
+                    section.setdefault("image_srcsets", [None] * len(section["image_urls"]))
+                    targets.append((section, index, url))
+
+        if not targets:
+            return content
+
+        def fetch(url):
+            try:
+                return self.store_url(url)
+            except Exception:
+                logger.exception("Failed to store image %s", url)
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(targets)), thread_name_prefix="image-store") as executor:
+            digests = list(executor.map(fetch, [url for _, _, url in targets]))
+
+        for (section, index, _), digest in zip(targets, digests):
+            if digest is None:
+                continue
+            srcset = f"{self.url(digest, '1x')} 1x, {self.url(digest, '2x')} 2x"
+            if index is None:
+                section["image_url"] = self.url(digest)
+                section["image_srcset"] = srcset
+                if section.get("type") == "hero":
+                    content["thumbnail_url"] = self.url(digest, "thumb")
+            else:
+                section["image_urls"][index] = self.url(digest)
+                section["image_srcsets"][index] = srcset
+
+        return content
+
+
+def _is_remote(url):
+    return isinstance(url, str) and url.startswith(("http://", "https://"))
+
+
+def generate_stored_site_content(business_type, industry, on_progress=None):
+    """
+    Generate website content and move its images into the local image store.
+
+    Takes the same arguments as ``generate_site_content``.
+
+    Returns:
+        dict: The website content pointing at durable local image URLs.
+    """
+    content = generate_site_content(business_type, industry, on_progress)
+    with metrics.span("store_images"):
+        return image_store.localize_content(content)
+
+
+image_store = ImageStore()
@@ -0,0 +1,233 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from app import mongo
+from app.models.website_model import (
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_READY,
+    STATUS_RUNNING,
+)
+from app.utils.content_cache import content_cache
+from app.utils.image_store import generate_stored_site_content
+from app.utils.page_cache import page_cache
+from app.utils.response_cache import invalidate_tags
+from app.utils.scheduler import PRIORITY_BATCH, upstream_context
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationJobQueue:
+    """
+    Background worker pool for website generation jobs.
+
+    A job is a website document inserted with ``status="pending"``; its ``_id`` is
+    the job id. Workers claim a job by atomically flipping it to ``running`` with a
+    lease, run ``generate_stored_site_content`` and store the result on the same document.
+
+    Two backends are supported, selected with ``JOB_QUEUE_BACKEND``:
+
+    - ``local`` (default): ``submit`` hands the job straight to a thread pool in
+      this process.
+    - ``mongo``: ``submit`` is a no-op and every app node runs pollers that claim
+      pending documents from the ``websites`` collection, so several nodes share
+      the work without an outside broker. Jobs whose lease expired (for example
+      because their node died) are picked up again.
+
+    With ``JOB_WORKERS_AUTOSTART``, the workers start with the first request each
+    process serves, so CLI commands and forked server workers that never serve
+    start none, and every forked worker starts its own. On start, the ``local``
+    backend also reclaims the jobs a stopped process left pending or running.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = "local"
+        self._executor = None
+        self._pollers = []
+        self._stop = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the queue from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.app = app
+        self.backend = app.config.get("JOB_QUEUE_BACKEND", "local")
+        self.workers = app.config.get("JOB_WORKERS", 4)
+        self.poll_interval = app.config.get("JOB_POLL_INTERVAL", 1.0)
+        self.lease_seconds = app.config.get("JOB_LEASE_SECONDS", 300)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="site-job")
+
+        if app.config.get("JOB_WORKERS_AUTOSTART", True):
+            app.before_request(self._autostart)
+
+    def _autostart(self):
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            # Threads do not survive a fork: a forked worker needs its own pool.
+            self._pollers = []
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="site-job")
+            if self.backend == "mongo":
+                self.start_pollers()
+            else:
+                self._executor.submit(self.recover)
+            self._started_pid = os.getpid()
+
+    def submit(self, website_id):
+        """
+        Schedule generation for a pending website document.
+
+        Args:
+            website_id (ObjectId): ``_id`` of the pending website document.
+        """
+        if self.backend == "local":
+            self._executor.submit(self._run, website_id)
+
+    def start_pollers(self):
+        """Start the Mongo queue pollers for this process."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._poll, name=f"site-job-poller-{index}", daemon=True)
+            thread.start()
+            self._pollers.append(thread)
+
+    def recover(self):
+        """
+        Reclaim the jobs a stopped process left behind, for the ``local`` backend.
+
+        Pending jobs and running jobs whose lease expired are run again by this
+        process. A job another process is still about to run is claimed by only
+        one of them.
+
+        Returns:
+            int: Number of jobs scheduled.
+        """
+        try:
+            with self.app.app_context():
+                orphans = [
+                    job["_id"]
+                    for job in mongo.db.websites.find({"$or": self._claimable()}, {"_id": 1}).sort("created_at", 1)
+                ]
+        except Exception:
+            logger.exception("Could not look up orphaned generation jobs")
+            return 0
+
+        for website_id in orphans:
+            self._executor.submit(self._run, website_id, True)
+        if orphans:
+            logger.info("Reclaimed %d orphaned generation jobs", len(orphans))
+        return len(orphans)
+
+    def stop(self):
+        """Stop pollers and wait for running jobs to finish."""
+        self._stop.set()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def _claim(self, query):
+        now = datetime.utcnow()
+        return mongo.db.websites.find_one_and_update(
+            query,
+            {"$set": {
+                "status": STATUS_RUNNING,
+                "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                "updated_at": now,
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _claimable(self):
+        return [
+            {"status": STATUS_PENDING},
+            {"status": STATUS_RUNNING, "lease_expires_at": {"$lt": datetime.utcnow()}},
+        ]
+
+    def _poll(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    job = self._claim({"$or": self._claimable()})
+                    if job:
+                        self._execute(job)
+                        continue
+            except Exception:
+                logger.exception("Generation job poller failed")
+            self._stop.wait(self.poll_interval)
+
+    def _run(self, website_id, orphaned=False):
+        with self.app.app_context():
+            if orphaned:
+                job = self._claim({"_id": website_id, "$or": self._claimable()})
+            else:
+                job = self._claim({"_id": website_id, "status": STATUS_PENDING})
+            if job:
+                self._execute(job)
+
+    def _invalidate(self, job):
+        page_cache.invalidate(job["_id"])
+        invalidate_tags(f"user:{job['user_id']}", f"site:{job['_id']}")
+
+    def _execute(self, job):
+        website_id = job["_id"]
+        last_write = [0.0]
+
+        def save_progress(content):
+            # Partial results are visible through the status endpoint; keep the
+            # lease alive while we are making progress.
+            now = time.monotonic()
+            if now - last_write[0] < 0.5:
+                return
+            last_write[0] = now
+            mongo.db.websites.update_one(
+                {"_id": website_id, "status": STATUS_RUNNING},
+                {"$set": {
+                    "content": content,
+                    "lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds),
+                }},
+            )
+            self._invalidate(job)
+
+        def generate(business_type, industry):
+            return generate_stored_site_content(business_type, industry, on_progress=save_progress)
+
+        try:
+            with upstream_context(job["user_id"], PRIORITY_BATCH):
+                content = content_cache.get_or_generate(
+                    job["business_type"], job["industry"], generate, use_cache=job.get("use_cache", True)
+                )
+        except Exception as e:
+            logger.exception("Generation job %s failed", website_id)
+            mongo.db.websites.update_one(
+                {"_id": website_id},
+                {"$set": {"status": STATUS_FAILED, "error": str(e), "updated_at": datetime.utcnow()},
+                 "$unset": {"lease_expires_at": "", "use_cache": ""}},
+            )
+            self._invalidate(job)
+            return
+
+        mongo.db.websites.update_one(
+            {"_id": website_id},
+            {"$set": {"status": STATUS_READY, "content": content, "updated_at": datetime.utcnow()},
+             "$inc": {"version": 1},
+             "$unset": {"lease_expires_at": "", "error": "", "use_cache": ""}},
+        )
+        self._invalidate(job)
+
+
+job_queue = GenerationJobQueue()
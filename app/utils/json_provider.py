@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from bson import Decimal128, ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it the stdlib encoder is used.
+    orjson = None
+
+# Streamed JSON arrays are sent in chunks of roughly this many bytes.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def bson_default(value):
+    """
+    Encode the values JSON has no type for.
+
+    ``ObjectId`` becomes its hex string and ``datetime`` an ISO 8601 string;
+    MongoDB returns naive UTC datetimes, which are marked as UTC.
+
+    Raises:
+        TypeError: If the value has no JSON encoding.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (Decimal, Decimal128, UUID)):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class BSONJSONProvider(JSONProvider):
+    """
+    JSON provider encoding MongoDB documents as they come out of the driver.
+
+    ``ObjectId``, ``datetime`` and the other BSON types are encoded natively, so
+    routes can return documents without converting ``_id`` first. With the
+    ``orjson`` package installed, documents are encoded in one pass in C;
+    otherwise the stdlib encoder is used with the same output.
+
+    Replaces the provider Flask-PyMongo installs, which encodes ``ObjectId`` as
+    ``{"$oid": ...}`` through ``bson.json_util``.
+    """
+
+    mimetype = "application/json"
+
+    def dumps_bytes(self, obj):
+        """Serialize ``obj`` to compact UTF-8 JSON."""
+        if orjson is not None:
+            return orjson.dumps(obj, default=bson_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=bson_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+    def iter_array(self, items, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Encode an iterable as a JSON array, in chunks, as it is consumed.
+
+        Only one chunk is held in memory at a time, so a Mongo cursor can be
+        streamed to the client without building a list of its documents.
+
+        Args:
+            items (iterable): The array's elements.
+            chunk_size (int): Approximate size, in bytes, of each chunk.
+
+        Yields:
+            bytes: Consecutive pieces of the array.
+        """
+        buffer = bytearray(b"[")
+        separator = b""
+        for item in items:
+            buffer += separator
+            buffer += self.dumps_bytes(item)
+            separator = b","
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]"
+        yield bytes(buffer)
@@ -0,0 +1,108 @@
+import json
+
+
+class SectionStreamParser:
+    """
+    Incremental parser for the site-content JSON produced by the chat completion.
+
+    Feed it the streamed completion chunk by chunk; it scans each character once
+    and reports the top-level ``title`` and every object of the top-level
+    ``sections`` array as soon as that part of the document is complete. Text
+    before the first ``{`` (such as a markdown code fence) is ignored.
+
+    Example:
+        parser = SectionStreamParser()
+        for chunk in stream:
+            for event, payload in parser.feed(chunk):
+                ...
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.expect_key = False
+        self.root_key = None
+        self.section_start = None
+
+    def feed(self, chunk):
+        """
+        Consume the next chunk of streamed text.
+
+        Args:
+            chunk (str): The next piece of the completion.
+
+        Returns:
+            list: ``("title", str)`` and ``("section", dict)`` events completed by
+            this chunk, in document order.
+        """
+        events = []
+        start = self.position
+        self.text += chunk
+        text = self.text
+
+        for i in range(start, len(text)):
+            char = text[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self._string_done(text[self.string_start:i + 1], events)
+                continue
+
+            if not self.stack and char != "{":
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char in "{[":
+                if self._in_sections() and char == "{":
+                    self.section_start = i
+                if len(self.stack) == 1 and char == "[":
+                    self.stack.append(("[", self.root_key))
+                else:
+                    self.stack.append((char, None))
+                if len(self.stack) == 1:
+                    self.expect_key = True
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if char == "}" and self._in_sections() and self.section_start is not None:
+                    try:
+                        events.append(("section", json.loads(text[self.section_start:i + 1])))
+                    except ValueError:
+                        pass
+                    self.section_start = None
+            elif char == "," and len(self.stack) == 1:
+                self.expect_key = True
+
+        self.position = len(text)
+        return events
+
+    def _in_sections(self):
+        return len(self.stack) == 2 and self.stack[1] == ("[", "sections")
+
+    def _string_done(self, literal, events):
+        if len(self.stack) != 1:
+            return
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            # A bad escape; only that string is lost.
+            if self.expect_key:
+                self.root_key = None
+                self.expect_key = False
+            return
+        if self.expect_key:
+            self.root_key = value
+            self.expect_key = False
+        elif self.root_key == "title":
+            events.append(("title", value))
@@ -0,0 +1,303 @@
+import bisect
+import contextlib
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in seconds. Generation stages range from
+# milliseconds (JSON parsing, Mongo writes) to a minute (image generation).
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    "stage_duration_seconds": "Duration of each generation stage.",
+    "http_request_duration_seconds": "Duration of HTTP requests by route.",
+    "upstream_requests_total": "OpenAI calls made, by kind.",
+    "upstream_errors_total": "OpenAI calls that failed, by kind and error type.",
+    "upstream_retries_total": "OpenAI calls retried after a retryable error, by kind.",
+    "upstream_hedges_total": "Image calls duplicated because they exceeded the recent p95.",
+    "upstream_tokens_total": "OpenAI tokens used, by kind and type.",
+    "content_parse_total": "Generated contents parsed, by result (ok, repaired or failed).",
+    "cache_requests_total": "Response cache lookups by result (l1_hit, l2_hit or miss).",
+    "content_cache_requests_total": "Content cache lookups by result (lru_hits are also counted as hits).",
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def estimate_quantile(buckets, count, quantile):
+    """
+    Estimate a quantile from per-bucket (non-cumulative) counts by linear interpolation.
+
+    Args:
+        buckets (list): Observation counts per ``LATENCY_BUCKETS`` bound, plus one
+            overflow count.
+        count (int): Total number of observations.
+        quantile (float): The quantile to estimate, e.g. ``0.95``.
+
+    Returns:
+        float: The estimated value, in seconds.
+    """
+    if not count:
+        return 0.0
+    rank = quantile * count
+    seen = 0
+    for index, bucket_count in enumerate(buckets):
+        if bucket_count and seen + bucket_count >= rank:
+            if index >= len(LATENCY_BUCKETS):
+                return LATENCY_BUCKETS[-1]
+            lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+            upper = LATENCY_BUCKETS[index]
+            return lower + (upper - lower) * (rank - seen) / bucket_count
+        seen += bucket_count
+    return LATENCY_BUCKETS[-1]
+
+
+class MetricsRegistry:
+    """
+    Counters and latency histograms exposed in the Prometheus text format.
+
+    Values are kept in memory per process. With ``METRICS_DIR`` set, each
+    process also writes a snapshot of its values to ``<METRICS_DIR>/<pid>.json``
+    every ``METRICS_FLUSH_INTERVAL`` seconds, from a thread started by the first
+    request it serves (so forked workers each run their own), and ``render`` sums the snapshots of
+    every process, so whichever worker answers ``/metrics`` reports the totals
+    of all of them. Counters of processes that have exited stay in their files,
+    keeping totals monotonic; clear the directory when deploying.
+
+    Histograms use fixed buckets (``LATENCY_BUCKETS``); p50/p95/p99 are estimated
+    from the merged buckets and reported as ``<name>_quantile`` gauges.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.directory = None
+        self.flush_interval = 5.0
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the registry and time every request of the application.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        self.directory = app.config.get("METRICS_DIR")
+        self.flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", 5.0)
+        if not self.enabled:
+            return
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        @app.before_request
+        def start_request_timer():
+            if self.directory and self._flusher_pid != os.getpid():
+                self._start_flusher()
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def observe_request(response):
+            started = g.pop("metrics_started", None)
+            if started is not None:
+                rule = request.url_rule.rule if request.url_rule else "unmatched"
+                self.observe(
+                    "http_request_duration_seconds",
+                    time.perf_counter() - started,
+                    route=rule,
+                    method=request.method,
+                    status=response.status_code,
+                )
+            return response
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increment a counter.
+
+        Args:
+            name (str): Metric name, ending in ``_total``.
+            value (float): Amount to add.
+            **labels: Label values.
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Record one duration in a histogram.
+
+        Args:
+            name (str): Metric name, ending in ``_seconds``.
+            seconds (float): The observed duration.
+            **labels: Label values.
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels))
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][index] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    @contextlib.contextmanager
+    def span(self, stage, **labels):
+        """
+        Time a block of code as one generation stage.
+
+        Example:
+            with metrics.span("chat_completion"):
+                response = client.chat.completions.create(...)
+
+        The duration is recorded in ``stage_duration_seconds{stage=...}`` whether
+        the block succeeds or raises.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+    def snapshot(self):
+        """Return this process's values as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [
+                    [name, dict(labels), {**histogram, "buckets": list(histogram["buckets"])}]
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+            }
+
+    def flush(self):
+        """Write this process's snapshot to ``METRICS_DIR``."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _start_flusher(self):
+        # Threads do not survive a fork: every worker process starts its own.
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write metrics snapshot")
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                logger.warning("Skipping unreadable metrics snapshot %s", path)
+        return snapshots
+
+    def collect(self):
+        """
+        Merge the snapshots of every process.
+
+        Returns:
+            tuple: ``(counters, histograms)`` dicts keyed by ``(name, labels)``.
+        """
+        counters, histograms = {}, {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot["counters"]:
+                key = (name, _labels_key(labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, histogram in snapshot["histograms"]:
+                key = (name, _labels_key(labels))
+                merged = histograms.setdefault(key, {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0})
+                merged["buckets"] = [a + b for a, b in zip(merged["buckets"], histogram["buckets"])]
+                merged["sum"] += histogram["sum"]
+                merged["count"] += histogram["count"]
+        return counters, histograms
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The ``/metrics`` response body.
+        """
+        counters, histograms = self.collect()
+        lines = []
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            series = sorted((labels, h) for (metric, labels), h in histograms.items() if metric == name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series:
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+                lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {histogram["count"]}')
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+            quantile_name = name.replace("_seconds", "_quantile_seconds")
+            lines.append(f"# HELP {quantile_name} Estimated p50/p95/p99 of {name}.")
+            lines.append(f"# TYPE {quantile_name} gauge")
+            for labels, histogram in series:
+                for quantile in QUANTILES:
+                    value = estimate_quantile(histogram["buckets"], histogram["count"], quantile)
+                    lines.append(f"{quantile_name}{_format_labels(labels, quantile=quantile)} {value:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -1,36 +1,439 @@
-import os
-import re
+import asyncio
 import json
-from openai import OpenAI
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+from app.config import Config
+from app.models.site_content import parse_site_content, parse_site_section, validate_site_section
+from app.utils.json_stream import SectionStreamParser
+from app.utils.metrics import metrics
+from app.utils.resilience import CircuitBreaker, LatencyTracker, backoff_delay, hedged
+from app.utils.scheduler import UpstreamBusy, upstream_scheduler
+from app.utils.singleflight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# One pooled HTTP client shared by every thread. Retries are made by
+# call_upstream, through the scheduler and circuit breakers, so the SDK's own
+# retries are disabled.
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    timeout=httpx.Timeout(Config.OPENAI_CHAT_TIMEOUT, connect=Config.OPENAI_CONNECT_TIMEOUT),
+    http_client=DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    ),
+)
+
+# The same for the coroutines of the ASGI routes.
+async_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    timeout=httpx.Timeout(Config.OPENAI_CHAT_TIMEOUT, connect=Config.OPENAI_CONNECT_TIMEOUT),
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    ),
+)
+
+# Timeouts, connection failures and 5xx answers are worth retrying; anything
+# else (bad request, auth, content policy) would fail the same way again.
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError)
+
+breakers = {
+    kind: CircuitBreaker(kind, Config.OPENAI_BREAKER_FAILURES, Config.OPENAI_BREAKER_RESET_TIMEOUT)
+    for kind in ("chat", "image")
+}
+
+image_latency = LatencyTracker()
+
+# Bump whenever the generation prompt changes so cached content from the old
+# prompt is no longer served.
+PROMPT_VERSION = 1
+
+# Identical image prompts requested at the same time share one API call.
+image_flight = SingleFlight("image")
+async_image_flight = AsyncSingleFlight("image")
+
+CHAT_MAX_TOKENS = 800
+# A single regenerated section needs a fraction of a whole site.
+SECTION_MAX_TOKENS = 300
+
+# Chat models that accept ``response_format={"type": "json_object"}``.
+JSON_MODE_MODELS = ("gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-3.5-turbo-1106", "gpt-3.5-turbo-0125")
+
+def chat_options(max_tokens=CHAT_MAX_TOKENS):
+    """Build the chat completion arguments shared by streamed and non-streamed generation."""
+    options = {
+        "model": Config.OPENAI_CHAT_MODEL,
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "timeout": call_timeout(Config.OPENAI_CHAT_TIMEOUT),
+    }
+    if Config.OPENAI_CHAT_MODEL.startswith(JSON_MODE_MODELS):
+        options["response_format"] = {"type": "json_object"}
+    return options
+
+def call_timeout(read_timeout):
+    """Build the timeout of one call: ``read_timeout`` for the response, ``OPENAI_CONNECT_TIMEOUT`` to connect."""
+    return httpx.Timeout(read_timeout, connect=Config.OPENAI_CONNECT_TIMEOUT)
+
+def call_upstream(kind, fn, tokens=0):
+    """
+    Make one OpenAI call through the upstream scheduler, with retries.
+
+    Every attempt is checked by the ``kind`` circuit breaker, which fails fast
+    while OpenAI keeps failing, and then waits for a slot in the ``kind`` buckets;
+    a call the breaker rejects takes no slot.
+    Retryable errors are retried up to ``OPENAI_MAX_RETRIES`` times with jittered
+    exponential backoff. If OpenAI answers 429, the scheduler stops admitting
+    calls of that kind for the ``Retry-After`` the provider sent, so queued work
+    waits instead of failing the same way.
+
+    Args:
+        kind (str): ``"chat"`` or ``"image"``.
+        fn (callable): Zero-argument function making the call.
+        tokens (int): Estimated tokens the call will use.
+
+    Returns:
+        The result of ``fn``.
+
+    Raises:
+        UpstreamBusy: If no slot is available in time or OpenAI rate-limited the call.
+        CircuitOpen: If the circuit breaker is open.
+    """
+    breaker = breakers[kind]
+    attempts = Config.OPENAI_MAX_RETRIES + 1
+
+    for attempt in range(1, attempts + 1):
+        breaker.allow()
+        try:
+            with metrics.span("upstream_wait", kind=kind):
+                upstream_scheduler.acquire(kind, tokens)
+        except BaseException:
+            breaker.abandon()
+            raise
+        metrics.inc("upstream_requests_total", kind=kind)
+        try:
+            result = fn()
+        except RETRYABLE_ERRORS as e:
+            metrics.inc("upstream_errors_total", kind=kind, error=type(e).__name__)
+            breaker.record_failure()
+            if attempt == attempts:
+                raise
+            metrics.inc("upstream_retries_total", kind=kind)
+            logger.warning("Retrying %s call after %s (attempt %d of %d)", kind, type(e).__name__, attempt, attempts)
+            time.sleep(backoff_delay(attempt, Config.OPENAI_RETRY_BASE_DELAY))
+            continue
+        except Exception as e:
+            retry_after = _answered_with_error(kind, e)
+            if retry_after is not None:
+                upstream_scheduler.block(kind, retry_after)
+                raise UpstreamBusy(retry_after) from e
+            raise
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        breaker.record_success()
+        return result
 
-def generate_image(prompt):
+async def call_upstream_async(kind, fn, tokens=0):
+    """
+    ``call_upstream`` for coroutines: ``fn`` returns an awaitable.
+
+    Waits for the scheduler, retries and backs off without blocking the event loop;
+    the scheduler's store calls run in worker threads.
+    """
+    breaker = breakers[kind]
+    attempts = Config.OPENAI_MAX_RETRIES + 1
+
+    for attempt in range(1, attempts + 1):
+        breaker.allow()
+        try:
+            with metrics.span("upstream_wait", kind=kind):
+                await upstream_scheduler.acquire_async(kind, tokens)
+        except BaseException:
+            breaker.abandon()
+            raise
+        metrics.inc("upstream_requests_total", kind=kind)
+        try:
+            result = await fn()
+        except RETRYABLE_ERRORS as e:
+            metrics.inc("upstream_errors_total", kind=kind, error=type(e).__name__)
+            breaker.record_failure()
+            if attempt == attempts:
+                raise
+            metrics.inc("upstream_retries_total", kind=kind)
+            logger.warning("Retrying %s call after %s (attempt %d of %d)", kind, type(e).__name__, attempt, attempts)
+            await asyncio.sleep(backoff_delay(attempt, Config.OPENAI_RETRY_BASE_DELAY))
+            continue
+        except Exception as e:
+            retry_after = _answered_with_error(kind, e)
+            if retry_after is not None:
+                await asyncio.to_thread(upstream_scheduler.block, kind, retry_after)
+                raise UpstreamBusy(retry_after) from e
+            raise
+
+        breaker.record_success()
+        return result
+
+def _answered_with_error(kind, error):
+    """
+    Handle a non-retryable error of an upstream call.
+
+    OpenAI answered, so it is up; the call itself was wrong or rate limited. On
+    a 429 the caller stops the scheduler from admitting calls of ``kind`` for
+    the provider's ``Retry-After`` and raises ``UpstreamBusy``.
+
+    Returns:
+        float or None: The ``Retry-After`` seconds if the call was rate limited.
+    """
+    breakers[kind].record_success()
+    metrics.inc("upstream_errors_total", kind=kind, error=type(error).__name__)
+    if not isinstance(error, RateLimitError):
+        return None
+    retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return 20.0
+
+def estimate_chat_tokens(messages, max_tokens=CHAT_MAX_TOKENS):
+    """Estimate the tokens a chat completion uses: roughly 4 characters per prompt token, plus the completion."""
+    return sum(len(message["content"]) for message in messages) // 4 + max_tokens
+
+def record_usage(kind, usage):
+    """Count the tokens reported in a response's ``usage``."""
+    if usage:
+        metrics.inc("upstream_tokens_total", usage.prompt_tokens, kind=kind, type="prompt")
+        metrics.inc("upstream_tokens_total", usage.completion_tokens, kind=kind, type="completion")
+
+def generate_image(prompt, timeout=None):
     """
     Generate an image using OpenAI's DALL·E 3 model based on a given text prompt.
 
+    Concurrent calls with the same prompt are coalesced into a single request.
+    With ``OPENAI_IMAGE_HEDGING`` on, a request still running after the recent
+    p95 image latency is duplicated and the first image back is used, trading a
+    few extra image calls for a shorter tail.
+
     Args:
         prompt (str): A descriptive text prompt to generate the image.
+        timeout (float, optional): Seconds to wait for the image API before giving up.
+            Defaults to ``Config.IMAGE_GENERATION_TIMEOUT``.
 
     Returns:
         str: The URL of the generated image.
     """
-    response = client.images.generate(
-        model="dall-e-3",
-        prompt=prompt,
-        n=1,
-        size="1024x1024"
+    timeout = timeout or Config.IMAGE_GENERATION_TIMEOUT
+
+    def request_image():
+        started = time.perf_counter()
+        with metrics.span("generate_image"):
+            response = client.images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                n=1,
+                size="1024x1024",
+                timeout=call_timeout(timeout),
+            )
+        image_latency.record(time.perf_counter() - started)
+        return response.data[0].url
+
+    def request_image_hedged():
+        hedge_after = None
+        if Config.OPENAI_IMAGE_HEDGING:
+            hedge_after = image_latency.percentile(0.95, Config.OPENAI_IMAGE_HEDGING_MIN_SAMPLES)
+        if hedge_after is None:
+            return call_upstream("image", request_image)
+        url, was_hedged = hedged(lambda: call_upstream("image", request_image), hedge_after)
+        if was_hedged:
+            metrics.inc("upstream_hedges_total", kind="image")
+        return url
+
+    return image_flight.do(
+        " ".join(prompt.lower().split()),
+        request_image_hedged,
+        # The leader may retry; followers wait for all of its attempts.
+        wait_timeout=timeout * (Config.OPENAI_MAX_RETRIES + 1),
     )
-    return response.data[0].url
 
-def extract_json(text):
-    """Extracts and returns the first valid JSON object from a string."""
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        return json.loads(match.group())
-    raise ValueError("No valid JSON found in the response.")
+async def generate_image_async(prompt, timeout=None):
+    """
+    ``generate_image`` for coroutines, with the async client.
+
+    Identical prompts in flight in this process share one call. Requests are
+    not hedged.
+
+    Returns:
+        str: The URL of the generated image.
+    """
+    timeout = timeout or Config.IMAGE_GENERATION_TIMEOUT
+
+    async def request_image():
+        started = time.perf_counter()
+        with metrics.span("generate_image"):
+            response = await async_client.images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                n=1,
+                size="1024x1024",
+                timeout=call_timeout(timeout),
+            )
+        image_latency.record(time.perf_counter() - started)
+        return response.data[0].url
+
+    return await async_image_flight.do(
+        " ".join(prompt.lower().split()),
+        lambda: call_upstream_async("image", request_image),
+        wait_timeout=timeout * (Config.OPENAI_MAX_RETRIES + 1),
+    )
+
+def build_image_jobs(sections, business_type, industry):
+    """
+    Build the image prompts needed by a list of website sections.
+
+    Args:
+        sections (list): Section dictionaries as returned by the chat completion.
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+
+    Returns:
+        list: ``(section, index, prompt)`` tuples. ``index`` is ``None`` for sections
+        with a single ``image_url`` and the service position for ``image_urls``.
+    """
+    jobs = []
+    for section in sections:
+        section_type = section.get("type")
+
+        if section_type == "hero":
+            jobs.append((section, None, f"Banner for a {business_type} in {industry}"))
+
+        elif section_type == "about":
+            jobs.append((section, None, f"About us image for a {business_type} in {industry}"))
+
+        elif section_type == "services":
+            section["image_urls"] = [None] * len(section.get("body", []))  # note: plural 'image_urls' for list
+            for idx, service in enumerate(section.get("body", [])):
+                jobs.append((section, idx, f"Image representing '{service}' service in {industry} industry for a {business_type}"))
+
+        elif section_type == "contact":
+            jobs.append((section, None, f"Contact page image for a {business_type} in {industry}"))
+
+    return jobs
+
+def generate_images(jobs, max_workers=None, timeout=None):
+    """
+    Run image jobs concurrently and yield each result as soon as it is ready.
+
+    A job whose image call fails or times out yields ``Config.IMAGE_PLACEHOLDER_URL``
+    instead of raising, so one bad image never loses the rest of the site.
+
+    Args:
+        jobs (list): ``(section, index, prompt)`` tuples from ``build_image_jobs``.
+        max_workers (int, optional): Concurrency limit. Defaults to
+            ``Config.IMAGE_GENERATION_CONCURRENCY``.
+        timeout (float, optional): Per-image timeout in seconds. Defaults to
+            ``Config.IMAGE_GENERATION_TIMEOUT``.
+
+    Yields:
+        tuple: ``(section, index, url)`` in completion order.
+    """
+    if not jobs:
+        return
+
+    max_workers = max(1, min(max_workers or Config.IMAGE_GENERATION_CONCURRENCY, len(jobs)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-gen") as executor:
+        futures = submit_image_jobs(executor, jobs, timeout)
+        for future in as_completed(futures):
+            yield image_result(future, futures)
+
+def submit_image_jobs(executor, jobs, timeout=None):
+    """
+    Submit image jobs to an executor.
+
+    Each job runs in a copy of the caller's context, so its image call is queued
+    under the caller's user and priority.
+
+    Returns:
+        dict: Maps each future to its ``(section, index)``.
+    """
+    return {
+        executor.submit(contextvars.copy_context().run, generate_image, prompt, timeout): (section, index)
+        for section, index, prompt in jobs
+    }
+
+def image_result(future, futures):
+    """Resolve a finished image future to ``(section, index, url)``, using the placeholder on failure."""
+    section, index = futures.pop(future)
+    try:
+        url = future.result()
+    except Exception:
+        logger.exception("Image generation failed for %s section", section.get("type"))
+        url = Config.IMAGE_PLACEHOLDER_URL
+    return section, index, url
+
+def apply_image(section, index, url):
+    """Store an image URL on its section, in ``image_url`` or ``image_urls[index]``."""
+    if index is None:
+        section["image_url"] = url
+    else:
+        section["image_urls"][index] = url
+
+def parse_content(text, finish_reason=None):
+    """
+    Parse the site content out of a chat completion.
+
+    Args:
+        text (str): The completion text.
+        finish_reason (str, optional): Why the completion ended; ``"length"``
+            means it was cut off at ``CHAT_MAX_TOKENS``.
+
+    Returns:
+        dict: The validated site content.
+
+    Raises:
+        ValueError: If no valid site content could be recovered.
+    """
+    if finish_reason == "length":
+        logger.warning("Chat completion hit max_tokens=%s; repairing truncated content", CHAT_MAX_TOKENS)
+    with metrics.span("parse_content"):
+        try:
+            content, repaired = parse_site_content(text)
+        except ValueError:
+            metrics.inc("content_parse_total", result="failed")
+            raise
+    metrics.inc("content_parse_total", result="repaired" if repaired else "ok")
+    return content
+
+def build_site_messages(business_type, industry):
+    """
+    Build the chat messages that ask the model for a site's content.
 
-def generate_site_content(business_type, industry):
+    Args:
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+
+    Returns:
+        list: Messages for ``client.chat.completions.create``.
+    """
     prompt = f"""
     You are a web content generator. Return ONLY a valid JSON object with the following structure.
     Do not include markdown, explanations, or extra text.
@@ -68,40 +471,320 @@ def generate_site_content(business_type, industry):
     }}
     """
 
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that returns only valid JSON."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=800,
-        temperature=0.7,
+    return [
+        {"role": "system", "content": "You are a helpful assistant that returns only valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+# The shape of each section type, as in the site prompt above.
+SECTION_SCHEMAS = {
+    "hero": {"title": "Hero Section", "type": "hero", "body": {"headline": "string", "subheadline": "string"}},
+    "about": {"title": "About Us", "type": "about", "body": "string"},
+    "services": {"title": "Services", "type": "services", "body": ["string", "string", "string"]},
+    "contact": {"title": "Contact", "type": "contact", "body": "string"},
+}
+
+# Sibling text included in a section prompt is cut to this many characters per section.
+SIBLING_CONTEXT_CHARS = 600
+
+def build_section_messages(business_type, industry, section_type, sections):
+    """
+    Build the chat messages that ask the model to rewrite one section of a site.
+
+    The other sections are included, without their images, so the new text
+    stays consistent with them and does not repeat them.
+
+    Args:
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+        section_type (str): The type of the section to rewrite.
+        sections (list): The site's current sections.
+
+    Returns:
+        list: Messages for ``client.chat.completions.create``.
+    """
+    current = next((s for s in sections if s.get("type") == section_type), {})
+    schema = SECTION_SCHEMAS.get(section_type) or {
+        "title": current.get("title", "string"),
+        "type": section_type,
+        "body": current.get("body", "string"),
+    }
+    siblings = "\n    ".join(
+        f"- {s.get('type')}: {json.dumps({'title': s.get('title'), 'body': s.get('body')})[:SIBLING_CONTEXT_CHARS]}"
+        for s in sections
+        if s.get("type") != section_type
     )
 
-    raw_text = response.choices[0].message.content.strip()
-    content_json = extract_json(raw_text)
+    prompt = f"""
+    You are a web content generator. Rewrite the "{section_type}" section of a website.
+    Return ONLY a valid JSON object with the following structure.
+    Do not include markdown, explanations, or extra text.
 
-    # Generate images for each section
-    for section in content_json.get("sections", []):
-        section_type = section["type"]
+    Business Type: {business_type}
+    Industry: {industry}
 
-        if section_type == "hero":
-            section["image_url"] = generate_image(f"Banner for a {business_type} in {industry}")
-        
-        elif section_type == "about":
-            section["image_url"] = generate_image(f"About us image for a {business_type} in {industry}")
-        
-        elif section_type == "services":
-            service_images = []
-            for idx, service in enumerate(section["body"]):
-                img = generate_image(f"Image representing '{service}' service in {industry} industry for a {business_type}")
-                service_images.append(img)
-            section["image_urls"] = service_images  # note: plural 'image_urls' for list
-        
-        elif section_type == "contact":
-            section["image_url"] = generate_image(f"Contact page image for a {business_type} in {industry}")
+    The other sections of the website, for context (do not repeat them):
+    {siblings or "- none"}
+
+    {json.dumps(schema, indent=4)}
+    """
+
+    return [
+        {"role": "system", "content": "You are a helpful assistant that returns only valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_site_content(business_type, industry, on_progress=None):
+    """
+    Generate structured website content and its section images.
+
+    Args:
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+        on_progress (callable, optional): Called with the partially built content
+            once the text is ready and again after every image that resolves.
+
+    Returns:
+        dict: The website content with ``image_url``/``image_urls`` filled in.
+
+    Raises:
+        UpstreamBusy: If the upstream quota cannot take the generation in time.
+    """
+    upstream_scheduler.check("chat")
+    upstream_scheduler.check("image")
+
+    messages = build_site_messages(business_type, industry)
+    estimate = estimate_chat_tokens(messages)
+
+    def request_chat():
+        with metrics.span("chat_completion"):
+            return client.chat.completions.create(messages=messages, **chat_options())
+
+    response = call_upstream("chat", request_chat, tokens=estimate)
+    usage = getattr(response, "usage", None)
+    record_usage("chat", usage)
+    if usage:
+        upstream_scheduler.refund("chat", estimate - usage.total_tokens)
+
+    choice = response.choices[0]
+    content_json = parse_content(choice.message.content, getattr(choice, "finish_reason", None))
+
+    # Generate images for all sections concurrently
+    jobs = build_image_jobs(content_json.get("sections", []), business_type, industry)
+    if on_progress:
+        on_progress(content_json)
+    with metrics.span("images"):
+        for section, index, url in generate_images(jobs):
+            apply_image(section, index, url)
+            if on_progress:
+                on_progress(content_json)
+
+    return content_json
+
+async def generate_site_content_async(business_type, industry):
+    """
+    ``generate_site_content`` for coroutines.
+
+    The chat completion and up to ``IMAGE_GENERATION_CONCURRENCY`` image calls at
+    a time are awaited on the event loop, so no thread is held while OpenAI works.
+    The scheduler's checks and refunds, Mongo round trips with the "mongo"
+    backend, run in worker threads.
+
+    Returns:
+        dict: The website content with ``image_url``/``image_urls`` filled in.
+
+    Raises:
+        UpstreamBusy: If the upstream quota cannot take the generation in time.
+    """
+    await asyncio.to_thread(upstream_scheduler.check, "chat")
+    await asyncio.to_thread(upstream_scheduler.check, "image")
+
+    messages = build_site_messages(business_type, industry)
+    estimate = estimate_chat_tokens(messages)
+
+    async def request_chat():
+        with metrics.span("chat_completion"):
+            return await async_client.chat.completions.create(messages=messages, **chat_options())
+
+    response = await call_upstream_async("chat", request_chat, tokens=estimate)
+    usage = getattr(response, "usage", None)
+    record_usage("chat", usage)
+    if usage:
+        await asyncio.to_thread(upstream_scheduler.refund, "chat", estimate - usage.total_tokens)
+
+    choice = response.choices[0]
+    content_json = parse_content(choice.message.content, getattr(choice, "finish_reason", None))
+
+    semaphore = asyncio.Semaphore(Config.IMAGE_GENERATION_CONCURRENCY)
+
+    async def image_job(section, index, prompt):
+        async with semaphore:
+            try:
+                url = await generate_image_async(prompt)
+            except Exception:
+                logger.exception("Image generation failed for %s section", section.get("type"))
+                url = Config.IMAGE_PLACEHOLDER_URL
+        apply_image(section, index, url)
+
+    jobs = build_image_jobs(content_json.get("sections", []), business_type, industry)
+    with metrics.span("images"):
+        await asyncio.gather(*(image_job(*job) for job in jobs))
 
     return content_json
 
+def generate_section_content(business_type, industry, section_type, sections):
+    """
+    Regenerate one section of a website and its images.
+
+    Makes one small chat completion for the section and generates images only
+    for that section's entries, instead of the whole site.
+
+    Args:
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+        section_type (str): The type of the section to regenerate.
+        sections (list): The site's current sections, for context.
+
+    Returns:
+        dict: The new section with ``image_url``/``image_urls`` filled in.
+
+    Raises:
+        UpstreamBusy: If the upstream quota cannot take the generation in time.
+        ValueError: If the model did not return a valid section.
+    """
+    upstream_scheduler.check("chat")
+    upstream_scheduler.check("image")
+
+    messages = build_section_messages(business_type, industry, section_type, sections)
+    estimate = estimate_chat_tokens(messages, SECTION_MAX_TOKENS)
+
+    def request_chat():
+        with metrics.span("chat_completion", scope="section"):
+            return client.chat.completions.create(messages=messages, **chat_options(SECTION_MAX_TOKENS))
+
+    response = call_upstream("chat", request_chat, tokens=estimate)
+    usage = getattr(response, "usage", None)
+    record_usage("chat", usage)
+    if usage:
+        upstream_scheduler.refund("chat", estimate - usage.total_tokens)
+
+    choice = response.choices[0]
+    if getattr(choice, "finish_reason", None) == "length":
+        logger.warning("Section completion hit max_tokens=%s; repairing truncated content", SECTION_MAX_TOKENS)
+    with metrics.span("parse_content"):
+        try:
+            section, repaired = parse_site_section(choice.message.content, section_type)
+        except ValueError:
+            metrics.inc("content_parse_total", result="failed")
+            raise
+    metrics.inc("content_parse_total", result="repaired" if repaired else "ok")
+
+    jobs = build_image_jobs([section], business_type, industry)
+    with metrics.span("images"):
+        for job_section, index, url in generate_images(jobs):
+            apply_image(job_section, index, url)
+
+    return section
+
+def stream_site_content(business_type, industry):
+    """
+    Generate website content as a stream of events, section by section.
+
+    The chat completion is streamed and parsed incrementally. Every section is
+    validated and emitted as soon as its JSON object is complete, and its image
+    jobs start at that moment, so images for early sections are generated while
+    the model is still writing later ones. Invalid sections are dropped, as
+    ``parse_content`` drops them.
+
+    Args:
+        business_type (str): The type of business the website represents.
+        industry (str): The industry the business operates in.
+
+    Yields:
+        tuple: ``(event, payload)`` pairs:
+
+        - ``("title", str)`` when the site title is complete.
+        - ``("section", dict)`` when a section's text is complete.
+        - ``("image", dict)`` with ``section``, ``index`` and ``url`` when an image resolves.
+        - ``("content", dict)`` once, last, with the complete content.
+
+    Raises:
+        UpstreamBusy: If the upstream quota cannot take the generation in time.
+    """
+    upstream_scheduler.check("chat")
+    upstream_scheduler.check("image")
+
+    messages = build_site_messages(business_type, industry)
+
+    def request_chat():
+        with metrics.span("chat_completion", stream="true"):
+            # With streaming, the read timeout bounds the gap between chunks.
+            return client.chat.completions.create(messages=messages, stream=True, **chat_options())
+
+    stream = call_upstream("chat", request_chat, tokens=estimate_chat_tokens(messages))
+
+    parser = SectionStreamParser()
+    content_json = {"title": "", "sections": []}
 
+    def image_event(result):
+        section, index, url = result
+        apply_image(section, index, url)
+        return "image", {"section": section.get("type"), "index": index, "url": url}
 
+    with ThreadPoolExecutor(max_workers=Config.IMAGE_GENERATION_CONCURRENCY, thread_name_prefix="image-gen") as executor:
+        futures = {}
+        finish_reason = None
+
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+            for event, payload in parser.feed(chunk.choices[0].delta.content or ""):
+                if event == "title":
+                    content_json["title"] = payload
+                else:
+                    try:
+                        payload = validate_site_section(payload)
+                    except ValueError:
+                        logger.warning("Dropping an invalid streamed section", exc_info=True)
+                        continue
+                    content_json["sections"].append(payload)
+                    futures.update(submit_image_jobs(executor, build_image_jobs([payload], business_type, industry)))
+                yield event, payload
+
+            for future in [f for f in futures if f.done()]:
+                yield image_event(image_result(future, futures))
+
+        if finish_reason == "length" and content_json["sections"]:
+            logger.warning("Streamed chat completion hit max_tokens=%s; later sections are missing", CHAT_MAX_TOKENS)
+        if not content_json["sections"]:
+            # Nothing could be parsed incrementally; fall back to the full text.
+            content_json = parse_content(parser.text, finish_reason)
+            for section in content_json.get("sections", []):
+                yield "section", section
+            futures.update(submit_image_jobs(executor, build_image_jobs(content_json.get("sections", []), business_type, industry)))
+
+        for future in as_completed(list(futures)):
+            yield image_event(image_result(future, futures))
+
+    yield "content", content_json
+
+def replay_site_content(content):
+    """
+    Yield already generated content as the events of ``stream_site_content``.
+
+    Args:
+        content (dict): Complete website content, e.g. from the content cache.
+
+    Yields:
+        tuple: ``(event, payload)`` pairs, ending with ``("content", content)``.
+    """
+    yield "title", content.get("title", "")
+    for section in content.get("sections", []):
+        yield "section", section
+    for section in content.get("sections", []):
+        if "image_url" in section:
+            yield "image", {"section": section.get("type"), "index": None, "url": section["image_url"]}
+        for index, url in enumerate(section.get("image_urls", [])):
+            yield "image", {"section": section.get("type"), "index": index, "url": url}
+    yield "content", content
@@ -0,0 +1,186 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import make_response, render_template, request
+
+from app import mongo
+from app.models.website_model import STATUS_READY
+from app.utils.static_assets import static_assets
+
+TEMPLATE_NAME = "preview.html"
+
+
+def website_etag(website_id, version, updated_at=None, build_version=""):
+    """
+    Build the strong ETag of a rendered website page.
+
+    Args:
+        website_id (str): The website's id.
+        version (int): The website's ``version``; every write increments it.
+        updated_at (datetime): The website's ``updated_at``, used instead for
+            legacy documents that have no ``version``.
+        build_version (str): Identifies the deployed template and static assets,
+            so a deploy that changes either invalidates every page.
+
+    Returns:
+        str: The ETag value (without quotes).
+    """
+    if version:
+        stamp = f"v{version}"
+    else:
+        stamp = updated_at.isoformat() if updated_at else ""
+    return hashlib.sha1(f"{website_id}:{stamp}:{build_version}".encode()).hexdigest()
+
+
+class PageCache:
+    """
+    In-process cache of rendered ``preview.html`` pages with ETag revalidation.
+
+    Pages are keyed by website id and ETag, derived from the website's
+    ``version`` and the build version: ``APP_VERSION``, the source of ``preview.html`` and the static
+    manifest, so browsers drop pages rendered by a previous deploy. For a
+    conditional request:
+
+    - If this process recently validated the website's ETag (within
+      ``PAGE_CACHE_VALIDATE_TTL`` seconds) and the client already has it, the
+      304 is sent without touching Mongo.
+    - Otherwise only ``version`` is read from Mongo to compute the current ETag.
+
+    The full document is loaded and the template rendered only when neither the
+    client nor this process has the current version. Routes that modify a
+    website call ``invalidate`` so this process never serves a stale page; other
+    processes pick up the change once their validation window lapses.
+    """
+
+    def __init__(self, app=None):
+        self.max_pages = 512
+        self.validate_ttl = 5.0
+        self._pages = OrderedDict()
+        self._validated = {}
+        self._lock = threading.Lock()
+        self._template_version = ""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the cache from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.max_pages = app.config.get("PAGE_CACHE_SIZE", 512)
+        self.validate_ttl = app.config.get("PAGE_CACHE_VALIDATE_TTL", 5.0)
+        source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, TEMPLATE_NAME)
+        self._template_version = f"{app.config.get('APP_VERSION', '')}:{hashlib.sha1(source.encode()).hexdigest()}"
+
+    @property
+    def build_version(self):
+        """The deployed version of everything a page is rendered from, besides the website."""
+        return f"{self._template_version}:{static_assets.version}"
+
+    def etag(self, website_id, website):
+        """Return the ETag of a website's page, given its document, as rendered by this build."""
+        return website_etag(website_id, website.get("version"), website.get("updated_at"), self.build_version)
+
+    def invalidate(self, website_id):
+        """
+        Forget everything cached for a website.
+
+        Args:
+            website_id (str): The website's id.
+        """
+        website_id = str(website_id)
+        with self._lock:
+            self._validated.pop(website_id, None)
+            self._pages.pop(website_id, None)
+
+    def _known_etag(self, website_id):
+        with self._lock:
+            known = self._validated.get(website_id)
+        if known and time.monotonic() - known[1] < self.validate_ttl:
+            return known[0]
+        return None
+
+    def _remember(self, website_id, etag, html=None):
+        with self._lock:
+            self._validated[website_id] = (etag, time.monotonic())
+            if html is not None:
+                self._pages[website_id] = (etag, html)
+                self._pages.move_to_end(website_id)
+                while len(self._pages) > self.max_pages:
+                    evicted, _ = self._pages.popitem(last=False)
+                    self._validated.pop(evicted, None)
+
+    def _cached_page(self, website_id, etag):
+        with self._lock:
+            page = self._pages.get(website_id)
+            if page and page[0] == etag:
+                self._pages.move_to_end(website_id)
+                return page[1]
+        return None
+
+    def _respond(self, html, etag):
+        response = make_response(html)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+    def render_website(self, website_id):
+        """
+        Render the public preview of a website, answering from cache when possible.
+
+        Args:
+            website_id (str): The string representation of the website's ObjectId.
+
+        Returns:
+            Response or tuple: The page, a 304 response, or an error tuple.
+        """
+        try:
+            object_id = ObjectId(website_id)
+        except InvalidId:
+            return "Invalid website ID", 400
+
+        etag = self._known_etag(website_id)
+        if etag and request.if_none_match.contains(etag):
+            return self._respond("", etag).make_conditional(request)
+
+        website = None
+        if etag is None:
+            if request.if_none_match or website_id in self._pages:
+                website = mongo.db.websites.find_one({"_id": object_id}, {"version": 1, "updated_at": 1, "status": 1})
+            else:
+                website = mongo.db.websites.find_one({"_id": object_id})
+            if not website:
+                return "Website not found", 404
+            if website.get("status", STATUS_READY) != STATUS_READY:
+                # Content is still being generated; never cache partial pages.
+                if "content" not in website:
+                    website = mongo.db.websites.find_one({"_id": object_id}) or {}
+                return render_template(TEMPLATE_NAME, content=website.get("content") or {})
+
+            etag = self.etag(website_id, website)
+            self._remember(website_id, etag)
+
+            if request.if_none_match.contains(etag):
+                return self._respond("", etag).make_conditional(request)
+
+        html = self._cached_page(website_id, etag)
+        if html is None:
+            if website is None or "content" not in website:
+                website = mongo.db.websites.find_one({"_id": object_id})
+                if not website:
+                    self.invalidate(website_id)
+                    return "Website not found", 404
+                etag = self.etag(website_id, website)
+            html = render_template(TEMPLATE_NAME, content=website.get("content", {}))
+            self._remember(website_id, etag, html)
+
+        return self._respond(html, etag)
+
+
+page_cache = PageCache()
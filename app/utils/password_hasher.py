@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.utils.metrics import metrics
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued in this process."""
+
+    status_code = 503
+
+    def __init__(self, retry_after=1):
+        self.retry_after = retry_after
+        super().__init__("Too many sign-ins in progress; retry shortly")
+
+
+class PasswordHasher:
+    """
+    Password hashing and verification in a bounded process pool.
+
+    Hashing is deliberately CPU-bound. Run on the request thread, a burst of
+    logins holds the GIL and starves every other request of the worker. Here
+    each hash runs in one of ``PASSWORD_HASH_WORKERS`` processes, and the
+    request thread only waits for its result. At most
+    ``PASSWORD_HASH_QUEUE_DEPTH`` hashes may be pending per worker process;
+    beyond that ``PasswordHasherBusy`` is raised and the route answers 503
+    instead of queueing logins that would time out anyway. A hash that takes
+    longer than ``PASSWORD_HASH_TIMEOUT`` raises it too.
+
+    Hashes use ``PASSWORD_HASH_METHOD`` (werkzeug's ``method`` string, e.g.
+    ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``). ``needs_rehash`` tells
+    whether a stored hash was made with other parameters, so logins can
+    migrate it.
+    """
+
+    def __init__(self, app=None):
+        self.method = "scrypt:32768:8:1"
+        self.salt_length = 16
+        self.workers = os.cpu_count() or 1
+        self.queue_depth = 32
+        self.timeout = 10.0
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._method_prefix = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the hasher from the application config.
+
+        The process pool is started on first use, so every server worker
+        forked from the application gets its own.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.salt_length = app.config.get("PASSWORD_SALT_LENGTH", self.salt_length)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.queue_depth = app.config.get("PASSWORD_HASH_QUEUE_DEPTH", self.queue_depth)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", self.timeout)
+        self._method_prefix = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: the children must not inherit the
+                    # server's threads and locks.
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _run(self, operation, fn, *args):
+        if not self.workers:
+            with metrics.span("password_hash", operation=operation):
+                return fn(*args)
+
+        with self._lock:
+            if self._pending >= self.workers * self.queue_depth:
+                metrics.inc("password_hash_rejected_total", operation=operation)
+                raise PasswordHasherBusy()
+            self._pending += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Released when the hash is done, not when the caller stops waiting: a
+        # hash that timed out still occupies a worker until it finishes.
+        future.add_done_callback(self._release)
+        try:
+            with metrics.span("password_hash", operation=operation):
+                return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            metrics.inc("password_hash_rejected_total", operation=operation)
+            raise PasswordHasherBusy() from None
+        except BrokenProcessPool:
+            # A worker died; start a new pool for the next request.
+            self._executor = None
+            raise
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method.
+
+        Args:
+            password (str): The plaintext password.
+
+        Returns:
+            str: The hash, in werkzeug's ``method$salt$hash`` format.
+
+        Raises:
+            PasswordHasherBusy: If the hashing queue is full or the hash timed out.
+        """
+        return self._run("hash", generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        """
+        Check a password against a stored hash, whatever method made it.
+
+        Args:
+            pwhash (str): The stored hash.
+            password (str): The plaintext password.
+
+        Returns:
+            bool: Whether the password matches.
+
+        Raises:
+            PasswordHasherBusy: If the hashing queue is full or the check timed out.
+        """
+        return self._run("verify", check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Return whether a stored hash was made with other parameters than ``PASSWORD_HASH_METHOD``."""
+        if self._method_prefix is None:
+            # werkzeug fills in defaults ("pbkdf2" -> "pbkdf2:sha256:1000000"),
+            # so compare against the method of an actual hash.
+            self._method_prefix = generate_password_hash("", self.method, 1).split("$", 1)[0]
+        return pwhash.split("$", 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,161 @@
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.utils.scheduler import UpstreamBusy
+
+
+class CircuitOpen(UpstreamBusy):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+    status_code = 503
+
+    def __init__(self, name, retry_after):
+        super().__init__(retry_after, f"{name} upstream is failing; retry later")
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream keeps failing.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and every
+    call raises ``CircuitOpen`` for ``reset_timeout`` seconds. Then one trial
+    call is let through (half-open): success closes the breaker, failure opens
+    it again.
+
+    Args:
+        name (str): Name used in errors, e.g. ``"chat"``.
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_timeout (float): Seconds the breaker stays open.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        """
+        Check that a call may be made.
+
+        Raises:
+            CircuitOpen: If the breaker is open, or half-open with a trial call
+                already running.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpen(self.name, max(remaining, 1))
+            self._trial_running = True
+
+    def abandon(self):
+        """Give back the trial call of a half-open breaker that ``allow`` let through but was not made."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """
+    Full-jitter exponential backoff.
+
+    Args:
+        attempt (int): The retry number, starting at 1.
+        base (float): Delay of the first retry before jitter.
+        cap (float): Largest delay.
+
+    Returns:
+        float: Seconds to sleep, uniformly drawn from ``[0, min(cap, base * 2 ** (attempt - 1))]``.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """
+    Recent latencies of one kind of call, for hedging decisions.
+
+    Args:
+        size (int): Number of recent samples kept.
+    """
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=20):
+        """Return the ``fraction`` percentile of recent samples, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def hedged(fn, delay):
+    """
+    Run ``fn``, and run it a second time if the first has not finished after ``delay``.
+
+    The first successful result wins; the slower call is left to finish in the
+    background and its result is dropped. If both fail, the first error is raised.
+    Each call gets its own two threads, so hedges never queue behind other
+    calls' primaries and hedging adds no cap on concurrency.
+
+    Args:
+        fn (callable): Zero-argument function.
+        delay (float): Seconds to wait before hedging.
+
+    Returns:
+        tuple: ``(result, hedged)`` where ``hedged`` tells whether a second call was made.
+    """
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+    try:
+        primary = executor.submit(contextvars.copy_context().run, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result(), False
+
+        pending = {primary, executor.submit(contextvars.copy_context().run, fn)}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), True
+                first_error = first_error or future.exception()
+        raise first_error
+    finally:
+        executor.shutdown(wait=False)
@@ -0,0 +1,155 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from app.extensions import cache
+
+# Response headers worth replaying from a cached response.
+CACHED_HEADERS = ("Content-Type", "ETag", "Link", "X-Next-Cursor")
+
+# Tag versions live this many times the longest response timeout.
+TAG_TIMEOUT_FACTOR = 2
+
+# Longest ``timeout`` given to ``cached_response`` explicitly.
+_longest_view_timeout = 0
+
+
+def _tag_key(tag):
+    return f"tag:{tag}"
+
+
+def _tag_timeout():
+    """
+    Lifetime of a tag version.
+
+    Tag versions outlive every response cached under them, so an entry is not
+    dropped early, but do expire: one is created per user and per website.
+    """
+    longest = max(current_app.config.get("RESPONSE_CACHE_TIMEOUT", 3600), _longest_view_timeout)
+    return TAG_TIMEOUT_FACTOR * longest
+
+
+def tag_versions(tags):
+    """
+    Return the current version token of each tag, creating missing ones.
+
+    Args:
+        tags (list): Tag names such as ``user:<id>`` or ``site:<id>``.
+
+    Returns:
+        list: One version token per tag.
+    """
+    keys = [_tag_key(tag) for tag in tags]
+    versions = list(cache.get_many(*keys))
+    for index, version in enumerate(versions):
+        if version is None:
+            versions[index] = uuid.uuid4().hex
+            cache.add(keys[index], versions[index], timeout=_tag_timeout())
+            # Another worker may have won the race to create it.
+            versions[index] = cache.get(keys[index]) or versions[index]
+    return versions
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every cached response carrying any of the given tags.
+
+    Tags are versioned: cache keys include the current version of each of their
+    tags, so giving a tag a new version makes every entry built with the old one
+    unreachable. Nothing has to be enumerated or deleted, and it works with any
+    Flask-Caching backend.
+
+    Args:
+        *tags (str): Tag names such as ``user:<id>`` or ``site:<id>``.
+    """
+    cache.set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=_tag_timeout())
+
+
+def remember(key, compute, timeout=None, cacheable=None):
+    """
+    Return the cached value of ``key``, computing and caching it on a miss.
+
+    Uses the backend's stampede protection when it has one (the tiered cache);
+    otherwise a plain get and set.
+
+    Args:
+        key (str): Cache key.
+        compute (callable): Zero-argument function producing the value.
+        timeout (int, optional): Lifetime of the computed value.
+        cacheable (callable, optional): Returns False for computed values that
+            must not be cached.
+    """
+    backend = cache.cache
+    if hasattr(backend, "remember"):
+        return backend.remember(key, compute, timeout=timeout, cacheable=cacheable)
+
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if cacheable is None or cacheable(value):
+            cache.set(key, value, timeout=timeout)
+    return value
+
+
+def cached_response(*tags, timeout=None):
+    """
+    Cache a JSON view per authenticated user, invalidated by tag.
+
+    The cache key combines the JWT identity, the request path, the query string
+    and the current versions of the view's tags. Tags are format strings filled
+    with ``user`` (the JWT identity) and the view's URL arguments.
+
+    Example:
+        @cached_response("user:{user}", "site:{website_id}")
+        def get_website_by_id(website_id): ...
+
+    Args:
+        *tags (str): Tag templates.
+        timeout (int, optional): Entry lifetime in seconds. Defaults to
+            ``RESPONSE_CACHE_TIMEOUT``.
+
+    Only 200 responses are cached. Concurrent misses of one key render the
+    view once (see ``remember``).
+    """
+    global _longest_view_timeout
+    _longest_view_timeout = max(_longest_view_timeout, timeout or 0)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            resolved = [tag.format(user=user_id, **kwargs) for tag in tags]
+            versions = tag_versions(resolved)
+
+            raw_key = "|".join([
+                str(user_id),
+                request.path,
+                request.query_string.decode(),
+                *versions,
+            ])
+            key = "response:" + hashlib.sha1(raw_key.encode()).hexdigest()
+
+            def render():
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                return response.get_data(), response.status_code, headers
+
+            result = remember(
+                key,
+                render,
+                timeout=timeout or current_app.config.get("RESPONSE_CACHE_TIMEOUT", 3600),
+                cacheable=lambda result: isinstance(result, tuple),
+            )
+            if not isinstance(result, tuple):
+                return result
+            body, status, headers = result
+            return current_app.response_class(body, status=status, headers=headers)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,436 @@
+import asyncio
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from pymongo.errors import DuplicateKeyError
+
+from app import mongo
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# The user and priority of the work running in the current context. Upstream
+# calls are queued under them; set them with ``upstream_context``.
+current_user = contextvars.ContextVar("upstream_user", default=None)
+current_priority = contextvars.ContextVar("upstream_priority", default=PRIORITY_INTERACTIVE)
+
+
+class UpstreamBusy(Exception):
+    """
+    Raised when an upstream call cannot start within its priority's wait budget.
+
+    Attributes:
+        retry_after (int): Seconds after which a retry is likely to be admitted.
+        status_code (int): HTTP status routes answer with.
+    """
+
+    status_code = 429
+
+    def __init__(self, retry_after, message="Upstream capacity exhausted; retry later"):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+@contextlib.contextmanager
+def upstream_context(user, priority=PRIORITY_INTERACTIVE):
+    """
+    Run a block of work on behalf of a user at a given priority.
+
+    Threads do not inherit context variables; work handed to an executor must be
+    run with ``contextvars.copy_context().run`` or set its own context.
+
+    Args:
+        user (str): The user the upstream calls are made for.
+        priority (int): ``PRIORITY_INTERACTIVE`` or ``PRIORITY_BATCH``.
+    """
+    user_token = current_user.set(user)
+    priority_token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_user.reset(user_token)
+        current_priority.reset(priority_token)
+
+
+def _refill(state, limits, now):
+    """Return the bucket levels of ``state`` refilled up to ``now``."""
+    elapsed = max(0.0, now - state.get("stamp", now))
+    levels = state.get("levels") or {}
+    return {
+        name: min(limit, levels.get(name, limit) + elapsed * limit / 60.0)
+        for name, limit in limits.items()
+    }
+
+
+def _take(state, limits, costs, now):
+    """
+    Try to take ``costs`` from the buckets of ``state``.
+
+    Returns:
+        tuple: ``(new_state, wait)``. ``wait`` is 0 when the costs were taken,
+        otherwise the seconds until they will be available and ``new_state`` is None.
+    """
+    blocked_until = state.get("blocked_until", 0.0)
+    # Refunds (negative costs only) are accepted while the kind is blocked.
+    if blocked_until > now and any(cost > 0 for cost in costs.values()):
+        return None, blocked_until - now
+
+    levels = _refill(state, limits, now)
+    wait = 0.0
+    for name, cost in costs.items():
+        if name not in limits or cost <= 0:
+            continue
+        # A single call larger than the bucket could never run; let it drain the bucket.
+        cost = min(cost, limits[name])
+        if levels[name] < cost:
+            wait = max(wait, (cost - levels[name]) * 60.0 / limits[name])
+    if wait:
+        return None, wait
+
+    for name, cost in costs.items():
+        if name in limits:
+            levels[name] = min(limits[name], levels[name] - min(cost, limits[name]))
+    return {"levels": levels, "stamp": now, "blocked_until": blocked_until}, 0.0
+
+
+class LocalBucketStore:
+    """Token buckets held in this process."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def take(self, kind, limits, costs, dry_run=False):
+        """
+        Take ``costs`` from the ``kind`` buckets.
+
+        Returns:
+            float: 0 if the costs were taken (or, with ``dry_run``, could be),
+            otherwise the seconds until they will be available.
+        """
+        now = time.time()
+        with self._lock:
+            state = self._states.get(kind) or {"levels": dict(limits), "stamp": now}
+            new_state, wait = _take(state, limits, costs, now)
+            if new_state is not None and not dry_run:
+                self._states[kind] = new_state
+            return wait
+
+    def block(self, kind, seconds):
+        """Refuse every call of ``kind`` for ``seconds``."""
+        with self._lock:
+            state = self._states.setdefault(kind, {"levels": {}, "stamp": time.time()})
+            state["blocked_until"] = max(state.get("blocked_until", 0.0), time.time() + seconds)
+
+
+class MongoBucketStore:
+    """
+    Token buckets shared by every process through the ``upstream_buckets`` collection.
+
+    Each kind of call has one document holding its bucket levels and the time
+    they were computed. Updates are compare-and-swap on that time, so concurrent
+    processes never both spend the same tokens.
+
+    Args:
+        get_collection (callable): Returns the pymongo collection to use.
+        attempts (int): Compare-and-swap attempts before reporting contention.
+    """
+
+    def __init__(self, get_collection, attempts=5):
+        self.get_collection = get_collection
+        self.attempts = attempts
+
+    def take(self, kind, limits, costs, dry_run=False):
+        """Take ``costs`` from the ``kind`` buckets; see ``LocalBucketStore.take``."""
+        collection = self.get_collection()
+        for _ in range(self.attempts):
+            now = time.time()
+            state = collection.find_one({"_id": kind})
+            if state is None:
+                try:
+                    collection.insert_one({"_id": kind, "levels": dict(limits), "stamp": now})
+                except DuplicateKeyError:
+                    pass
+                continue
+
+            new_state, wait = _take(state, limits, costs, now)
+            if new_state is None or dry_run:
+                return wait
+            result = collection.update_one({"_id": kind, "stamp": state.get("stamp")}, {"$set": new_state})
+            if result.modified_count:
+                return 0.0
+        # Heavy contention: back off briefly and let the caller try again.
+        return 0.05
+
+    def block(self, kind, seconds):
+        """Refuse every call of ``kind`` for ``seconds``, in every process."""
+        self.get_collection().update_one(
+            {"_id": kind},
+            {"$max": {"blocked_until": time.time() + seconds}},
+            upsert=True,
+        )
+
+
+class _Ticket:
+    def __init__(self, user, priority, costs):
+        self.user = user
+        self.priority = priority
+        self.costs = costs
+
+
+class UpstreamScheduler:
+    """
+    Admission control for upstream API calls.
+
+    Every chat and image call asks the scheduler for a slot before it is made.
+    Each kind of call has a requests-per-minute and a tokens-per-minute token
+    bucket (``UPSTREAM_<KIND>_RPM`` / ``_TPM``; 0 disables a bucket). Callers that
+    cannot be served immediately wait in a queue that serves interactive work
+    before batch work and, within a priority, takes turns between users, so one
+    user's bulk job cannot starve everyone else.
+
+    A call that would wait longer than its priority's budget
+    (``UPSTREAM_MAX_WAIT_INTERACTIVE`` / ``_BATCH``) raises ``UpstreamBusy``
+    instead, and routes can call ``check`` before starting any work to answer 429
+    early. With ``UPSTREAM_SCHEDULER_BACKEND = "mongo"`` the buckets are shared by
+    all processes; the waiting queue is always per process. The queue's lock is
+    never held while the bucket store is called, so a slow store only delays the
+    call at the head of a queue.
+    """
+
+    def __init__(self, app=None):
+        self.limits = {}
+        self.max_wait = {PRIORITY_INTERACTIVE: 15.0, PRIORITY_BATCH: 300.0}
+        self.store = LocalBucketStore()
+        self._queues = {}
+        # Tokens refunded while the store could not take them, by kind.
+        self._refunds = {}
+        self._condition = threading.Condition()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure limits and the bucket store from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        config = app.config
+        self.limits = {}
+        for kind in ("chat", "image"):
+            limits = {
+                "requests": config.get(f"UPSTREAM_{kind.upper()}_RPM", 0),
+                "tokens": config.get(f"UPSTREAM_{kind.upper()}_TPM", 0),
+            }
+            self.limits[kind] = {name: limit for name, limit in limits.items() if limit > 0}
+        self.max_wait = {
+            PRIORITY_INTERACTIVE: config.get("UPSTREAM_MAX_WAIT_INTERACTIVE", 15.0),
+            PRIORITY_BATCH: config.get("UPSTREAM_MAX_WAIT_BATCH", 300.0),
+        }
+        if config.get("UPSTREAM_SCHEDULER_BACKEND", "local") == "mongo":
+            self.store = MongoBucketStore(lambda: mongo.db.upstream_buckets)
+        else:
+            self.store = LocalBucketStore()
+
+    def _queue(self, kind):
+        # priority -> OrderedDict(user -> deque of tickets); users rotate to the
+        # back after each grant.
+        return self._queues.setdefault(kind, {})
+
+    def _head(self, kind):
+        queue = self._queue(kind)
+        for priority in sorted(queue):
+            for tickets in queue[priority].values():
+                if tickets:
+                    return tickets[0]
+        return None
+
+    def _enqueue(self, kind, ticket):
+        users = self._queue(kind).setdefault(ticket.priority, OrderedDict())
+        users.setdefault(ticket.user, deque()).append(ticket)
+
+    def _remove(self, kind, ticket, served=False):
+        users = self._queue(kind).get(ticket.priority, {})
+        tickets = users.get(ticket.user)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del users[ticket.user]
+            elif served:
+                users.move_to_end(ticket.user)
+        self._condition.notify_all()
+
+    def _take_from_store(self, kind, limits, costs):
+        """Take ``costs`` from the store, returning any queued refund with them. Call without the lock."""
+        with self._condition:
+            refund = self._refunds.pop(kind, 0)
+        if refund:
+            costs = dict(costs, tokens=costs.get("tokens", 0) - refund)
+        wait = self.store.take(kind, limits, costs)
+        if wait and refund:
+            with self._condition:
+                self._refunds[kind] = self._refunds.get(kind, 0) + refund
+        return wait
+
+    def _queued_ahead(self, kind, priority):
+        queue = self._queue(kind)
+        return sum(
+            len(tickets)
+            for level, users in queue.items() if level <= priority
+            for tickets in users.values()
+        )
+
+    def check(self, kind, priority=None):
+        """
+        Raise ``UpstreamBusy`` if a new call of ``kind`` could not start in time.
+
+        The estimate assumes every queued call of the same or higher priority goes
+        first, at the configured request rate.
+
+        Args:
+            kind (str): ``"chat"`` or ``"image"``.
+            priority (int, optional): Defaults to the current context's priority.
+        """
+        limits = self.limits.get(kind)
+        if not limits:
+            return
+        priority = current_priority.get() if priority is None else priority
+        with self._condition:
+            ahead = self._queued_ahead(kind, priority)
+        wait = self.store.take(kind, limits, {"requests": 1}, dry_run=True)
+        if "requests" in limits:
+            wait += ahead * 60.0 / limits["requests"]
+        if wait > self.max_wait[priority]:
+            raise UpstreamBusy(wait)
+
+    def acquire(self, kind, tokens=0):
+        """
+        Wait for a slot to make one upstream call of ``kind``.
+
+        Args:
+            kind (str): ``"chat"`` or ``"image"``.
+            tokens (int): Estimated tokens the call will use.
+
+        Raises:
+            UpstreamBusy: If the call could not start within the wait budget of
+                the current priority.
+        """
+        limits = self.limits.get(kind)
+        if not limits:
+            return
+
+        priority = current_priority.get()
+        ticket = _Ticket(current_user.get(), priority, {"requests": 1, "tokens": tokens})
+        deadline = time.monotonic() + self.max_wait[priority]
+
+        with self._condition:
+            self._enqueue(kind, ticket)
+        try:
+            while True:
+                with self._condition:
+                    while self._head(kind) is not ticket:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise UpstreamBusy(self._queued_ahead(kind, priority) * 60.0 / limits.get("requests", 60))
+                        self._condition.wait(remaining)
+
+                # Only the head of the queue gets here, so tickets stay in order
+                # while the store is called without the lock.
+                wait = self._take_from_store(kind, limits, ticket.costs)
+                if not wait:
+                    with self._condition:
+                        self._remove(kind, ticket, served=True)
+                    return
+                if wait > deadline - time.monotonic():
+                    raise UpstreamBusy(wait)
+                with self._condition:
+                    self._condition.wait(wait)
+        except BaseException:
+            with self._condition:
+                self._remove(kind, ticket)
+            raise
+
+    async def acquire_async(self, kind, tokens=0, poll_interval=0.05):
+        """
+        Wait for a slot without blocking the event loop.
+
+        Same as ``acquire``, and in the same queue, for coroutines: instead of
+        waiting on the condition the coroutine sleeps and checks again every
+        ``poll_interval`` seconds.
+
+        Args:
+            kind (str): ``"chat"`` or ``"image"``.
+            tokens (int): Estimated tokens the call will use.
+            poll_interval (float): Longest sleep between checks while queued.
+
+        Raises:
+            UpstreamBusy: If the call could not start within the wait budget of
+                the current priority.
+        """
+        limits = self.limits.get(kind)
+        if not limits:
+            return
+
+        priority = current_priority.get()
+        ticket = _Ticket(current_user.get(), priority, {"requests": 1, "tokens": tokens})
+        deadline = time.monotonic() + self.max_wait[priority]
+        # The Mongo store makes a network round trip per take.
+        shared = isinstance(self.store, MongoBucketStore)
+
+        with self._condition:
+            self._enqueue(kind, ticket)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                with self._condition:
+                    head = self._head(kind) is ticket
+                if head:
+                    if shared:
+                        wait = await asyncio.to_thread(self._take_from_store, kind, limits, ticket.costs)
+                    else:
+                        wait = self._take_from_store(kind, limits, ticket.costs)
+                    if not wait:
+                        with self._condition:
+                            self._remove(kind, ticket, served=True)
+                        return
+                    if wait > remaining:
+                        raise UpstreamBusy(wait)
+                    await asyncio.sleep(min(wait, poll_interval))
+                else:
+                    if remaining <= 0:
+                        with self._condition:
+                            ahead = self._queued_ahead(kind, priority)
+                        raise UpstreamBusy(ahead * 60.0 / limits.get("requests", 60))
+                    await asyncio.sleep(poll_interval)
+        except BaseException:
+            with self._condition:
+                self._remove(kind, ticket)
+            raise
+
+    def refund(self, kind, tokens):
+        """
+        Return tokens reserved by ``acquire`` that the call did not use.
+
+        A refund the store cannot take right away (contention on the shared
+        store) is queued and returned with the next call of ``kind``.
+        """
+        limits = self.limits.get(kind)
+        if limits and tokens > 0 and "tokens" in limits:
+            with self._condition:
+                self._refunds[kind] = self._refunds.get(kind, 0) + tokens
+            self._take_from_store(kind, limits, {})
+
+    def block(self, kind, seconds):
+        """Stop admitting calls of ``kind`` for ``seconds``, e.g. after an upstream 429."""
+        if self.limits.get(kind):
+            self.store.block(kind, seconds)
+        with self._condition:
+            self._condition.notify_all()
+
+
+upstream_scheduler = UpstreamScheduler()
@@ -0,0 +1,356 @@
+import asyncio
+import copy
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightTimeout(Exception):
+    """Raised when a follower gives up waiting for the in-flight call it joined."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MongoLeaseStore:
+    """
+    Cross-process coordination for ``SingleFlight`` through lease documents.
+
+    The process that inserts the lease document for a key runs the call; other
+    processes poll the document until the leader stores the result or an error.
+    Leases expire so a crashed leader does not block a key forever, and finished
+    leases are removed by a TTL index on ``expires_at`` (declared in
+    ``app.models.indexes``). A live leader renews its lease every third of
+    ``lease_seconds`` (``renewing``), so a generation may take longer than the
+    lease without another process taking it over.
+
+    Args:
+        get_collection (callable): Returns the pymongo collection to use. Resolved
+            lazily so the store can be created before the database is configured.
+        lease_seconds (int): How long a leader owns a key before others may take over.
+        result_seconds (int): How long a finished result stays readable.
+        poll_interval (float): Seconds between polls while following.
+    """
+
+    def __init__(self, get_collection, lease_seconds=120, result_seconds=30, poll_interval=0.25):
+        self.get_collection = get_collection
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def collection(self):
+        return self.get_collection()
+
+    @property
+    def renew_interval(self):
+        return self.lease_seconds / 3
+
+    def acquire(self, key):
+        """Try to become the leader for ``key``; return True on success."""
+        now = datetime.utcnow()
+        lease = {
+            "_id": key,
+            "owner": self.owner,
+            "state": "running",
+            "expires_at": now + timedelta(seconds=self.lease_seconds),
+        }
+        try:
+            self.collection.insert_one(lease)
+            return True
+        except DuplicateKeyError:
+            # Take over a lease whose leader died or whose result has gone stale.
+            taken = self.collection.find_one_and_update(
+                {"_id": key, "expires_at": {"$lt": now}},
+                {"$set": lease, "$unset": {"result": "", "error": ""}},
+            )
+            return taken is not None
+
+    def renew(self, key):
+        """Extend this process's running lease on ``key``; return False if it was lost."""
+        result = self.collection.update_one(
+            {"_id": key, "owner": self.owner, "state": "running"},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}},
+        )
+        return result.matched_count == 1
+
+    @contextmanager
+    def renewing(self, key):
+        """Renew the lease on ``key`` from a background thread while the block runs."""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.renew_interval):
+                try:
+                    if not self.renew(key):
+                        logger.warning("Single-flight lease %s was taken over", key)
+                        return
+                except Exception:
+                    logger.exception("Could not renew single-flight lease %s", key)
+
+        thread = threading.Thread(target=renew, name="lease-renewal", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    def complete(self, key, result=None, error=None):
+        """Publish the leader's result (or error) to followers."""
+        update = {
+            "state": "failed" if error else "done",
+            "expires_at": datetime.utcnow() + timedelta(seconds=self.result_seconds),
+        }
+        if error:
+            update["error"] = error
+        else:
+            update["result"] = result
+        self.collection.update_one({"_id": key, "owner": self.owner}, {"$set": update})
+
+    def wait(self, key, timeout):
+        """
+        Wait for another process to finish ``key``.
+
+        Returns:
+            The published result.
+
+        Raises:
+            SingleFlightTimeout: If no result arrived within ``timeout`` seconds.
+            RuntimeError: If the leader failed.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            done, result = self.poll(key)
+            if done:
+                return result
+            time.sleep(self.poll_interval)
+        raise SingleFlightTimeout(f"Timed out waiting for {key}")
+
+    def poll(self, key):
+        """
+        Check once whether another process has finished ``key``.
+
+        Returns:
+            tuple: ``(True, result)`` once the leader is done, else ``(False, None)``.
+
+        Raises:
+            SingleFlightTimeout: If the lease has disappeared.
+            RuntimeError: If the leader failed.
+        """
+        lease = self.collection.find_one({"_id": key})
+        if lease is None:
+            # The leader's result expired before we read it; let the caller retry.
+            raise SingleFlightTimeout(f"Lease for {key} disappeared")
+        if lease["state"] == "done":
+            return True, lease["result"]
+        if lease["state"] == "failed":
+            raise RuntimeError(lease.get("error") or "Generation failed")
+        return False, None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single upstream call.
+
+    The first caller for a key (the leader) runs the function; callers arriving
+    while it is in flight (followers) wait for its result instead of making the
+    same call again. Followers receive deep copies, so each caller owns what it
+    gets back. With a ``MongoLeaseStore`` the same holds across processes and
+    app nodes.
+
+    Example:
+        flight = SingleFlight("content")
+        content = flight.do(key, lambda: generate_site_content(business_type, industry))
+    """
+
+    def __init__(self, name, lease_store=None, wait_timeout=120):
+        self.name = name
+        self.lease_store = lease_store
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, wait_timeout=None):
+        """
+        Run ``fn`` once for all concurrent callers with the same ``key``.
+
+        Args:
+            key (str): Normalized key identifying equivalent calls.
+            fn (callable): Zero-argument function making the upstream call.
+            wait_timeout (float, optional): Seconds a follower waits for the leader.
+                Defaults to the instance's ``wait_timeout``.
+
+        Returns:
+            The result of ``fn``.
+
+        Raises:
+            SingleFlightTimeout: If this caller was a follower and timed out.
+        """
+        wait_timeout = wait_timeout or self.wait_timeout
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(wait_timeout):
+                raise SingleFlightTimeout(f"Timed out waiting for in-flight {self.name} call")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._lead(key, fn, wait_timeout)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _lead(self, key, fn, wait_timeout):
+        if self.lease_store is None:
+            return fn()
+
+        lease_key = f"{self.name}:{key}"
+        try:
+            acquired = self.lease_store.acquire(lease_key)
+        except Exception:
+            logger.exception("Single-flight lease unavailable; running %s call locally", self.name)
+            return fn()
+
+        if not acquired:
+            try:
+                return self.lease_store.wait(lease_key, wait_timeout)
+            except SingleFlightTimeout:
+                if self.lease_store.acquire(lease_key):
+                    return self._run_with_lease(lease_key, fn)
+                raise
+
+        return self._run_with_lease(lease_key, fn)
+
+    def _run_with_lease(self, lease_key, fn):
+        try:
+            with self.lease_store.renewing(lease_key):
+                result = fn()
+        except Exception as e:
+            self.lease_store.complete(lease_key, error=str(e))
+            raise
+        self.lease_store.complete(lease_key, result=result)
+        return result
+
+
+class AsyncSingleFlight:
+    """
+    ``SingleFlight`` for coroutines running on one event loop.
+
+    The leader's coroutine runs as a task; followers await the same task, with
+    a timeout, and receive deep copies of its result. With a ``MongoLeaseStore``
+    (the one ``SingleFlight`` uses for the same name) the coalescing also spans
+    processes, and the sync and async routes share the same leases; the store's
+    blocking calls run in worker threads.
+    """
+
+    def __init__(self, name, lease_store=None, wait_timeout=120):
+        self.name = name
+        self.lease_store = lease_store
+        self.wait_timeout = wait_timeout
+        self._tasks = {}
+
+    async def do(self, key, fn, wait_timeout=None):
+        """
+        Await ``fn()`` once for all concurrent callers with the same ``key``.
+
+        Args:
+            key (str): Normalized key identifying equivalent calls.
+            fn (callable): Zero-argument coroutine function making the upstream call.
+            wait_timeout (float, optional): Seconds a follower waits for the leader.
+
+        Returns:
+            The result of ``fn``.
+
+        Raises:
+            SingleFlightTimeout: If this caller was a follower and timed out.
+        """
+        wait_timeout = wait_timeout or self.wait_timeout
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(self._lead(key, fn, wait_timeout))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            # Shielded, so a disconnecting leader does not cancel the call its followers await.
+            return await asyncio.shield(task)
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), wait_timeout)
+        except asyncio.TimeoutError:
+            raise SingleFlightTimeout(f"Timed out waiting for in-flight {self.name} call")
+        return copy.deepcopy(result)
+
+    async def _lead(self, key, fn, wait_timeout):
+        if self.lease_store is None:
+            return await fn()
+
+        lease_key = f"{self.name}:{key}"
+        try:
+            acquired = await asyncio.to_thread(self.lease_store.acquire, lease_key)
+        except Exception:
+            logger.exception("Single-flight lease unavailable; running %s call locally", self.name)
+            return await fn()
+
+        if not acquired:
+            try:
+                return await self._wait(lease_key, wait_timeout)
+            except SingleFlightTimeout:
+                if await asyncio.to_thread(self.lease_store.acquire, lease_key):
+                    return await self._run_with_lease(lease_key, fn)
+                raise
+
+        return await self._run_with_lease(lease_key, fn)
+
+    async def _wait(self, lease_key, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            done, result = await asyncio.to_thread(self.lease_store.poll, lease_key)
+            if done:
+                return result
+            await asyncio.sleep(self.lease_store.poll_interval)
+        raise SingleFlightTimeout(f"Timed out waiting for {lease_key}")
+
+    async def _renew(self, lease_key):
+        while True:
+            await asyncio.sleep(self.lease_store.renew_interval)
+            try:
+                if not await asyncio.to_thread(self.lease_store.renew, lease_key):
+                    logger.warning("Single-flight lease %s was taken over", lease_key)
+                    return
+            except Exception:
+                logger.exception("Could not renew single-flight lease %s", lease_key)
+
+    async def _run_with_lease(self, lease_key, fn):
+        renewal = asyncio.ensure_future(self._renew(lease_key))
+        try:
+            result = await fn()
+        except Exception as e:
+            await asyncio.to_thread(self.lease_store.complete, lease_key, error=str(e))
+            raise
+        finally:
+            renewal.cancel()
+        await asyncio.to_thread(self.lease_store.complete, lease_key, result=result)
+        return result
@@ -0,0 +1,287 @@
+import gzip
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app, render_template, request, send_file, send_from_directory, url_for
+
+from app import mongo
+from app.models.website_model import STATUS_READY
+from app.utils.image_store import CACHE_MAX_AGE, DiskBackend, image_store
+from app.utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only a gzip variant is written.
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.html"
+IMAGES_DIR = "images"
+
+# Encodings in order of preference, with the suffix of their precompressed file.
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+# Bundled images are plain files, so one format is picked for every browser.
+BUNDLE_IMAGE_ACCEPT = "image/webp"
+
+# Set in the exporting process before its workers are forked.
+_export_app = None
+
+
+def _write(path, data):
+    # Unique per thread: the same site may be published by two requests at once.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class SitePublisher:
+    """
+    Static HTML bundles of published websites, served without MongoDB or Jinja.
+
+    Publishing a website renders ``preview.html`` once into
+    ``<PUBLISH_PATH>/<website_id>/index.html``, with gzip and brotli variants,
+    and copies its images (hard-linked when the image store is on the same
+    disk) into ``images/`` next to it. The public views serve that file when it
+    exists: a ``stat`` and a ``send_file``, which WSGI servers such as gunicorn
+    turn into ``sendfile(2)``. Every write to a website republishes it, so the
+    bundle never goes stale; unpublished and deleted websites lose their bundle.
+    """
+
+    def __init__(self, app=None):
+        self.root = None
+        self.workers = os.cpu_count() or 1
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Configure the publisher from the application config.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.root = app.config.get("PUBLISH_PATH") or os.path.join(app.instance_path, "published")
+        self.workers = app.config.get("PUBLISH_WORKERS") or os.cpu_count() or 1
+
+    def directory(self, website_id):
+        """Return the bundle directory of a website, or None if ``website_id`` is not an ObjectId."""
+        try:
+            website_id = str(ObjectId(website_id))
+        except (InvalidId, TypeError):
+            return None
+        return os.path.join(self.root, website_id)
+
+    def has_bundle(self, website_id):
+        """Return whether a website currently has a published bundle."""
+        directory = self.directory(website_id)
+        return directory is not None and os.path.isfile(os.path.join(directory, INDEX_NAME))
+
+    def render(self, website):
+        """
+        Render a website's bundle page.
+
+        Must run in a request context (``url_for`` builds the static URLs).
+
+        Args:
+            website (dict): The website document.
+
+        Returns:
+            tuple: ``(html, images)`` with images as ``{bundle name: (digest, stored name)}``.
+        """
+        website_id = str(website["_id"])
+        html = render_template("preview.html", content=website.get("content") or {})
+        images = {}
+        image_url = re.compile(re.escape(image_store.url_prefix) + r"/([0-9a-f]{64})/(\w+)")
+
+        def replace(match):
+            digest, variant = match.groups()
+            found = image_store.find(digest, variant, BUNDLE_IMAGE_ACCEPT)
+            if found is None:
+                return match.group(0)
+            name = f"{digest}-{found[0]}"
+            images[name] = (digest, found[0])
+            return url_for("website.serve_published_file", website_id=website_id, filename=f"{IMAGES_DIR}/{name}")
+
+        return image_url.sub(replace, html), images
+
+    def publish(self, website):
+        """
+        Write the bundle of a website.
+
+        Images are written first and the page last, each file atomically, so a
+        reader never sees a page referencing missing images.
+
+        Args:
+            website (dict): The website document.
+        """
+        directory = self.directory(website["_id"])
+        with metrics.span("publish_site"):
+            html, images = self.render(website)
+            images_dir = os.path.join(directory, IMAGES_DIR)
+            os.makedirs(images_dir, exist_ok=True)
+
+            for name, (digest, stored_name) in images.items():
+                path = os.path.join(images_dir, name)
+                if not os.path.exists(path):
+                    self._copy_image(digest, stored_name, path)
+
+            data = html.encode("utf-8")
+            index = os.path.join(directory, INDEX_NAME)
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                _write(index + suffix, compressed)
+            _write(index, data)
+
+            for name in os.listdir(images_dir):
+                if name not in images and not name.endswith(".tmp"):
+                    os.remove(os.path.join(images_dir, name))
+        metrics.inc("site_publish_total", result="published")
+
+    def _copy_image(self, digest, stored_name, path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if isinstance(image_store.backend, DiskBackend):
+            source = image_store.backend.path(digest, stored_name)
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                # Another filesystem, or links unsupported.
+                shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, path)
+        else:
+            _write(path, image_store.backend.read(digest, stored_name))
+
+    def unpublish(self, website_id):
+        """Delete the bundle of a website, if any."""
+        directory = self.directory(website_id)
+        if directory and os.path.isdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+            metrics.inc("site_publish_total", result="removed")
+
+    def republish(self, website_id):
+        """
+        Bring the bundle of a website in line with its document.
+
+        Published, ready websites are (re)published; any other website's bundle
+        is removed. Errors are logged rather than raised: the write that
+        triggered the republish already succeeded.
+
+        Args:
+            website_id (str): The website's id.
+
+        Returns:
+            bool: Whether the website is published.
+        """
+        try:
+            website = mongo.db.websites.find_one({"_id": ObjectId(website_id), "is_published": True})
+            if website is None or website.get("status", STATUS_READY) != STATUS_READY:
+                self.unpublish(website_id)
+                return False
+            self.publish(website)
+            return True
+        except Exception:
+            logger.exception("Failed to republish website %s", website_id)
+            metrics.inc("site_publish_total", result="failed")
+            return False
+
+    def send(self, website_id, filename=INDEX_NAME):
+        """
+        Serve a file of a website's bundle for the current request.
+
+        The page is served in the best encoding the browser accepts and
+        revalidated on every request; images have content-addressed names and
+        are cached forever.
+
+        Args:
+            website_id (str): The website's id.
+            filename (str): ``index.html`` or ``images/<name>``.
+
+        Returns:
+            Response or None: The file response, or None when the website is not published.
+        """
+        directory = self.directory(website_id)
+        if directory is None:
+            return None
+
+        if filename != INDEX_NAME:
+            response = send_from_directory(directory, filename, max_age=CACHE_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+
+        path = os.path.join(directory, INDEX_NAME)
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings.quality(encoding) > 0 and os.path.exists(path + suffix):
+                break
+        else:
+            encoding, suffix = None, ""
+        try:
+            response = send_file(path + suffix, mimetype="text/html", conditional=True, max_age=0)
+        except FileNotFoundError:
+            return None
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        response.cache_control.no_cache = True
+        return response
+
+    def export_all(self, workers=None):
+        """
+        Rebuild the bundle of every published website, in parallel processes.
+
+        Bundles of websites that are no longer published are removed.
+
+        Args:
+            workers (int, optional): Number of processes. Defaults to ``PUBLISH_WORKERS``.
+
+        Returns:
+            tuple: ``(published, failed)`` counts.
+        """
+        global _export_app
+        started = time.time()
+        website_ids = [str(doc["_id"]) for doc in mongo.db.websites.find({"is_published": True}, {"_id": 1})]
+        workers = max(1, min(workers or self.workers, len(website_ids)))
+
+        if workers == 1 or "fork" not in multiprocessing.get_all_start_methods():
+            results = [_export_one(website_id) for website_id in website_ids]
+        else:
+            _export_app = current_app._get_current_object()
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_export_worker) as executor:
+                results = list(executor.map(_export_one, website_ids, chunksize=max(1, len(website_ids) // (workers * 4))))
+
+        published = set(website_ids)
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                # Sites published while the export ran are newer than ``started``.
+                if name not in published and os.path.isdir(path) and os.path.getmtime(path) < started:
+                    shutil.rmtree(path, ignore_errors=True)
+
+        return sum(results), len(results) - sum(results)
+
+
+def _init_export_worker():
+    # MongoDB clients must not be shared across fork.
+    mongo.init_app(_export_app)
+
+
+def _export_one(website_id):
+    app = _export_app or current_app._get_current_object()
+    with app.test_request_context():
+        return site_publisher.republish(website_id)
+
+
+site_publisher = SitePublisher()
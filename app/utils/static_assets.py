@@ -0,0 +1,285 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip variants are built.
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Fingerprinted files never change, so browsers may cache them for a year.
+CACHE_MAX_AGE = 31536000
+
+MANIFEST_NAME = "manifest.json"
+
+# Content types worth compressing; images and woff/woff2 fonts are already compressed.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "font/ttf",
+    "font/otf",
+    "application/vnd.ms-fontobject",
+    "application/x-font-ttf",
+)
+COMPRESSIBLE_EXTENSIONS = {".map", ".scss", ".ttf", ".otf", ".eot"}
+
+# Smaller files gain nothing from a compressed variant.
+MIN_COMPRESS_SIZE = 256
+
+# Encodings in order of preference, with the suffix of their precompressed file.
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3""")
+
+
+def fingerprint(path, data):
+    """Return ``path`` with the first 10 hex digits of the SHA-256 of ``data`` before its extension."""
+    stem, ext = posixpath.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def is_compressible(path):
+    mimetype = mimetypes.guess_type(path)[0] or ""
+    return mimetype.startswith(COMPRESSIBLE_TYPES) or posixpath.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS
+
+
+def rewrite_css_urls(css, path, urls):
+    """
+    Point relative ``url()`` and ``@import`` references of a stylesheet at fingerprinted files.
+
+    Args:
+        css (str): The stylesheet.
+        path (str): The stylesheet's path within its mount, e.g. ``assets/css/fontawesome.css``.
+        urls (dict): Fingerprinted paths built so far, by original path.
+
+    Returns:
+        str: The stylesheet; references to files that were not fingerprinted are kept.
+    """
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        reference = match.group(2) or match.group(4)
+        if reference.startswith(("data:", "/", "#")) or "://" in reference:
+            return match.group(0)
+        # Keep query strings and fragments such as "?v=4.7.0" or "#iefix".
+        cut = re.search(r"[?#]|$", reference).start()
+        target, suffix = reference[:cut], reference[cut:]
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        hashed = urls.get(resolved)
+        if hashed is None:
+            return match.group(0)
+        relative = posixpath.relpath(hashed, directory or ".")
+        return match.group(0).replace(reference, relative + suffix, 1)
+
+    return CSS_URL.sub(replace, css)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_static_assets(sources, dist_path, clean=False):
+    """
+    Fingerprint and precompress static files into ``dist_path``.
+
+    Every file of every source directory is copied to
+    ``<dist_path>/<mount>/<path with content hash>``, with ``.gz`` and (when the
+    ``brotli`` package is installed) ``.br`` variants of compressible files.
+    Stylesheets are rewritten to reference the fingerprinted fonts and images.
+    ``manifest.json`` maps original paths to the built files.
+
+    Args:
+        sources (dict): Source directories by mount name, e.g. ``{"static": "app/static"}``.
+        dist_path (str): Output directory.
+        clean (bool): Delete previous builds first. By default old fingerprinted
+            files are kept so running processes can still serve pages that link to them.
+
+    Returns:
+        dict: Totals: ``files``, ``bytes``, ``gzip_bytes`` and ``br_bytes`` (original
+        and compressed sizes of the files that got compressed variants).
+    """
+    if clean and os.path.isdir(dist_path):
+        shutil.rmtree(dist_path)
+
+    manifest = {}
+    stats = {"files": 0, "bytes": 0, "gzip_bytes": 0, "br_bytes": 0}
+
+    for mount, source in sources.items():
+        paths = []
+        for root, _, names in os.walk(source):
+            for name in names:
+                paths.append(os.path.relpath(os.path.join(root, name), source).replace(os.sep, "/"))
+        # Stylesheets last, so the files they reference are already fingerprinted.
+        paths.sort(key=lambda path: (path.endswith(".css"), path))
+
+        entries = manifest[mount] = {}
+        urls = {}
+        for path in paths:
+            with open(os.path.join(source, path), "rb") as f:
+                data = f.read()
+            if path.endswith(".css"):
+                data = rewrite_css_urls(data.decode("utf-8"), path, urls).encode("utf-8")
+
+            hashed = fingerprint(path, data)
+            target = os.path.join(dist_path, mount, *hashed.split("/"))
+            _write(target, data)
+            urls[path] = hashed
+            entry = entries[path] = {"path": hashed, "encodings": []}
+            stats["files"] += 1
+
+            if len(data) < MIN_COMPRESS_SIZE or not is_compressible(path):
+                continue
+            variants = [("gzip", ".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.insert(0, ("br", ".br", brotli.compress(data, quality=11)))
+            for encoding, suffix, compressed in variants:
+                if len(compressed) < len(data) * 0.95:
+                    _write(target + suffix, compressed)
+                    entry["encodings"].append(encoding)
+                    stats["gzip_bytes" if encoding == "gzip" else "br_bytes"] += len(compressed)
+            if entry["encodings"]:
+                stats["bytes"] += len(data)
+
+    _write(os.path.join(dist_path, MANIFEST_NAME), json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+    return stats
+
+
+class StaticAssets:
+    """
+    Fingerprinted, precompressed static files.
+
+    ``flask build-static`` writes every file of ``app/static`` and ``app/staticfiles``
+    under a content-hashed name, with gzip and brotli variants, to
+    ``STATIC_DIST_PATH``. Once that build exists, ``url_for('static', ...)`` and
+    ``url_for('serve_staticfiles', ...)`` in templates resolve to the hashed names,
+    which are served in the best encoding the browser accepts with
+    ``Cache-Control: public, max-age=31536000, immutable``. Without a build (in
+    development) the original files are served as before.
+    """
+
+    # URL endpoints serving static files, and the mount each one serves.
+    endpoints = {"static": "static", "serve_staticfiles": "staticfiles"}
+
+    def __init__(self, app=None):
+        self.sources = {}
+        self.dist_path = None
+        self.urls = {}
+        self.files = {}
+        self.version = ""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Load the build manifest, if any, and take over the static file endpoints.
+
+        Args:
+            app (Flask): The Flask application instance.
+        """
+        self.sources = {
+            "static": app.static_folder,
+            "staticfiles": os.path.join(app.root_path, "staticfiles"),
+        }
+        self.dist_path = app.config.get("STATIC_DIST_PATH") or os.path.join(app.root_path, "static_dist")
+        self.load()
+
+        app.url_defaults(self.fingerprint_url)
+        if app.has_static_folder:
+            app.view_functions["static"] = lambda filename: self.send("static", filename)
+
+    def load(self):
+        """
+        (Re)load the manifest written by ``build``.
+
+        ``version`` becomes a digest of the manifest, which changes whenever a
+        build changes any fingerprinted name, or "" without a build.
+        """
+        self.urls, self.files, self.version = {}, {}, ""
+        try:
+            with open(os.path.join(self.dist_path, MANIFEST_NAME), "rb") as f:
+                data = f.read()
+            manifest = json.loads(data)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            logger.exception("Ignoring unreadable static manifest; run `flask build-static`")
+            return
+        self.version = hashlib.sha1(data).hexdigest()
+        for mount, entries in manifest.items():
+            self.urls[mount] = {path: entry["path"] for path, entry in entries.items()}
+            self.files[mount] = {entry["path"]: entry["encodings"] for entry in entries.values()}
+
+    def build(self, clean=False):
+        """Build the fingerprinted files from the static directories and load the new manifest."""
+        stats = build_static_assets(self.sources, self.dist_path, clean=clean)
+        self.load()
+        return stats
+
+    def url(self, mount, filename):
+        """Return the fingerprinted name of ``filename``, or ``filename`` itself when it was not built."""
+        return self.urls.get(mount, {}).get(filename, filename)
+
+    def fingerprint_url(self, endpoint, values):
+        """URL defaults callback rewriting ``filename`` of static endpoints to its fingerprinted name."""
+        mount = self.endpoints.get(endpoint)
+        if mount and "filename" in values:
+            values["filename"] = self.url(mount, values["filename"])
+
+    def send(self, mount, filename):
+        """
+        Serve a static file for the current request.
+
+        Fingerprinted names are served from the build, precompressed when the
+        browser accepts it, and cached forever. Other names are served from the
+        source directory with Flask's default caching.
+
+        Args:
+            mount (str): ``"static"`` or ``"staticfiles"``.
+            filename (str): The requested path.
+
+        Returns:
+            Response: The file response.
+        """
+        encodings = self.files.get(mount, {}).get(filename)
+        if encodings is None:
+            return send_from_directory(self.sources[mount], filename)
+
+        suffix = ""
+        encoding = None
+        for name, extension in ENCODINGS:
+            if name in encodings and request.accept_encodings.quality(name) > 0:
+                encoding, suffix = name, extension
+                break
+
+        response = send_from_directory(
+            os.path.join(self.dist_path, mount),
+            filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            max_age=CACHE_MAX_AGE,
+        )
+        if encoding:
+            response.content_encoding = encoding
+        if encodings:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,446 @@
+import hashlib
+import math
+import os
+import pickle
+import random
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from bson import Binary
+from flask_caching.backends.base import BaseCache
+from pymongo.errors import DuplicateKeyError
+
+from app.utils.metrics import metrics
+
+
+class LRUByteCache:
+    """
+    Bounded in-process LRU of serialized values, sized in bytes.
+
+    Args:
+        max_bytes (int): Total size of the stored values; least recently used
+            entries are evicted beyond it.
+        max_ttl (float): Longest time an entry is kept, whatever its own expiry.
+            Keeps the copies of several processes close to the shared tier.
+    """
+
+    def __init__(self, max_bytes, max_ttl):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.time():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data, expires_at=None):
+        if len(data) > self.max_bytes:
+            return
+        local_expiry = time.time() + self.max_ttl
+        expires_at = local_expiry if expires_at is None else min(expires_at, local_expiry)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (data, expires_at)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+class FileStore:
+    """
+    Shared cache tier in a directory, one file per key.
+
+    Every process of a host sees the same entries. ``add`` links a fully written
+    file into place, which fails if the key exists, so it is atomic across
+    processes and can serve as a lock.
+
+    Args:
+        directory (str): Where the files live.
+        prune_every (int): Writes between sweeps that delete expired files.
+    """
+
+    def __init__(self, directory, prune_every=1000):
+        self.directory = directory
+        self.prune_every = prune_every
+        self._writes = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                expires_at, data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data
+
+    def _write_tmp(self, path, data, expires_at):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((expires_at, data), f, pickle.HIGHEST_PROTOCOL)
+        return tmp_path
+
+    def get(self, key):
+        return self._read(self._path(key))
+
+    def get_many(self, keys):
+        return {key: data for key in keys if (data := self.get(key)) is not None}
+
+    def set(self, key, data, expires_at=None):
+        path = self._path(key)
+        os.replace(self._write_tmp(path, data, expires_at), path)
+        self._count_write()
+
+    def add(self, key, data, expires_at=None):
+        path = self._path(key)
+        tmp_path = self._write_tmp(path, data, expires_at)
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, path)
+                    return True
+                except FileExistsError:
+                    # An expired entry does not count; _read removes it.
+                    if self._read(path) is not None:
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _count_write(self):
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired files."""
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".tmp"):
+                    self._read(os.path.join(root, name))
+
+
+class MongoStore:
+    """
+    Shared cache tier in a MongoDB collection, visible to every app node.
+
+    Documents are ``{_id: key, data, expires_at}``; a TTL index on
+    ``expires_at`` (declared in ``app.models.indexes``) removes expired ones,
+    and reads ignore entries the TTL monitor has not reached yet.
+
+    Args:
+        get_collection (callable): Returns the pymongo collection to use.
+    """
+
+    def __init__(self, get_collection):
+        self.get_collection = get_collection
+
+    @property
+    def collection(self):
+        return self.get_collection()
+
+    @staticmethod
+    def _live(now):
+        return {"$or": [{"expires_at": {"$gt": now}}, {"expires_at": None}]}
+
+    @staticmethod
+    def _document(key, data, expires_at):
+        doc = {"_id": key, "data": Binary(data)}
+        if expires_at is not None:
+            doc["expires_at"] = datetime.utcfromtimestamp(expires_at)
+        return doc
+
+    def get(self, key):
+        doc = self.collection.find_one({"_id": key, **self._live(datetime.utcnow())}, {"data": 1})
+        return bytes(doc["data"]) if doc else None
+
+    def get_many(self, keys):
+        docs = self.collection.find({"_id": {"$in": list(keys)}, **self._live(datetime.utcnow())}, {"data": 1})
+        return {doc["_id"]: bytes(doc["data"]) for doc in docs}
+
+    def set(self, key, data, expires_at=None):
+        self.collection.replace_one({"_id": key}, self._document(key, data, expires_at), upsert=True)
+
+    def add(self, key, data, expires_at=None):
+        doc = self._document(key, data, expires_at)
+        try:
+            self.collection.insert_one(doc)
+            return True
+        except DuplicateKeyError:
+            # Take over an entry that expired but was not removed yet.
+            result = self.collection.replace_one({"_id": key, "expires_at": {"$lte": datetime.utcnow()}}, doc)
+            return result.matched_count == 1
+
+    def delete(self, key):
+        self.collection.delete_one({"_id": key})
+
+    def clear(self):
+        self.collection.delete_many({})
+
+
+class TieredCache(BaseCache):
+    """
+    Flask-Caching backend with an in-process LRU in front of a shared tier.
+
+    L1 is an ``LRUByteCache`` bounded by ``CACHE_L1_MAX_BYTES``; its entries live
+    at most ``CACHE_L1_TTL`` seconds so a write made by another worker is seen
+    soon after. L2 (``CACHE_L2_BACKEND``) is shared by all workers: ``"file"``
+    (under ``CACHE_DIR``) for one host, ``"mongo"`` for several, or ``"none"``.
+    Writes go to both tiers; L1 misses are filled from L2.
+
+    ``remember`` adds stampede protection: a missing value is computed by one
+    caller holding a lock in L2 while the others wait for it, and values are
+    recomputed slightly before they expire, with a probability that grows as
+    expiry nears and with the time the value took to compute (XFetch), so hot
+    keys are refreshed by one request instead of expiring under many.
+
+    Args:
+        l2: ``FileStore``, ``MongoStore`` or None.
+        l1_max_bytes (int): Size of the L1 LRU.
+        l1_ttl (float): Longest lifetime of an L1 entry.
+        lock_timeout (float): How long a ``remember`` lock is held at most, and
+            how long other callers wait for its value.
+        early_refresh_beta (float): XFetch aggressiveness; 0 disables early refresh.
+        default_timeout (int): Lifetime of entries set without a timeout.
+    """
+
+    def __init__(
+        self,
+        l2=None,
+        l1_max_bytes=32 * 1024 * 1024,
+        l1_ttl=2.0,
+        lock_timeout=30.0,
+        early_refresh_beta=1.0,
+        default_timeout=300,
+    ):
+        super().__init__(default_timeout=default_timeout)
+        self.l1 = LRUByteCache(l1_max_bytes, l1_ttl)
+        self.l2 = l2
+        self.lock_timeout = lock_timeout
+        self.early_refresh_beta = early_refresh_beta
+        self._local_locks = {}
+        self._local_lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        backend = config.get("CACHE_L2_BACKEND", "file")
+        if backend == "mongo":
+            from app import mongo
+            l2 = MongoStore(lambda: mongo.db.cache_entries)
+        elif backend == "file":
+            l2 = FileStore(config.get("CACHE_DIR") or os.path.join(app.instance_path, "cache"))
+        else:
+            l2 = None
+        return cls(
+            l2,
+            l1_max_bytes=config.get("CACHE_L1_MAX_BYTES", 32 * 1024 * 1024),
+            l1_ttl=config.get("CACHE_L1_TTL", 2.0),
+            lock_timeout=config.get("CACHE_LOCK_TIMEOUT", 30.0),
+            early_refresh_beta=config.get("CACHE_EARLY_REFRESH_BETA", 1.0),
+            **kwargs,
+        )
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return None if timeout == 0 else time.time() + timeout
+
+    def _load(self, key):
+        """Return the stored ``(value, expires_at, delta)`` of ``key``, or None."""
+        data = self.l1.get(key)
+        tier = "l1"
+        if data is None and self.l2 is not None:
+            data = self.l2.get(key)
+            tier = "l2"
+        if data is None:
+            metrics.inc("cache_requests_total", result="miss")
+            return None
+        entry = pickle.loads(data)
+        if tier == "l2":
+            self.l1.set(key, data, entry[1])
+        metrics.inc("cache_requests_total", result=f"{tier}_hit")
+        return entry
+
+    def _store(self, key, value, timeout=None, delta=0.0, add=False):
+        expires_at = self._expires_at(timeout)
+        data = pickle.dumps((value, expires_at, delta), pickle.HIGHEST_PROTOCOL)
+        if self.l2 is not None:
+            if add:
+                if not self.l2.add(key, data, expires_at):
+                    return False
+            else:
+                self.l2.set(key, data, expires_at)
+        elif add and self.l1.get(key) is not None:
+            return False
+        self.l1.set(key, data, expires_at)
+        return True
+
+    def get(self, key):
+        entry = self._load(key)
+        return entry[0] if entry is not None else None
+
+    def get_many(self, *keys):
+        found = {}
+        missing = []
+        for key in keys:
+            data = self.l1.get(key)
+            if data is None:
+                missing.append(key)
+            else:
+                found[key] = data
+        l1_hits = len(found)
+        if missing and self.l2 is not None:
+            for key, data in self.l2.get_many(missing).items():
+                found[key] = data
+                self.l1.set(key, data, pickle.loads(data)[1])
+        for result, count in (("l1_hit", l1_hits), ("l2_hit", len(found) - l1_hits), ("miss", len(keys) - len(found))):
+            if count:
+                metrics.inc("cache_requests_total", count, result=result)
+        return [pickle.loads(found[key])[0] if key in found else None for key in keys]
+
+    def has(self, key):
+        return self._load(key) is not None
+
+    def set(self, key, value, timeout=None):
+        return self._store(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self._store(key, value, timeout, add=True)
+
+    def set_many(self, mapping, timeout=None):
+        for key, value in mapping.items():
+            self._store(key, value, timeout)
+        return list(mapping)
+
+    def delete(self, key):
+        self.l1.delete(key)
+        if self.l2 is not None:
+            self.l2.delete(key)
+        return True
+
+    def delete_many(self, *keys):
+        for key in keys:
+            self.delete(key)
+        return list(keys)
+
+    def clear(self):
+        self.l1.clear()
+        if self.l2 is not None:
+            self.l2.clear()
+        return True
+
+    def _acquire(self, lock_key):
+        expires_at = time.time() + self.lock_timeout
+        if self.l2 is not None:
+            return self.l2.add(lock_key, b"", expires_at)
+        with self._local_lock:
+            if self._local_locks.get(lock_key, 0) > time.time():
+                return False
+            self._local_locks[lock_key] = expires_at
+            return True
+
+    def _release(self, lock_key):
+        if self.l2 is not None:
+            self.l2.delete(lock_key)
+        else:
+            with self._local_lock:
+                self._local_locks.pop(lock_key, None)
+
+    def _locked(self, lock_key):
+        if self.l2 is not None:
+            return self.l2.get(lock_key) is not None
+        with self._local_lock:
+            return self._local_locks.get(lock_key, 0) > time.time()
+
+    def remember(self, key, compute, timeout=None, cacheable=None, poll_interval=0.05):
+        """
+        Return the cached value of ``key``, computing it once on a miss.
+
+        Args:
+            key (str): Cache key.
+            compute (callable): Zero-argument function producing the value.
+            timeout (int, optional): Lifetime of the computed value.
+            cacheable (callable, optional): Called with the computed value; a
+                false result returns it without caching it.
+            poll_interval (float): Seconds between checks while waiting for
+                another caller's computation.
+
+        Returns:
+            The cached or computed value.
+        """
+        entry = self._load(key)
+        if entry is not None:
+            value, expires_at, delta = entry
+            # XFetch: -log(u) is exponentially distributed, so the refresh
+            # probability rises smoothly as expiry approaches.
+            early = delta * self.early_refresh_beta * -math.log(1.0 - random.random())
+            if expires_at is None or time.time() + early < expires_at:
+                return value
+
+        lock_key = f"lock:{key}"
+        locked = self._acquire(lock_key)
+        if not locked:
+            if entry is not None:
+                # Someone else is refreshing it; the current value is still valid.
+                return entry[0]
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline and self._locked(lock_key):
+                time.sleep(poll_interval)
+                entry = self._load(key)
+                if entry is not None:
+                    return entry[0]
+            locked = self._acquire(lock_key)
+
+        try:
+            started = time.perf_counter()
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self._store(key, value, timeout, delta=time.perf_counter() - started)
+            return value
+        finally:
+            if locked:
+                self._release(lock_key)
@@ -0,0 +1,15 @@
+"""
+ASGI entry point.
+
+Serve with an ASGI server, e.g.:
+
+    uvicorn asgi:app --workers 4
+
+``POST /website/generate`` then runs as a coroutine on the event loop, with the
+async OpenAI client and async MongoDB driver; every other route is the same
+Flask view as under ``python run.py``.
+"""
+from app.asgi import create_asgi_app
+from run import app as flask_app
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,5 @@
+"""
+Load tests for the website API against a fake OpenAI and a local or in-memory MongoDB.
+
+See ``benchmarks/run.py`` for usage.
+"""
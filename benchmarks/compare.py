@@ -0,0 +1,50 @@
+"""
+Compare two benchmark result files.
+
+Usage:
+    python -m benchmarks.compare before.json after.json
+
+Prints throughput and latency percentiles of every workload present in both
+runs, with the relative change. For rps higher is better; for latency lower is.
+"""
+import json
+import sys
+
+METRICS = (
+    ("rps", lambda result: result["rps"]),
+    ("p50 ms", lambda result: result["latency_ms"]["p50"]),
+    ("p95 ms", lambda result: result["latency_ms"]["p95"]),
+    ("p99 ms", lambda result: result["latency_ms"]["p99"]),
+    ("errors", lambda result: result["errors"]),
+    ("rss MiB", lambda result: result["memory_mb"]["max_rss"]),
+)
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        raise SystemExit("usage: python -m benchmarks.compare BEFORE.json AFTER.json")
+
+    with open(argv[0]) as f:
+        before = json.load(f)
+    with open(argv[1]) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    for name, old in before["results"].items():
+        new = after["results"].get(name)
+        if new is None:
+            continue
+        print(f"\n{name}")
+        for label, read in METRICS:
+            print(f"  {label:8} {read(old):>10} -> {read(new):>10}  {change(read(old), read(new)):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import tempfile
+
+from app.config import Config
+
+
+def build_app(fake, mongo_uri=None, image_dir=None, upstream_limits=False):
+    """
+    Create the application wired to a fake OpenAI and a benchmark database.
+
+    Args:
+        fake (FakeOpenAI): The fake OpenAI client.
+        mongo_uri (str, optional): A local mongod database to use, e.g.
+            ``mongodb://localhost:27017/ai_benchmark``. The database is dropped
+            first. Without it the in-memory ``mongomock`` is used.
+        image_dir (str, optional): Image store directory; a temporary one by default.
+        upstream_limits (bool): Keep the configured upstream rate limits. Off by
+            default so the benchmark measures the service, not the quota.
+
+    Returns:
+        Flask: The application.
+    """
+    # The app reads its configuration once, at creation.
+    Config.MONGO_ENSURE_INDEXES = False
+    Config.RATELIMIT_ENABLED = False
+    Config.JOB_WORKERS_AUTOSTART = False
+    Config.METRICS_DIR = None
+    Config.IMAGE_STORE_PATH = image_dir or tempfile.mkdtemp(prefix="benchmark-images-")
+    Config.CACHE_DIR = tempfile.mkdtemp(prefix="benchmark-cache-")
+    if mongo_uri:
+        Config.MONGO_URI = mongo_uri
+    if not upstream_limits:
+        for name in ("UPSTREAM_CHAT_RPM", "UPSTREAM_CHAT_TPM", "UPSTREAM_IMAGE_RPM", "UPSTREAM_IMAGE_TPM"):
+            setattr(Config, name, 0)
+
+    from app import mongo
+    from app.models.indexes import ensure_indexes
+    from app.utils import openai_helper
+    from app.utils.image_store import image_store
+
+    # run.py builds the deployed app, including the page and static file routes.
+    from run import app
+
+    if mongo_uri:
+        mongo.cx.drop_database(mongo.db.name)
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("mongomock is required without --mongo-uri: pip install mongomock")
+        mongo.cx = mongomock.MongoClient()
+        mongo.db = mongo.cx["ai_benchmark"]
+    ensure_indexes(mongo.db)
+
+    openai_helper.client = fake
+    image_store.store_url = lambda url: image_store.store_bytes(fake.image_bytes(url), "image/png")
+    return app
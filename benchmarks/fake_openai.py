@@ -0,0 +1,121 @@
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it every image is the same 1x1 PNG.
+    Image = None
+
+# A valid 1x1 PNG, used when Pillow is not installed.
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360f8cfc0f01f0005000201e2"
+    "21bc330000000049454e44ae426082"
+)
+
+
+def site_content(business_type):
+    """Return the site JSON the fake chat model answers with."""
+    return {
+        "title": f"{business_type.title()}",
+        "sections": [
+            {
+                "title": "Hero Section",
+                "type": "hero",
+                "body": {"headline": f"The best {business_type} in town", "subheadline": "Fast, friendly, local."},
+            },
+            {"title": "About Us", "type": "about", "body": f"We have run this {business_type} for twenty years."},
+            {"title": "Services", "type": "services", "body": ["Consulting", "Delivery", "Support"]},
+            {"title": "Contact", "type": "contact", "body": "Call us on 555-0100."},
+        ],
+    }
+
+
+class FakeOpenAI:
+    """
+    Stand-in for the ``OpenAI`` client with configurable latency and errors.
+
+    Implements the calls ``openai_helper`` makes: ``chat.completions.create``
+    (plain and ``stream=True``) and ``images.generate``. Each call sleeps for its
+    configured latency, varied by ``jitter``, then fails with the configured
+    probability or answers with deterministic content.
+
+    Args:
+        chat_latency (float): Seconds per chat completion.
+        image_latency (float): Seconds per image.
+        jitter (float): Relative latency variation, e.g. ``0.2`` for +/-20%.
+        error_rate (float): Probability a call fails with ``APIConnectionError``.
+        rate_limit_rate (float): Probability a call fails with ``RateLimitError``.
+        seed (int, optional): Seed for reproducible latencies and failures.
+    """
+
+    def __init__(self, chat_latency=1.0, image_latency=2.0, jitter=0.2, error_rate=0.0,
+                 rate_limit_rate=0.0, seed=None):
+        self.chat_latency = chat_latency
+        self.image_latency = image_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = {"chat": 0, "image": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.images = SimpleNamespace(generate=self._image)
+
+    def _roll(self, kind, latency):
+        with self._lock:
+            self.calls[kind] += 1
+            delay = latency * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            outcome = self._random.random()
+        time.sleep(max(0.0, delay))
+
+        request = httpx.Request("POST", f"https://fake-openai.local/{kind}")
+        if outcome < self.rate_limit_rate:
+            with self._lock:
+                self.calls["errors"] += 1
+            response = httpx.Response(429, headers={"retry-after": "1"}, request=request)
+            raise openai.RateLimitError("Rate limit reached (injected)", response=response, body=None)
+        if outcome < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.calls["errors"] += 1
+            raise openai.APIConnectionError(message="Connection error (injected)", request=request)
+
+    def _chat(self, messages, stream=False, **kwargs):
+        self._roll("chat", self.chat_latency)
+        match = re.search(r"Business Type: (.*)", messages[-1]["content"])
+        text = json.dumps(site_content(match.group(1).strip() if match else "business"))
+        usage = SimpleNamespace(prompt_tokens=300, completion_tokens=len(text) // 4, total_tokens=300 + len(text) // 4)
+
+        if stream:
+            return (
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 16]))])
+                for i in range(0, len(text), 16)
+            )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason="stop")],
+            usage=usage,
+        )
+
+    def _image(self, prompt, **kwargs):
+        self._roll("image", self.image_latency)
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+        return SimpleNamespace(data=[SimpleNamespace(url=f"https://fake-openai.local/images/{digest}.png")])
+
+    def image_bytes(self, url):
+        """Return PNG bytes for an image URL handed out by ``images.generate``."""
+        if Image is None:
+            return TINY_PNG
+        seed = int(hashlib.sha256(url.encode()).hexdigest()[:6], 16)
+        color = (seed >> 16 & 255, seed >> 8 & 255, seed & 255)
+        buffer = io.BytesIO()
+        Image.new("RGB", (1024, 1024), color).save(buffer, "PNG")
+        return buffer.getvalue()
@@ -0,0 +1,67 @@
+"""
+Measure login throughput of the password hashing pool.
+
+Verifies one password ``--logins`` times, first inline on the calling thread
+(as logins did before ``PasswordHasher``), then through the process pool from
+``--concurrency`` threads, and reports logins per second and per core.
+
+Usage:
+    python -m benchmarks.password_hashing
+    python -m benchmarks.password_hashing --method pbkdf2:sha256:600000 --logins 200 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.utils.password_hasher import PasswordHasher
+
+PASSWORD = "correct horse battery staple"
+
+
+def measure(verify, pwhash, logins, concurrency):
+    """Run ``logins`` verifications from ``concurrency`` threads and return the elapsed seconds."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(lambda _: verify(pwhash, PASSWORD), range(logins)))
+    elapsed = time.perf_counter() - started
+    assert all(results), "verification failed"
+    return elapsed
+
+
+def report(label, logins, elapsed, cores):
+    rate = logins / elapsed
+    print(f"{label:<8} {logins:>6} logins in {elapsed:7.2f}s  {rate:8.1f} logins/s  {rate / cores:8.1f} logins/s/core")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--method", default="scrypt:32768:8:1", help="werkzeug hash method (PASSWORD_HASH_METHOD)")
+    parser.add_argument("--logins", type=int, default=100, help="verifications per run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing processes (PASSWORD_HASH_WORKERS)")
+    parser.add_argument("--concurrency", type=int, default=None, help="client threads; defaults to 4 per worker")
+    args = parser.parse_args(argv)
+    concurrency = args.concurrency or args.workers * 4
+
+    pwhash = generate_password_hash(PASSWORD, args.method)
+    print(f"method {args.method}, {args.workers} worker(s), {concurrency} client thread(s), {os.cpu_count()} core(s)")
+
+    # Inline verification holds the GIL, so it uses one core however many threads call it.
+    report("inline", args.logins, measure(check_password_hash, pwhash, args.logins, concurrency), 1)
+
+    hasher = PasswordHasher()
+    hasher.workers = args.workers
+    hasher.queue_depth = max(args.logins, concurrency)
+    hasher.timeout = None
+    try:
+        hasher.verify(pwhash, PASSWORD)  # start the worker processes outside the measurement
+        cores = min(args.workers, os.cpu_count() or 1)
+        report("pool", args.logins, measure(hasher.verify, pwhash, args.logins, concurrency), cores)
+    finally:
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
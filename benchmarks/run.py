@@ -0,0 +1,254 @@
+"""
+Run the benchmark workloads and write the results as JSON.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --workloads get,list --requests 2000 --concurrency 16
+    python -m benchmarks.run --mongo-uri mongodb://localhost:27017/ai_benchmark --output before.json
+
+Compare two runs with ``python -m benchmarks.compare before.json after.json``.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.workloads import WORKLOADS
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def max_rss_mb():
+    """Peak resident set size of this process, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_workload(app, workload, requests, concurrency, state, trace_memory=False):
+    """
+    Make ``requests`` requests of one workload from ``concurrency`` threads.
+
+    Returns:
+        dict: Throughput, latency percentiles (ms), status codes and memory.
+    """
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(indexes):
+        client = app.test_client()
+        for i in indexes:
+            started = time.perf_counter()
+            response = workload(client, i, state)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            response.close()
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+
+    gc.collect()
+    rss_before = max_rss_mb()
+    if trace_memory:
+        tracemalloc.start()
+
+    threads = [
+        threading.Thread(target=worker, args=(range(index, requests, concurrency),))
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    latencies.sort()
+    to_ms = 1000.0
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 4),
+        "rps": round(requests / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * to_ms, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50) * to_ms, 3),
+            "p95": round(percentile(latencies, 0.95) * to_ms, 3),
+            "p99": round(percentile(latencies, 0.99) * to_ms, 3),
+            "max": round(latencies[-1] * to_ms, 3) if latencies else 0.0,
+        },
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "memory_mb": {
+            "max_rss": round(max_rss_mb(), 2),
+            "max_rss_growth": round(max_rss_mb() - rss_before, 2),
+            "traced_peak": round(traced_peak, 2) if traced_peak is not None else None,
+        },
+    }
+
+
+def setup(app, seed_sites, distinct_sites, section_patches):
+    """Register a benchmark user and create the websites the read workloads use."""
+    client = app.test_client()
+    credentials = {"name": "Benchmark", "email": "benchmark@example.com", "password": "benchmark-password"}
+    client.post("/auth/register", json=credentials)
+    response = client.post("/auth/login", json=credentials)
+    if response.status_code != 200:
+        raise SystemExit(f"Could not log in the benchmark user: {response.get_json()}")
+
+    state = {
+        "headers": {"Authorization": f"Bearer {response.get_json()['access_token']}"},
+        "distinct_sites": distinct_sites,
+        "section_patches": section_patches,
+        "website_ids": [],
+    }
+    for i in range(seed_sites):
+        response = client.post(
+            "/website/generate",
+            json={"business_type": f"seed {i}", "industry": "benchmarking"},
+            headers=state["headers"],
+        )
+        if response.status_code != 201:
+            raise SystemExit(f"Could not create seed website: {response.get_json()}")
+        state["website_ids"].append(response.get_json()["website_id"])
+    return state
+
+
+def print_table(results):
+    print(f"{'workload':10} {'req':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MiB':>8}")
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:10} {result['requests']:>6} {result['rps']:>9} {latency['p50']:>9} {latency['p95']:>9} "
+            f"{latency['p99']:>9} {result['errors']:>7} {result['memory_mb']['max_rss']:>8}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the website API against a fake OpenAI.")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"Comma-separated workloads to run, in order. Default: {','.join(WORKLOADS)}.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per workload.")
+    parser.add_argument("--generate-requests", type=int, default=20,
+                        help="Requests for the generate workload, which stores six images per site.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads.")
+    parser.add_argument("--seed-sites", type=int, default=50, help="Websites created before the read workloads.")
+    parser.add_argument("--distinct-sites", type=int, default=None,
+                        help="Distinct business types in the generate workload; fewer means more cache hits. "
+                             "Defaults to one per request (all misses).")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="Fake chat completion latency, seconds.")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="Fake image generation latency, seconds.")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative fake latency variation.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected connection error.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of an injected 429.")
+    parser.add_argument("--mongo-uri", default=None,
+                        help="Local mongod database to use (dropped first). Default: in-memory mongomock.")
+    parser.add_argument("--upstream-limits", action="store_true",
+                        help="Apply the configured upstream rate limits instead of disabling them.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report peak traced allocations per workload (slows requests down).")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the fake OpenAI.")
+    parser.add_argument("--output", default=None,
+                        help="JSON results path. Default: benchmarks/results/<commit>-<timestamp>.json.")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"Unknown workloads: {', '.join(unknown)}")
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    from benchmarks.environment import build_app
+
+    fake = FakeOpenAI(
+        chat_latency=args.chat_latency,
+        image_latency=args.image_latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    app = build_app(fake, mongo_uri=args.mongo_uri, upstream_limits=args.upstream_limits)
+
+    # Seed websites are generated without injected errors.
+    error_rate, rate_limit_rate = fake.error_rate, fake.rate_limit_rate
+    fake.error_rate = fake.rate_limit_rate = 0.0
+    generate_requests = args.generate_requests
+    state = setup(
+        app,
+        args.seed_sites,
+        args.distinct_sites or generate_requests,
+        # mongomock does not implement arrayFilters, which section PATCHes use.
+        section_patches=bool(args.mongo_uri),
+    )
+    fake.error_rate, fake.rate_limit_rate = error_rate, rate_limit_rate
+
+    results = {}
+    for name in names:
+        requests = generate_requests if name == "generate" else args.requests
+        results[name] = run_workload(app, WORKLOADS[name], requests, args.concurrency, state, args.trace_memory)
+        if name == "generate":
+            results[name]["upstream_calls"] = dict(fake.calls)
+        if name == "patch" and not state["section_patches"]:
+            results[name]["note"] = "title-only PATCH: mongomock lacks arrayFilters; use --mongo-uri for section edits"
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": "mongod" if args.mongo_uri else "mongomock",
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{commit or 'unknown'}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_table(results)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Scripted request mixes, one per endpoint.
+
+Each workload is a function ``(client, i, state)`` making the ``i``-th request
+with a Flask test client and returning the response. ``state`` carries the
+auth headers and the ids of the websites created during setup.
+"""
+
+
+def generate(client, i, state):
+    """POST /website/generate; ``distinct_sites`` controls the content cache hit rate."""
+    return client.post(
+        "/website/generate",
+        json={"business_type": f"business {i % state['distinct_sites']}", "industry": "benchmarking"},
+        headers=state["headers"],
+    )
+
+
+def get_by_id(client, i, state):
+    """GET /website/<id>."""
+    website_ids = state["website_ids"]
+    return client.get(f"/website/{website_ids[i % len(website_ids)]}", headers=state["headers"])
+
+
+def list_websites(client, i, state):
+    """GET /website/user, first page of 20."""
+    return client.get("/website/user?limit=20", headers=state["headers"])
+
+
+def patch(client, i, state):
+    """PATCH /website/<id>/content editing one section."""
+    website_ids = state["website_ids"]
+    if state["section_patches"]:
+        body = {"sections": [{"type": "about", "body": f"Edited {i}"}]}
+    else:
+        body = {"title": f"Edited {i}"}
+    return client.patch(f"/website/{website_ids[i % len(website_ids)]}/content", json=body, headers=state["headers"])
+
+
+def preview(client, i, state):
+    """GET /website/preview/<id>, the public page."""
+    website_ids = state["website_ids"]
+    return client.get(f"/website/preview/{website_ids[i % len(website_ids)]}")
+
+
+WORKLOADS = {
+    "generate": generate,
+    "get": get_by_id,
+    "list": list_websites,
+    "patch": patch,
+    "preview": preview,
+}
@@ -1,6 +1,6 @@
 from app import create_app
 from flask import Flask, render_template
-from flask import send_from_directory
+from app.utils.static_assets import static_assets
 
 # Create the Flask application using the factory function
 app = create_app()
@@ -50,9 +50,10 @@ def serve_staticfiles(filename):
     Route handler for serving static files.
 
     This route allows serving static files from the 'staticfiles' directory.
-    It retrieves and sends the requested file based on the given filename.
+    Fingerprinted names from ``flask build-static`` are served precompressed
+    and cached forever; other names are read from the directory itself.
     """
-    return send_from_directory("staticfiles", filename)
+    return static_assets.send("staticfiles", filename)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,4 @@
+import os
+
+# openai_helper builds its clients at import time.
+os.environ.setdefault("OPENAI_API_KEY", "test")
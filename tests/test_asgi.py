@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import httpx
+from flask import Flask, Response, current_app
+from flask.logging import default_handler
+
+from app.asgi import WsgiAdapter
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(0.5)
+        return "done"
+
+    @app.route("/log")
+    def log():
+        current_app.logger.error("logged from a view")
+        return "logged"
+
+    @app.route("/stream")
+    def stream():
+        return Response((f"{i}\n" for i in range(3)), mimetype="text/plain")
+
+    return app
+
+
+async def fetch_all(adapter, path, count):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=adapter), base_url="http://test") as client:
+        return await asyncio.gather(*(client.get(path) for _ in range(count)))
+
+
+def test_sync_requests_run_concurrently():
+    adapter = WsgiAdapter(make_app(), threads=4)
+    started = time.perf_counter()
+    responses = asyncio.run(fetch_all(adapter, "/slow", 4))
+    elapsed = time.perf_counter() - started
+
+    assert [r.text for r in responses] == ["done"] * 4
+    # One at a time would take 2s.
+    assert elapsed < 1.5
+
+
+def test_streamed_response_is_passed_through():
+    adapter = WsgiAdapter(make_app(), threads=2)
+    (response,) = asyncio.run(fetch_all(adapter, "/stream", 1))
+
+    assert response.status_code == 200
+    assert response.text == "0\n1\n2\n"
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def test_views_can_log_to_wsgi_errors(capsys):
+    app = make_app()
+    # pytest's own log handlers stop Flask from installing its default one.
+    app.logger.addHandler(default_handler)
+    try:
+        (response,) = asyncio.run(fetch_all(WsgiAdapter(app, threads=1), "/log", 1))
+    finally:
+        app.logger.removeHandler(default_handler)
+
+    err = capsys.readouterr().err
+    assert response.text == "logged"
+    assert "logged from a view" in err
+    assert "Logging error" not in err
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import types
+
+import httpx
+import mongomock
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, mongo
+from app.asgi import create_asgi_app
+from app.config import Config
+from app.routes import website_routes
+from app.utils import openai_helper
+from app.utils.async_mongo import async_mongo
+from app.utils.content_cache import content_cache
+from app.utils.metrics import metrics
+
+NS = types.SimpleNamespace
+
+CONTENT = {
+    "title": "Bean There",
+    "sections": [
+        {"type": "hero", "body": {"headline": "Fresh coffee"}},
+        {"type": "about", "body": "Since 1999."},
+    ],
+}
+
+
+class FakeAsyncOpenAI:
+    def __init__(self):
+        self.calls = []
+        self.chat = NS(completions=NS(create=self.create_chat))
+        self.images = NS(generate=self.generate_image)
+
+    async def create_chat(self, **kwargs):
+        self.calls.append("chat")
+        message = NS(content=json.dumps(CONTENT))
+        return NS(choices=[NS(message=message, finish_reason="stop")], usage=NS(total_tokens=500, prompt_tokens=200, completion_tokens=300))
+
+    async def generate_image(self, prompt, **kwargs):
+        self.calls.append("image")
+        return NS(data=[NS(url=f"https://images.example/{len(self.calls)}.png")])
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert_one(self, document):
+        return self.collection.insert_one(document)
+
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self.db = db
+
+    def __getattr__(self, name):
+        return AsyncCollection(self.db[name])
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    for name, value in {
+        "MONGO_ENSURE_INDEXES": False,
+        "JOB_WORKERS_AUTOSTART": False,
+        "RATELIMIT_STORAGE_URI": "memory://",
+        "GENERATION_RATE_LIMIT": "14 per hour",
+        "CONTENT_CACHE_ENABLED": False,
+        "IMAGE_STORE_ENABLED": False,
+        "METRICS_DIR": None,
+        "CACHE_DIR": str(tmp_path / "cache"),
+        "UPSTREAM_CHAT_RPM": 0,
+        "UPSTREAM_CHAT_TPM": 0,
+        "UPSTREAM_IMAGE_RPM": 0,
+        "UPSTREAM_IMAGE_TPM": 0,
+    }.items():
+        monkeypatch.setattr(Config, name, value)
+    app = create_app()
+    db = mongomock.MongoClient()["test"]
+    monkeypatch.setattr(mongo, "db", db)
+    monkeypatch.setattr(async_mongo, "_client", NS(get_default_database=lambda: AsyncDatabase(db)))
+    fake = FakeAsyncOpenAI()
+    monkeypatch.setattr(openai_helper, "async_client", fake)
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='owner@example.com')}"}
+    return create_asgi_app(app), headers, db, fake
+
+
+def post(asgi, count=1, **kwargs):
+    async def main():
+        transport = httpx.ASGITransport(app=asgi)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return [await http.post("/website/generate", **kwargs) for _ in range(count)]
+
+    return asyncio.run(main())
+
+
+def request_count():
+    _, histograms = metrics.collect()
+    return sum(
+        histogram["count"]
+        for (name, labels), histogram in histograms.items()
+        if name == "http_request_duration_seconds" and ("route", "/website/generate") in labels
+    )
+
+
+def test_generate_runs_on_the_event_loop_and_stores_the_website(client):
+    asgi, headers, db, fake = client
+    before = request_count()
+
+    (response,) = post(asgi, json={"business_type": "coffee shop", "industry": "food"}, headers=headers)
+
+    assert response.status_code == 201
+    body = response.json()
+    stored = db.websites.find_one()
+    assert str(stored["_id"]) == body["website_id"]
+    assert stored["user_id"] == "owner@example.com"
+    assert [section["type"] for section in body["content"]["sections"]] == ["hero", "about"]
+    assert fake.calls.count("chat") == 1
+    # Recorded once, by the after_request hook.
+    assert request_count() == before + 1
+
+
+def test_generate_authenticates_before_validating(client):
+    asgi, headers, db, fake = client
+
+    (anonymous,) = post(asgi, content=b"[1]", headers={"Content-Type": "application/json"})
+    (invalid,) = post(asgi, content=b"[1]", headers={**headers, "Content-Type": "application/json"})
+
+    assert anonymous.status_code == 401
+    assert invalid.status_code == 400
+    assert fake.calls == []
+
+
+def test_generate_draws_on_the_generation_budget(client):
+    asgi, headers, db, fake = client
+
+    responses = post(asgi, 3, json={"business_type": "coffee shop", "industry": "food"}, headers=headers)
+
+    assert [response.status_code for response in responses] == [201, 201, 429]
+
+
+def test_generate_charges_only_generated_sites(client, monkeypatch):
+    asgi, headers, db, fake = client
+    monkeypatch.setattr(content_cache, "enabled", True)
+    monkeypatch.setattr(content_cache, "get", lambda business_type, industry: json.loads(json.dumps(CONTENT)))
+    monkeypatch.setattr(content_cache, "set", lambda business_type, industry, content: None)
+    payload = {"business_type": "coffee shop", "industry": "food"}
+
+    cached = post(asgi, 3, json=payload, headers=headers)
+    fresh = post(asgi, 2, json={**payload, "cache": False}, headers=headers)
+    (spent,) = post(asgi, json=payload, headers=headers)
+
+    assert [response.status_code for response in cached + fresh] == [201] * 5
+    assert fake.calls.count("chat") == 2
+    assert spent.status_code == 429
+
+
+def test_sync_generate_charges_only_generated_sites(client, monkeypatch):
+    asgi, headers, db, fake = client
+    generated = []
+    monkeypatch.setattr(content_cache, "enabled", True)
+    monkeypatch.setattr(content_cache, "get", lambda business_type, industry: json.loads(json.dumps(CONTENT)))
+    monkeypatch.setattr(content_cache, "set", lambda business_type, industry, content: None)
+    monkeypatch.setattr(
+        website_routes,
+        "generate_stored_site_content",
+        lambda business_type, industry: generated.append(business_type) or json.loads(json.dumps(CONTENT)),
+    )
+    http = asgi.flask_app.test_client()
+    payload = {"business_type": "coffee shop", "industry": "food"}
+
+    cached = [http.post("/website/generate", json=payload, headers=headers) for _ in range(3)]
+    fresh = [http.post("/website/generate", json={**payload, "cache": False}, headers=headers) for _ in range(2)]
+    spent = http.post("/website/generate", json=payload, headers=headers)
+
+    assert [response.status_code for response in cached + fresh] == [201] * 5
+    assert len(generated) == 2
+    assert spent.status_code == 429
@@ -0,0 +1,17 @@
+from app.utils.batch import dedupe_items
+
+
+def test_dedupe_items_groups_equivalent_items():
+    items = [
+        {"business_type": "Coffee Shop", "industry": "Food"},
+        {"business_type": "coffee  shop ", "industry": "FOOD"},
+        {"business_type": "Bakery"},
+        "not an item",
+        {"business_type": "Bakery", "industry": "Food"},
+    ]
+
+    unique, duplicates, invalid = dedupe_items(items)
+
+    assert sorted(unique.values()) == [0, 4]
+    assert duplicates == {1: 0}
+    assert invalid == [2, 3]
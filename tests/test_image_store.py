@@ -0,0 +1,37 @@
+import io
+
+import pytest
+from PIL import Image, features
+
+from app.utils.image_store import DiskBackend, ImageStore
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1024, 1024), (200, 100, 50)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore()
+    store.backend = DiskBackend(str(tmp_path))
+    return store
+
+
+def test_webp_variants_are_stored_before_returning(store):
+    digest = store.store_bytes(png_bytes(), "image/png")
+
+    for variant in ("thumb", "1x", "2x"):
+        assert store.backend.exists(digest, f"{variant}.webp")
+    assert store.find(digest, "1x", "image/avif,image/webp")[1] in ("image/avif", "image/webp")
+
+
+@pytest.mark.skipif(not features.check("avif"), reason="Pillow built without AVIF")
+def test_avif_variants_are_encoded_in_the_background(store):
+    digest = store.store_bytes(png_bytes(), "image/png")
+    store.wait_for_variants()
+
+    assert store.find(digest, "2x", "image/avif,image/webp") == ("2x.avif", "image/avif")
+    with Image.open(store.backend.path(digest, "thumb.avif")) as image:
+        assert max(image.size) == 256
@@ -0,0 +1,24 @@
+import mongomock
+import pytest
+
+from app.models.indexes import INDEXES, IndexBuildError, ensure_indexes, missing_indexes
+
+
+def test_ensure_indexes_creates_every_declared_index():
+    db = mongomock.MongoClient()["test"]
+
+    ensure_indexes(db)
+
+    assert missing_indexes(db) == []
+
+
+def test_a_failed_collection_does_not_skip_the_others():
+    db = mongomock.MongoClient()["test"]
+    db.users.insert_many([{"email": "a@example.com"}, {"email": "a@example.com"}])
+
+    with pytest.raises(IndexBuildError) as error:
+        ensure_indexes(db)
+
+    assert list(error.value.failures) == ["users"]
+    assert missing_indexes(db) == ["users.email_unique"]
+    assert "websites" in INDEXES and "user_updated_id" in db.websites.index_information()
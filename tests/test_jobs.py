@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from flask import Flask
+
+from app import mongo
+from app.utils.jobs import GenerationJobQueue
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(mongo, "db", mongomock.MongoClient()["jobs"], raising=False)
+    app = Flask(__name__)
+    app.config.update(JOB_WORKERS=2, JOB_QUEUE_BACKEND="local")
+    queue = GenerationJobQueue(app)
+    executed = []
+    monkeypatch.setattr(queue, "_execute", lambda job: executed.append(job["_id"]))
+    queue.executed = executed
+    yield queue
+    queue.stop()
+
+
+def test_recover_reclaims_pending_and_expired_jobs(queue):
+    now = datetime.utcnow()
+    websites = mongo.db.websites
+    pending = websites.insert_one({"status": "pending", "created_at": now}).inserted_id
+    expired = websites.insert_one(
+        {"status": "running", "created_at": now, "lease_expires_at": now - timedelta(seconds=1)}
+    ).inserted_id
+    websites.insert_one({"status": "running", "created_at": now, "lease_expires_at": now + timedelta(minutes=5)})
+    websites.insert_one({"status": "ready", "created_at": now})
+
+    assert queue.recover() == 2
+    queue._executor.shutdown(wait=True)
+
+    assert sorted(queue.executed) == sorted([pending, expired])
+    assert websites.count_documents({"status": "running"}) == 3
+
+
+def test_workers_start_once_per_process(queue, monkeypatch):
+    starts = []
+    monkeypatch.setattr(queue, "recover", lambda: starts.append(1))
+
+    queue._autostart()
+    queue._autostart()
+    queue._executor.shutdown(wait=True)
+    assert len(starts) == 1
+
+    # As after a fork: the child starts its own workers.
+    queue._started_pid = -1
+    queue._autostart()
+    queue._executor.shutdown(wait=True)
+    assert len(starts) == 2
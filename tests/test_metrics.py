@@ -0,0 +1,48 @@
+import os
+import time
+
+from flask import Flask
+
+from app.routes.metrics_routes import metrics_bp
+from app.utils.metrics import LATENCY_BUCKETS, MetricsRegistry, estimate_quantile
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    app.register_blueprint(metrics_bp)
+    return app
+
+
+def test_metrics_token_is_required_when_set():
+    client = make_app(METRICS_TOKEN="secret").test_client()
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_metrics_are_open_without_a_token():
+    assert make_app().test_client().get("/metrics").status_code == 200
+
+
+def test_flusher_starts_with_the_first_request_of_each_process(tmp_path):
+    app = make_app(METRICS_DIR=str(tmp_path), METRICS_FLUSH_INTERVAL=0.05)
+    registry = MetricsRegistry(app)
+    assert registry._flusher_pid is None
+
+    app.test_client().get("/metrics")
+    assert registry._flusher_pid == os.getpid()
+
+    registry.inc("upstream_requests_total", kind="chat")
+    time.sleep(0.2)
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_quantile_estimate_interpolates_within_a_bucket():
+    buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+    index = LATENCY_BUCKETS.index(1.0)
+    buckets[index] = 100
+
+    assert LATENCY_BUCKETS[index - 1] < estimate_quantile(buckets, 100, 0.5) <= 1.0
+    assert estimate_quantile(buckets, 0, 0.5) == 0
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+
+from app.utils.page_cache import website_etag
+from app.utils.static_assets import MANIFEST_NAME, StaticAssets
+
+
+def test_etag_changes_with_the_build():
+    assert website_etag("abc", 3, build_version="v1") == website_etag("abc", 3, build_version="v1")
+    assert website_etag("abc", 3, build_version="v1") != website_etag("abc", 3, build_version="v2")
+
+
+def test_etag_follows_the_version():
+    # Mongo stores milliseconds: two writes can share an updated_at.
+    updated_at = datetime(2025, 1, 1)
+
+    assert website_etag("abc", 3, updated_at) != website_etag("abc", 4, updated_at)
+    assert website_etag("abc", 3, updated_at) == website_etag("abc", 3, datetime(2025, 1, 2))
+
+
+def test_etag_of_legacy_documents_follows_updated_at():
+    updated_at = datetime(2025, 1, 1)
+
+    assert website_etag("abc", None, updated_at) == website_etag("abc", 0, updated_at)
+    assert website_etag("abc", None, updated_at) != website_etag("abc", None, datetime(2025, 1, 2))
+    assert website_etag("abc", None, updated_at) != website_etag("abc", 1, updated_at)
+
+
+def test_static_version_follows_the_manifest(tmp_path):
+    assets = StaticAssets()
+    assets.dist_path = str(tmp_path)
+    assets.load()
+    assert assets.version == ""
+
+    def write(name):
+        manifest = {"static": {"app.css": {"path": name, "encodings": []}}}
+        (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest))
+        assets.load()
+        return assets.version
+
+    first = write("app.1111.css")
+    assert first and write("app.1111.css") == first
+    assert write("app.2222.css") != first
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from app.utils.password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher()
+    hasher.method = "pbkdf2:sha256:1000"
+    hasher.workers = 1
+    hasher.queue_depth = 1
+    hasher.timeout = 10
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    pwhash = hasher.hash("secret")
+
+    assert pwhash.startswith("pbkdf2:sha256:1000$")
+    assert hasher.verify(pwhash, "secret")
+    assert not hasher.verify(pwhash, "wrong")
+
+
+def test_needs_rehash_after_method_change(hasher):
+    pwhash = hasher.hash("secret")
+    assert not hasher.needs_rehash(pwhash)
+
+    hasher.method = "pbkdf2:sha256:2000"
+    hasher._method_prefix = None
+    assert hasher.needs_rehash(pwhash)
+
+
+def test_timed_out_hash_keeps_its_slot_until_done(hasher):
+    hasher.verify(hasher.hash("secret"), "secret")  # start the worker
+    hasher.timeout = 0.2
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run("hash", time.sleep, 1)
+    # Still running in the worker, so the queue is full.
+    started = time.monotonic()
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run("hash", time.sleep, 0)
+    assert time.monotonic() - started < 0.1
+
+    time.sleep(1.5)
+    assert hasher._pending == 0
+    hasher._run("hash", time.sleep, 0)
+
+
+def test_inline_when_no_workers(hasher):
+    hasher.workers = 0
+
+    assert hasher.verify(hasher.hash("secret"), "secret")
+    assert hasher._executor is None
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from app.utils import openai_helper
+from app.utils.resilience import CircuitBreaker, CircuitOpen, hedged
+from app.utils.scheduler import UpstreamBusy
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("chat", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker("chat", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.state == "half_open"
+    breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+    breaker.abandon()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_takes_no_scheduler_slot(monkeypatch):
+    acquired = []
+    monkeypatch.setattr(openai_helper.upstream_scheduler, "acquire", lambda kind, tokens: acquired.append(kind))
+    breaker = CircuitBreaker("chat", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    monkeypatch.setitem(openai_helper.breakers, "chat", breaker)
+
+    with pytest.raises(CircuitOpen):
+        openai_helper.call_upstream("chat", lambda: "never")
+    assert acquired == []
+
+
+def test_busy_scheduler_gives_back_the_trial_call(monkeypatch):
+    def acquire(kind, tokens):
+        raise UpstreamBusy(1)
+
+    monkeypatch.setattr(openai_helper.upstream_scheduler, "acquire", acquire)
+    breaker = CircuitBreaker("chat", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    monkeypatch.setitem(openai_helper.breakers, "chat", breaker)
+
+    with pytest.raises(UpstreamBusy):
+        openai_helper.call_upstream("chat", lambda: "never")
+    breaker.allow()
+
+
+def test_fast_call_is_not_hedged():
+    assert hedged(lambda: "primary", delay=1) == ("primary", False)
+
+
+def test_slow_call_is_hedged_and_first_result_wins():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1)
+            return "primary"
+        return "hedge"
+
+    started = time.monotonic()
+    assert hedged(fn, delay=0.05) == ("hedge", True)
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedges_do_not_share_a_pool():
+    # Many slow primaries at once: every hedge still starts on time.
+    from concurrent.futures import ThreadPoolExecutor
+
+    def call(index):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.5)
+            return index
+
+        return hedged(fn, delay=0.05)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=40) as executor:
+        results = list(executor.map(call, range(40)))
+    assert results == [(index, True) for index in range(40)]
+    assert time.monotonic() - started < 0.4
+
+
+def test_hedged_raises_when_both_calls_fail():
+    def fn():
+        time.sleep(0.1)
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        hedged(fn, delay=0.01)
@@ -0,0 +1,45 @@
+import time
+
+from flask import Flask, jsonify
+
+from app.extensions import cache
+from app.utils import response_cache
+from app.utils.response_cache import invalidate_tags, tag_versions
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE="SimpleCache", RESPONSE_CACHE_TIMEOUT=600, **config)
+    cache.init_app(app)
+    return app
+
+
+def tag_expiry(tag):
+    expires, _ = cache.cache._cache[f"tag:{tag}"]
+    return expires
+
+
+def test_tag_versions_expire_after_the_responses_cached_under_them(monkeypatch):
+    monkeypatch.setattr(response_cache, "_longest_view_timeout", 0)
+    app = make_app()
+
+    with app.app_context():
+        now = int(time.time())
+        (created,) = tag_versions(["user:1"])
+        invalidate_tags("site:1")
+
+        assert tag_versions(["user:1"]) == [created]
+        for tag in ("user:1", "site:1"):
+            assert now + 1200 <= tag_expiry(tag) <= now + 1202
+
+
+def test_tag_versions_outlive_explicit_view_timeouts(monkeypatch):
+    monkeypatch.setattr(response_cache, "_longest_view_timeout", 0)
+    app = make_app()
+    response_cache.cached_response("user:{user}", timeout=3600)(lambda: jsonify({}))
+
+    with app.app_context():
+        now = int(time.time())
+        invalidate_tags("user:1")
+
+        assert tag_expiry("user:1") >= now + 7200
@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    LocalBucketStore,
+    UpstreamBusy,
+    UpstreamScheduler,
+    _take,
+    upstream_context,
+)
+
+
+def make_scheduler(rpm, max_wait=5.0):
+    scheduler = UpstreamScheduler()
+    scheduler.limits = {"chat": {"requests": rpm, "tokens": 1000}}
+    scheduler.max_wait = {PRIORITY_INTERACTIVE: max_wait, PRIORITY_BATCH: max_wait}
+    return scheduler
+
+
+def test_take_spends_and_refills():
+    limits = {"requests": 60}
+    state, wait = _take({"levels": {"requests": 1}, "stamp": 0.0}, limits, {"requests": 1}, 0.0)
+    assert wait == 0 and state["levels"]["requests"] == 0
+
+    assert _take(state, limits, {"requests": 1}, 0.5) == (None, pytest.approx(0.5))
+    state, wait = _take(state, limits, {"requests": 1}, 1.0)
+    assert wait == 0
+
+
+def test_refund_is_taken_while_blocked():
+    limits = {"tokens": 100}
+    state = {"levels": {"tokens": 10}, "stamp": 0.0, "blocked_until": 30.0}
+
+    assert _take(state, limits, {"tokens": 5}, 0.0)[0] is None
+    state, wait = _take(state, limits, {"tokens": -50}, 0.0)
+    assert wait == 0 and state["levels"]["tokens"] == 60
+    assert state["blocked_until"] == 30.0
+
+
+def test_users_take_turns_within_a_priority():
+    scheduler = make_scheduler(rpm=600)
+    scheduler.store.take("chat", scheduler.limits["chat"], {"requests": 600})  # empty the bucket
+    order = []
+
+    def call(user):
+        with upstream_context(user, PRIORITY_BATCH):
+            scheduler.acquire("chat")
+        order.append(user)
+
+    threads = []
+    for user in ["bulk"] * 4 + ["other"]:
+        threads.append(threading.Thread(target=call, args=(user,)))
+        threads[-1].start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    # "other" queued last but is served right after the first "bulk" call.
+    assert order.index("other") <= 1
+
+
+def test_interactive_calls_go_before_batch_calls():
+    scheduler = make_scheduler(rpm=600)
+    scheduler.store.take("chat", scheduler.limits["chat"], {"requests": 600})
+    order = []
+
+    def call(user, priority):
+        with upstream_context(user, priority):
+            scheduler.acquire("chat")
+        order.append(priority)
+
+    threads = [threading.Thread(target=call, args=(f"b{i}", PRIORITY_BATCH)) for i in range(3)]
+    threads.append(threading.Thread(target=call, args=("i", PRIORITY_INTERACTIVE)))
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order.index(PRIORITY_INTERACTIVE) <= 1
+
+
+def test_call_beyond_the_wait_budget_is_refused():
+    scheduler = make_scheduler(rpm=6, max_wait=1.0)
+    scheduler.store.take("chat", scheduler.limits["chat"], {"requests": 6})
+
+    with pytest.raises(UpstreamBusy) as excinfo:
+        scheduler.acquire("chat")
+    assert excinfo.value.retry_after >= 9
+    assert scheduler._head("chat") is None
+
+
+class SlowStore(LocalBucketStore):
+    def __init__(self):
+        super().__init__()
+        self.delay = 0.0
+
+    def take(self, kind, limits, costs, dry_run=False):
+        time.sleep(self.delay)
+        return super().take(kind, limits, costs, dry_run)
+
+
+def test_store_is_called_without_the_queue_lock():
+    scheduler = make_scheduler(rpm=600)
+    scheduler.store = SlowStore()
+    scheduler.store.delay = 0.5
+
+    thread = threading.Thread(target=scheduler.acquire, args=("chat",))
+    thread.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    with scheduler._condition:
+        pass
+    assert time.monotonic() - started < 0.1
+    thread.join()
+
+
+def test_refund_is_queued_when_the_store_cannot_take_it():
+    scheduler = make_scheduler(rpm=600)
+    store = scheduler.store
+    store.take("chat", scheduler.limits["chat"], {"tokens": 1000})
+    store.take = lambda kind, limits, costs, dry_run=False: 0.05  # contention
+
+    scheduler.refund("chat", 300)
+    assert scheduler._refunds == {"chat": 300}
+
+    del store.take
+    scheduler.acquire("chat", tokens=100)
+    assert scheduler._refunds == {}
+    assert store._states["chat"]["levels"]["tokens"] == pytest.approx(200, abs=1)
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import mongomock
+import pytest
+
+from app.utils.singleflight import AsyncSingleFlight, MongoLeaseStore, SingleFlight
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+
+    def call(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"sections": []}
+
+    results = run_concurrently(5, lambda: flight.do("key", fn))
+
+    assert len(calls) == 1
+    assert all(result == {"sections": []} for result in results)
+    # Each caller owns its result.
+    assert len({id(result) for result in results}) == 5
+
+
+def test_followers_receive_the_leaders_error():
+    flight = SingleFlight("test")
+
+    def fn():
+        time.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    results = run_concurrently(3, lambda: flight.do("key", fn))
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def lease_stores(lease_seconds):
+    collection = mongomock.MongoClient()["test"]["generation_leases"]
+    stores = []
+    for owner in ("node-a", "node-b"):
+        store = MongoLeaseStore(lambda: collection, lease_seconds=lease_seconds, poll_interval=0.02)
+        store.owner = owner
+        stores.append(store)
+    return stores
+
+
+def test_leader_renews_its_lease_while_running():
+    store_a, store_b = lease_stores(lease_seconds=0.3)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(1)
+        return "content"
+
+    # Two processes, each with its own SingleFlight; the call outlives the lease.
+    flights = [SingleFlight("content", store_a, wait_timeout=5), SingleFlight("content", store_b, wait_timeout=5)]
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights[0].do("key", fn)))
+    leader.start()
+    # Past the first lease's expiry.
+    time.sleep(0.5)
+    results.append(flights[1].do("key", fn))
+    leader.join()
+
+    assert calls == [1]
+    assert results == ["content", "content"]
+
+
+def test_expired_lease_is_taken_over():
+    store_a, store_b = lease_stores(lease_seconds=0.1)
+
+    assert store_a.acquire("content:key")
+    assert not store_b.acquire("content:key")
+    time.sleep(0.2)
+    assert store_b.acquire("content:key")
+    assert not store_a.renew("content:key")
+
+
+def test_async_calls_share_one_upstream_call():
+    store_a, store_b = lease_stores(lease_seconds=0.3)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(1)
+        return {"title": "T"}
+
+    async def main():
+        local = AsyncSingleFlight("content", store_a, wait_timeout=5)
+        remote = SingleFlight("content", store_b, wait_timeout=5)
+        async def follow():
+            await asyncio.sleep(0.5)
+            return await asyncio.to_thread(remote.do, "key", lambda: pytest.fail("ran twice"))
+
+        return await asyncio.gather(local.do("key", fn), local.do("key", fn), follow())
+
+    assert asyncio.run(main()) == [{"title": "T"}] * 3
+    assert calls == [1]
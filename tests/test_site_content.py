@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from app.models.site_content import parse_site_content, parse_site_section, repair_json, validate_site_section
+from app.utils.json_stream import SectionStreamParser
+
+SITE = {
+    "title": "Bean There",
+    "sections": [
+        {"type": "hero", "body": {"headline": "Fresh coffee", "subheadline": "Daily"}},
+        {"type": "about", "body": "Since 1999."},
+        {"type": "services", "body": ["Espresso", "Pastries"]},
+        {"type": "contact", "body": "hello@example.com"},
+    ],
+}
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('```json\n{"a": 1}\n```', {"a": 1}),
+        ('Here you go: {"a": [1, 2,], "b": {"c": "d",},} Enjoy!', {"a": [1, 2], "b": {"c": "d"}}),
+        ('{"a": "cut off', {"a": "cut off"}),
+        # The last number may itself be cut short (2 of 25), so it is dropped.
+        ('{"a": "x", "b": [1, 2', {"a": "x", "b": [1]}),
+        ('{"a": "x", "b": {"c": tr', {"a": "x", "b": {}}),
+        ('{"a": "x", "b', {"a": "x"}),
+        ('{"a": "esc \\', {"a": "esc "}),
+        ('{"a": "brace } in string", "b": 1}', {"a": "brace } in string", "b": 1}),
+    ],
+)
+def test_repair_json(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_well_formed_content_needs_no_repair():
+    content, repaired = parse_site_content(json.dumps(SITE))
+
+    assert not repaired
+    assert [section["type"] for section in content["sections"]] == ["hero", "about", "services", "contact"]
+
+
+def test_truncated_content_keeps_the_complete_sections():
+    text = json.dumps(SITE)
+    cut = text[: text.index('"hello@')]
+
+    content, repaired = parse_site_content(cut)
+
+    assert repaired
+    assert [section["type"] for section in content["sections"]] == ["hero", "about", "services"]
+
+
+def test_unknown_section_types_are_kept():
+    site = {"title": "T", "sections": [{"type": "faq", "body": [{"q": "?", "a": "!"}]}]}
+
+    content, _ = parse_site_content(json.dumps(site))
+
+    assert content["sections"][0]["body"] == [{"q": "?", "a": "!"}]
+
+
+def test_unrecoverable_content_raises_value_error():
+    with pytest.raises(ValueError):
+        parse_site_content("I cannot help with that.")
+    with pytest.raises(ValueError):
+        parse_site_content('{"sections": []}')
+
+
+def test_section_must_have_the_requested_type():
+    text = json.dumps({"type": "about", "body": "Since 1999."})
+
+    assert parse_site_section(text, "about") == ({"type": "about", "body": "Since 1999.", "title": ""}, False)
+    with pytest.raises(ValueError):
+        parse_site_section(text, "contact")
+
+
+def test_streamed_sections_are_validated():
+    assert validate_site_section({"type": "services", "body": ["Espresso"]})["body"] == ["Espresso"]
+    with pytest.raises(ValueError):
+        validate_site_section({"type": "services", "body": "Espresso"})
+    with pytest.raises(ValueError):
+        validate_site_section({"type": "hero", "body": {}})
+
+
+def test_stream_parser_survives_a_bad_escape():
+    parser = SectionStreamParser()
+    text = '{"title": "Bad \\x escape", "sections": [{"type": "about", "body": "Hi"}]}'
+
+    events = [event for index in range(0, len(text), 5) for event in parser.feed(text[index:index + 5])]
+
+    assert events == [("section", {"type": "about", "body": "Hi"})]
+
+
+def test_stream_drops_invalid_sections_before_building_image_jobs(monkeypatch):
+    from types import SimpleNamespace as NS
+
+    from app.utils import openai_helper
+
+    site = {
+        "title": "T",
+        "sections": [
+            {"type": "services", "body": "not a list"},
+            {"type": "about", "body": "Since 1999."},
+        ],
+    }
+    text = json.dumps(site)
+    chunks = [NS(choices=[NS(delta=NS(content=text[i:i + 8]), finish_reason=None)]) for i in range(0, len(text), 8)]
+    prompts = []
+
+    def generate_image(prompt, **kwargs):
+        prompts.append(prompt)
+        return NS(data=[NS(url="https://images.example/about.png")])
+
+    client = NS(chat=NS(completions=NS(create=lambda **kwargs: iter(chunks))), images=NS(generate=generate_image))
+    monkeypatch.setattr(openai_helper, "client", client)
+    monkeypatch.setattr(openai_helper.upstream_scheduler, "check", lambda kind, priority=None: None)
+    monkeypatch.setattr(openai_helper.upstream_scheduler, "acquire", lambda kind, tokens=0: None)
+
+    events = list(openai_helper.stream_site_content("coffee shop", "food"))
+
+    assert [payload["type"] for event, payload in events if event == "section"] == ["about"]
+    assert events[-1][1]["sections"][0]["image_url"] == "https://images.example/about.png"
+    assert len(prompts) == 1
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import mongomock
+import pytest
+
+from app.utils.tiered_cache import FileStore, LRUByteCache, MongoStore, TieredCache
+
+
+@pytest.fixture(params=["file", "mongo"])
+def l2(request, tmp_path):
+    if request.param == "file":
+        return FileStore(str(tmp_path))
+    collection = mongomock.MongoClient()["test"]["cache_entries"]
+    return MongoStore(lambda: collection)
+
+
+def test_lru_evicts_least_recently_used_by_size():
+    lru = LRUByteCache(max_bytes=10, max_ttl=60)
+    lru.set("a", b"aaaa")
+    lru.set("b", b"bbbb")
+    lru.get("a")
+    lru.set("c", b"cccc")
+
+    assert lru.get("a") == b"aaaa"
+    assert lru.get("b") is None
+    assert lru.size == 8
+    lru.set("big", b"x" * 11)
+    assert lru.get("big") is None
+
+
+def test_workers_share_the_l2_tier(l2):
+    first, second = TieredCache(l2), TieredCache(l2)
+
+    first.set("key", {"a": 1}, timeout=60)
+    assert second.get("key") == {"a": 1}
+
+    second.delete("key")
+    # The first worker's L1 copy lives at most l1_ttl.
+    first.l1.delete("key")
+    assert first.get("key") is None
+
+
+def test_add_is_atomic_across_workers(l2):
+    first, second = TieredCache(l2), TieredCache(l2)
+
+    assert first.add("key", 1)
+    assert not second.add("key", 2)
+    assert second.get("key") == 1
+
+
+def test_entries_expire(l2):
+    cache = TieredCache(l2, l1_ttl=0.05)
+    cache.set("key", "value", timeout=1)
+    time.sleep(1.1)
+
+    assert cache.get("key") is None
+
+
+def test_remember_computes_once_under_concurrency(l2):
+    caches = [TieredCache(l2) for _ in range(8)]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda cache=cache: results.append(cache.remember("key", compute, timeout=60)))
+        for cache in caches
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+
+
+def test_remember_skips_values_that_are_not_cacheable():
+    cache = TieredCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    cache.remember("key", compute, cacheable=lambda value: value is not None)
+    cache.remember("key", compute, cacheable=lambda value: value is not None)
+    assert calls == [1, 1]
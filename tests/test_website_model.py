@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from app.models.website_model import (
+    build_section_update,
+    decode_cursor,
+    encode_cursor,
+    list_user_websites,
+    version_filter,
+)
+
+
+def test_section_update_sets_each_field_by_type():
+    update, array_filters, sections = build_section_update({
+        "sections": [
+            {"type": "about", "body": "New about"},
+            {"type": "about", "title": "About"},
+            {"type": "faq", "body": "Q"},
+        ],
+        "title": "T",
+    })
+
+    assert update["content.sections.$[s0].body"] == "New about"
+    assert update["content.sections.$[s0].title"] == "About"
+    assert update["content.sections.$[s1].body"] == "Q"
+    assert update["content.title"] == "T"
+    assert "updated_at" in update
+    assert array_filters == [{"s0.type": "about"}, {"s1.type": "faq"}]
+    assert [section["type"] for section in sections] == ["about", "faq"]
+
+
+def test_section_update_rejects_operator_field_names():
+    with pytest.raises(ValueError):
+        build_section_update({"sections": [{"type": "about", "$set": 1}]})
+    with pytest.raises(ValueError):
+        build_section_update({"sections": ["about"]})
+
+
+def test_version_filter_matches_unversioned_documents_as_zero():
+    assert version_filter(0) == {"version": {"$in": [0, None]}}
+    assert version_filter(3) == {"version": 3}
+
+
+def test_cursor_round_trip():
+    website = {"_id": ObjectId(), "updated_at": datetime(2025, 1, 2, 3, 4, 5, 6000)}
+
+    assert decode_cursor(encode_cursor(website)) == (website["updated_at"], website["_id"])
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_pages_cover_every_website_once_newest_first():
+    db = mongomock.MongoClient()["test"]
+    start = datetime(2025, 1, 1)
+    # Pairs of websites share updated_at, so pages must break ties on _id.
+    db.websites.insert_many(
+        [{"user_id": "a", "updated_at": start + timedelta(minutes=i // 2)} for i in range(7)]
+        + [{"user_id": "b", "updated_at": start}]
+    )
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = list_user_websites(db, "a", 3, cursor)
+        assert len(page) <= 3
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    keys = [(website["updated_at"], website["_id"]) for website in seen]
+    assert len(seen) == 7
+    assert keys == sorted(keys, reverse=True)